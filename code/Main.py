@@ -1,4 +1,5 @@
 import tkinter as tk
+from itertools import islice
 from tkinter import ttk, messagebox
 from pathlib import Path
 from datetime import datetime
@@ -6,6 +7,22 @@ from classes.Bibliotheque import Bibliotheque
 from classes.Livre import Livre
 from classes.Utilisateur import Utilisateur
 from classes.Emprunt import Emprunt
+from classes.EcrivainDiffere import EcrivainDiffere
+from classes.Pagination import parcourir
+
+# Nombre d'emprunts clos lus dans SQLite pour l'affichage en mode de chargement "actifs"
+LIMITE_HISTORIQUE = 500
+# Intervalle de lecture du journal des modifications (changements faits par les autres postes)
+INTERVALLE_SYNCHRO_MS = 5000
+# Intervalle de relève des opérations terminées par le thread d'écriture
+INTERVALLE_ECRITURES_MS = 50
+# Lignes affichées au plus dans les listes de choix (utilisateur / livre) de l'onglet Emprunts
+LIMITE_SUGGESTIONS = 200
+# Valeurs affichées au plus par facette dans le panneau de l'onglet Livres
+LIMITE_VALEURS_FACETTE = 10
+NOMS_FACETTES = {"categorie": "Catégorie", "editeur": "Éditeur", "decennie": "Décennie", "disponible": "Disponibilité"}
+# Lignes par page des listes Livres, Utilisateurs et Emprunts (pages lues par clé dans SQLite)
+LIGNES_PAR_PAGE = 200
 
 
 class BibliothequeApp:
@@ -17,11 +34,17 @@ class BibliothequeApp:
         self.root.configure(bg="#f4f6f8")
 
         self.biblio = biblio
-        self.biblio.charger_donnees()  # Chargement des données à l'initialisation
+        self.biblio.synchroniser()  # Données déjà chargées : on ne relit que les changements
+        # Les écritures SQLite passent par un thread dédié : la fenêtre ne se fige pas pendant les commits
+        self.ecrivain = EcrivainDiffere(self.biblio)
+        # Par liste : clés de début des pages déjà vues (retour arrière), clé de la page suivante
+        self.pages = {}
 
         self.setup_style()
         self.setup_ui()
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.root.after(INTERVALLE_SYNCHRO_MS, self.synchroniser_periodiquement)
+        self.root.after(INTERVALLE_ECRITURES_MS, self.traiter_ecritures)
 
 
     # ===== Styles =====
@@ -70,12 +93,85 @@ class BibliothequeApp:
 
     def on_quit(self):
         if messagebox.askyesno("Quitter", "Voulez-vous vraiment quitter l'application ?"):
-            self.biblio.sauvegarder_donnees()  # Sauvegarde avant fermeture
+            self.ecrivain.arreter()  # Termine les écritures en file avant fermeture
+            self.biblio.fermer_connexion()  # Écrit aussi l'instantané de démarrage
             self.root.destroy()  # Ferme proprement l'application
 
+    # ===== Pagination des listes =====
+    def creer_barre_pages(self, parent, ecran, rafraichir):
+        """Boutons page précédente / suivante ; `rafraichir()` affiche la page courante de `ecran`."""
+        barre = ttk.Frame(parent, style='TFrame')
+        barre.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 5))
+        libelle = ttk.Label(barre, text="Page 1")
+        ttk.Button(barre, text="◀ Précédente", command=lambda: self.changer_page(ecran, -1, rafraichir),
+                   style='TButton').pack(side=tk.LEFT)
+        libelle.pack(side=tk.LEFT, padx=10)
+        ttk.Button(barre, text="Suivante ▶", command=lambda: self.changer_page(ecran, 1, rafraichir),
+                   style='TButton').pack(side=tk.LEFT)
+        self.pages[ecran] = {"debuts": [None], "suivante": None, "libelle": libelle}
+
+    def changer_page(self, ecran, sens, rafraichir):
+        etat = self.pages[ecran]
+        if sens > 0 and etat["suivante"] is not None:
+            etat["debuts"].append(etat["suivante"])
+        elif sens < 0 and len(etat["debuts"]) > 1:
+            etat["debuts"].pop()
+        else:
+            return
+        rafraichir()
+
+    def premiere_page(self, ecran):
+        del self.pages[ecran]["debuts"][1:]
+
+    def debut_page(self, ecran):
+        return self.pages[ecran]["debuts"][-1]
+
+    def fin_page(self, ecran, suivante):
+        etat = self.pages[ecran]
+        etat["suivante"] = suivante
+        numero = len(etat["debuts"])
+        etat["libelle"].config(text=f"Page {numero}" if suivante is not None or numero == 1
+                               else f"Page {numero} (dernière)")
+
+    # ===== Écritures en arrière-plan =====
+    def ecrire(self, operation, *args, au_succes=None, a_l_echec=None):
+        """Confie l'opération au thread d'écriture ; les rappels s'exécutent dans le thread Tk."""
+        if a_l_echec is None:
+            def a_l_echec(erreur):
+                messagebox.showerror("Erreur", f"L'enregistrement a échoué : {erreur}")
+                self.rafraichir_onglet_courant()
+        if not self.ecrivain.soumettre(operation, *args, au_succes=au_succes, a_l_echec=a_l_echec):
+            messagebox.showwarning("Patientez", "Trop d'enregistrements en attente, réessayez dans un instant.")
+            return False
+        self.status_label.config(text="Enregistrement en cours...")
+        return True
+
+    def traiter_ecritures(self):
+        if self.ecrivain.traiter_terminees() and not self.ecrivain.en_attente():
+            self.status_label.config(text="Prêt")
+        self.root.after(INTERVALLE_ECRITURES_MS, self.traiter_ecritures)
+
     # ===== Gestion onglets =====
+    def synchroniser_periodiquement(self):
+        def synchronise(nombre, motif):
+            if nombre:
+                self.rafraichir_onglet_courant()
+                self.status_label.config(text="Données synchronisées avec les autres postes")
+            self.root.after(INTERVALLE_SYNCHRO_MS, self.synchroniser_periodiquement)
+
+        def echec(erreur):
+            self.root.after(INTERVALLE_SYNCHRO_MS, self.synchroniser_periodiquement)
+
+        # Passe par le thread d'écriture : lui seul modifie les données en mémoire
+        if not self.ecrivain.soumettre(self.biblio.synchroniser, au_succes=synchronise, a_l_echec=echec,
+                                       ecriture=False):
+            self.root.after(INTERVALLE_SYNCHRO_MS, self.synchroniser_periodiquement)
+
     def on_tab_changed(self, event):
-        selected_tab = event.widget.tab('current', 'text')
+        self.rafraichir_onglet_courant()
+
+    def rafraichir_onglet_courant(self):
+        selected_tab = self.notebook.tab('current', 'text')
         if selected_tab == "Statistiques & Historique":
             self.update_stats()
         elif selected_tab == "Emprunts":
@@ -118,11 +214,29 @@ class BibliothequeApp:
         ttk.Button(btn_frame, text="Modifier Livre", command=self.modifier_livre, style='TButton').pack(pady=2, fill=tk.X)
         ttk.Button(btn_frame, text="Supprimer Livre", command=self.supprimer_livre, style='TButton').pack(pady=2, fill=tk.X)
 
-        self.livre_tree = ttk.Treeview(tab, columns=("isbn", "titre", "auteur", "categorie"), show="headings")
+        # Filtre du catalogue (même recherche que l'onglet Emprunts), appliqué aussi aux comptes par facette
+        filtre_frame = ttk.Frame(tab, style='TFrame')
+        filtre_frame.pack(side=tk.TOP, fill=tk.X, padx=10)
+        ttk.Label(filtre_frame, text="Filtrer :").pack(side=tk.LEFT)
+        self.livre_filtre_var = tk.StringVar()
+        ttk.Entry(filtre_frame, textvariable=self.livre_filtre_var, width=40).pack(side=tk.LEFT, padx=5)
+        self.livre_filtre_var.trace_add("write", self._filtre_livres_modifie)
+
+        self.creer_barre_pages(tab, "livres", self.refresh_livres)
+        liste_frame = ttk.Frame(tab, style='TFrame')
+        liste_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.facettes_tree = ttk.Treeview(liste_frame, columns=("nombre",), show="tree headings")
+        self.facettes_tree.heading("#0", text="Facette")
+        self.facettes_tree.heading("nombre", text="Livres")
+        self.facettes_tree.column("#0", width=200)
+        self.facettes_tree.column("nombre", width=70, anchor=tk.E)
+        self.facettes_tree.pack(side=tk.RIGHT, fill=tk.Y, padx=(10, 0))
+
+        self.livre_tree = ttk.Treeview(liste_frame, columns=("isbn", "titre", "auteur", "categorie"), show="headings")
         for col in ("isbn", "titre", "auteur", "categorie"):
             self.livre_tree.heading(col, text=col.capitalize())
             self.livre_tree.column(col, width=250)
-        self.livre_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.livre_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         self.livre_tree.bind("<<TreeviewSelect>>", self.charger_livre_selectionne)
         self.refresh_livres()
@@ -148,13 +262,15 @@ class BibliothequeApp:
             return
         livre = Livre(isbn=isbn, titre=titre, auteur=auteur, editeur="Inconnu",
                       annee_publication=2025, categorie=categorie, nombre_pages=100)
-        if self.biblio.ajouter_livre(livre):
-            self.biblio.sauvegarder_donnees()
-            messagebox.showinfo("Succès", "Livre ajouté avec succès.")
-            self.refresh_livres()
-            self.clear_livre_form()
-        else:
-            messagebox.showerror("Erreur", "Ce livre existe déjà.")
+
+        def termine(ajoute, motif):
+            if ajoute:
+                messagebox.showinfo("Succès", "Livre ajouté avec succès.")
+                self.refresh_livres()
+                self.clear_livre_form()
+            else:
+                messagebox.showerror("Erreur", "Ce livre existe déjà.")
+        self.ecrire(self.biblio.ajouter_livre, livre, au_succes=termine)
 
     def modifier_livre(self):
         selected_item = self.livre_tree.selection()
@@ -171,13 +287,16 @@ class BibliothequeApp:
             return
         livre_modifie = Livre(isbn=new_isbn, titre=titre, auteur=auteur, editeur="Inconnu",
                               annee_publication=2025, categorie=categorie, nombre_pages=100)
-        if self.biblio.modifier_livre(old_isbn, livre_modifie):
-            self.biblio.sauvegarder_donnees()
-            messagebox.showinfo("Succès", "Livre modifié avec succès.")
+
+        def termine(modifie, motif):
+            if modifie:
+                messagebox.showinfo("Succès", "Livre modifié avec succès.")
+                self.clear_livre_form()
+            else:
+                messagebox.showerror("Erreur", motif
+                                     or "La modification a échoué. Vérifiez que l'ISBN n'existe pas déjà.")
             self.refresh_livres()
-            self.clear_livre_form()
-        else:
-            messagebox.showerror("Erreur", "La modification a échoué. Vérifiez que l'ISBN n'existe pas déjà.")
+        self.ecrire(self.biblio.modifier_livre, old_isbn, livre_modifie, au_succes=termine)
 
     def supprimer_livre(self):
         selected_item = self.livre_tree.selection()
@@ -186,22 +305,54 @@ class BibliothequeApp:
             return
         isbn = self.livre_tree.item(selected_item, "values")[0]
         if messagebox.askyesno("Confirmer la suppression", f"Voulez-vous vraiment supprimer le livre avec l'ISBN {isbn} ?"):
-            if self.biblio.supprimer_livre(isbn):
-                self.biblio.sauvegarder_donnees()
-                messagebox.showinfo("Succès", "Livre supprimé avec succès.")
-                self.refresh_livres()
-                self.clear_livre_form()
-            else:
-                messagebox.showerror("Erreur", "Suppression impossible. Le livre est peut-être emprunté.")
+            def termine(supprime, motif):
+                if supprime:
+                    messagebox.showinfo("Succès", "Livre supprimé avec succès.")
+                    self.refresh_livres()
+                    self.clear_livre_form()
+                else:
+                    messagebox.showerror("Erreur", "Suppression impossible. Le livre est peut-être emprunté.")
+            self.ecrire(self.biblio.supprimer_livre, isbn, au_succes=termine)
+
+    def _filtre_livres_modifie(self, *args):
+        self.premiere_page("livres")
+        self.refresh_livres()
 
     def refresh_livres(self):
         for row in self.livre_tree.get_children():
             self.livre_tree.delete(row)
-        for i, livre in enumerate(self.biblio.catalogue.values()):
+        filtre = self.livre_filtre_var.get().strip()
+        if filtre:
+            # Résultat d'un filtre : sa première page seulement (affiner le filtre pour en voir d'autres)
+            self.premiere_page("livres")
+            correspondances = (self.biblio.catalogue.get(isbn)
+                               for isbn in self.biblio.catalogue.index.correspondances(filtre))
+            livres, suivante = list(islice(filter(None, correspondances), LIGNES_PAR_PAGE)), None
+        else:
+            livres, suivante = self.biblio.page_livres(self.debut_page("livres"), LIGNES_PAR_PAGE, ordre="titre")
+        self.fin_page("livres", suivante)
+        for i, livre in enumerate(livres):
             tag = 'evenrow' if i % 2 == 0 else 'oddrow'
             self.livre_tree.insert("", tk.END, values=(livre.isbn, livre.titre, livre.auteur, livre.categorie), tags=(tag,))
         self.livre_tree.tag_configure('evenrow', background='white')
         self.livre_tree.tag_configure('oddrow', background='#f0f4ff')
+        self.refresh_facettes(filtre)
+
+    def refresh_facettes(self, filtre=""):
+        self.facettes_tree.delete(*self.facettes_tree.get_children())
+        for nom, comptes in self.biblio.comptes_facettes(filtre).items():
+            parent = self.facettes_tree.insert("", tk.END, text=NOMS_FACETTES.get(nom, nom),
+                                               values=(sum(comptes.values()),), open=True)
+            for valeur, nombre in islice(comptes.items(), LIMITE_VALEURS_FACETTE):
+                self.facettes_tree.insert(parent, tk.END, text=self._libelle_facette(nom, valeur), values=(nombre,))
+
+    @staticmethod
+    def _libelle_facette(nom, valeur) -> str:
+        if nom == "disponible":
+            return "Disponible" if valeur else "Emprunté"
+        if nom == "decennie":
+            return f"{valeur}-{valeur + 9}" if valeur is not None else "Inconnue"
+        return str(valeur) if valeur != "" else "(non renseigné)"
 
     def clear_livre_form(self):
         self.isbn_entry.delete(0, tk.END)
@@ -240,6 +391,7 @@ class BibliothequeApp:
         ttk.Button(btn_frame, text="Modifier Utilisateur", command=self.modifier_utilisateur, style='TButton').pack(pady=2, fill=tk.X)
         ttk.Button(btn_frame, text="Supprimer Utilisateur", command=self.supprimer_utilisateur, style='TButton').pack(pady=2, fill=tk.X)
 
+        self.creer_barre_pages(tab, "utilisateurs", self.refresh_utilisateurs)
         self.user_tree = ttk.Treeview(tab, columns=("numero", "nom", "prenom", "email"), show="headings")
         for col in ("numero", "nom", "prenom", "email"):
             self.user_tree.heading(col, text=col.capitalize())
@@ -269,13 +421,15 @@ class BibliothequeApp:
             messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
             return
         user = Utilisateur(numero_carte=numero, nom=nom, prenom=prenom, email=email)
-        if self.biblio.inscrire_utilisateur(user):
-            self.biblio.sauvegarder_donnees()
-            messagebox.showinfo("Succès", "Utilisateur ajouté.")
-            self.refresh_utilisateurs()
-            self.clear_user_form()
-        else:
-            messagebox.showerror("Erreur", "Cet utilisateur existe déjà.")
+
+        def termine(inscrit, motif):
+            if inscrit:
+                messagebox.showinfo("Succès", "Utilisateur ajouté.")
+                self.refresh_utilisateurs()
+                self.clear_user_form()
+            else:
+                messagebox.showerror("Erreur", "Cet utilisateur existe déjà.")
+        self.ecrire(self.biblio.inscrire_utilisateur, user, au_succes=termine)
 
     def modifier_utilisateur(self):
         selected_item = self.user_tree.selection()
@@ -291,13 +445,15 @@ class BibliothequeApp:
             messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
             return
         user_modifie = Utilisateur(numero_carte=new_numero, nom=nom, prenom=prenom, email=email)
-        if self.biblio.modifier_utilisateur(old_numero, user_modifie):
-            self.biblio.sauvegarder_donnees()
-            messagebox.showinfo("Succès", "Utilisateur modifié avec succès.")
-            self.refresh_utilisateurs()
-            self.clear_user_form()
-        else:
-            messagebox.showerror("Erreur", "La modification a échoué.")
+
+        def termine(modifie, motif):
+            if modifie:
+                messagebox.showinfo("Succès", "Utilisateur modifié avec succès.")
+                self.refresh_utilisateurs()
+                self.clear_user_form()
+            else:
+                messagebox.showerror("Erreur", "La modification a échoué.")
+        self.ecrire(self.biblio.modifier_utilisateur, old_numero, user_modifie, au_succes=termine)
 
     def supprimer_utilisateur(self):
         selected_item = self.user_tree.selection()
@@ -306,18 +462,22 @@ class BibliothequeApp:
             return
         numero = self.user_tree.item(selected_item, "values")[0]
         if messagebox.askyesno("Confirmer la suppression", f"Voulez-vous vraiment supprimer l'utilisateur avec le numéro {numero} ?"):
-            if self.biblio.supprimer_utilisateur(numero):
-                self.biblio.sauvegarder_donnees()
-                messagebox.showinfo("Succès", "Utilisateur supprimé avec succès.")
-                self.refresh_utilisateurs()
-                self.clear_user_form()
-            else:
-                messagebox.showerror("Erreur", "La suppression a échoué.")
+            def termine(supprime, motif):
+                if supprime:
+                    messagebox.showinfo("Succès", "Utilisateur supprimé avec succès.")
+                    self.refresh_utilisateurs()
+                    self.clear_user_form()
+                else:
+                    messagebox.showerror("Erreur", "La suppression a échoué.")
+            self.ecrire(self.biblio.supprimer_utilisateur, numero, au_succes=termine)
 
     def refresh_utilisateurs(self):
         for row in self.user_tree.get_children():
             self.user_tree.delete(row)
-        for i, user in enumerate(self.biblio.utilisateurs.values()):
+        utilisateurs, suivante = self.biblio.page_utilisateurs(self.debut_page("utilisateurs"), LIGNES_PAR_PAGE,
+                                                               ordre="nom")
+        self.fin_page("utilisateurs", suivante)
+        for i, user in enumerate(utilisateurs):
             tag = 'evenrow' if i % 2 == 0 else 'oddrow'
             self.user_tree.insert("", tk.END,
                                   values=(user.numero_carte, user.nom, user.prenom, user.email),
@@ -380,6 +540,9 @@ class BibliothequeApp:
         ttk.Button(emprunt_frame, text="Faire Emprunt", command=self.ajouter_emprunt_smart, style='TButton').grid(row=0, column=4, rowspan=2, padx=10)
 
         cols = ("id", "utilisateur", "livre", "date_emprunt", "date_retour_prevue", "date_retour_effective", "statut")
+        # Les pages suivantes gardent les filtres de la dernière recherche
+        self.filtres_emprunts = {}
+        self.creer_barre_pages(tab, "emprunts", lambda: self.refresh_emprunts(**self.filtres_emprunts))
         self.emprunts_tree = ttk.Treeview(tab, columns=cols, show="headings", selectmode="browse")
         for c in cols:
             self.emprunts_tree.heading(c, text=c.replace("_", " ").capitalize())
@@ -390,29 +553,52 @@ class BibliothequeApp:
         self.refresh_emprunts()
 
     def rechercher_emprunts(self):
-        user_query = self.search_user_entry.get().strip().lower()
-        book_query = self.search_book_entry.get().strip().lower()
+        # Normalisés par les index (accents, casse, ponctuation)
+        user_query = self.search_user_entry.get().strip()
+        book_query = self.search_book_entry.get().strip()
         status_query = self.search_status_var.get()
 
+        self.premiere_page("emprunts")
         self.refresh_emprunts(
             user_filter=user_query,
             book_filter=book_query,
             status_filter=status_query
         )
 
+    def _emprunts_affiches(self, status_filter=""):
+        """Emprunts en mémoire, complétés par l'historique clos récent en mode "actifs"."""
+        emprunts = self.biblio.emprunts.copy()
+        if self.biblio.config["mode_chargement"] == "actifs" and status_filter in ("", "Terminé"):
+            for emprunt in self.biblio.historique_emprunts(limite=LIMITE_HISTORIQUE):
+                emprunts.setdefault(emprunt.id, emprunt)
+        return emprunts.values()
+
     def refresh_emprunts(self, user_filter="", book_filter="", status_filter=""):
         for row in self.emprunts_tree.get_children():
             self.emprunts_tree.delete(row)
-
-        for i, emprunt in enumerate(self.biblio.emprunts.values()):
+        self.filtres_emprunts = {"user_filter": user_filter, "book_filter": book_filter,
+                                 "status_filter": status_filter}
+
+        # Filtres résolus une fois par les index de trigrammes, puis simple appartenance par emprunt
+        utilisateurs_retenus = self.biblio.utilisateurs.index.rechercher(user_filter) if user_filter else None
+        livres_retenus = self.biblio.catalogue.index.rechercher(book_filter) if book_filter else None
+
+        # Pages SQLite par id lues jusqu'à remplir une page d'affichage ; le statut filtre déjà en SQL
+        statut_sql = {"Terminé": False, "En cours": True, "En retard": True}.get(status_filter)
+        apres, suivante, affiches = self.debut_page("emprunts"), None, 0
+        for emprunt in parcourir(self.biblio.page_emprunts, apres, LIGNES_PAR_PAGE, statut=statut_sql):
+            if affiches == LIGNES_PAR_PAGE:
+                suivante = apres
+                break
+            apres = (emprunt.id,)
             utilisateur = self.biblio.utilisateurs.get(emprunt.id_utilisateur)
             livre = self.biblio.catalogue.get(emprunt.id_livre)
 
             if not utilisateur or not livre:
                 continue
 
-            user_match = user_filter in f"{utilisateur.nom} {utilisateur.prenom} {utilisateur.numero_carte}".lower()
-            book_match = book_filter in f"{livre.titre} {livre.auteur} {livre.isbn}".lower()
+            user_match = utilisateurs_retenus is None or emprunt.id_utilisateur in utilisateurs_retenus
+            book_match = livres_retenus is None or emprunt.id_livre in livres_retenus
 
             statut = "En cours"
             if emprunt.date_retour_effective:
@@ -427,30 +613,33 @@ class BibliothequeApp:
                 date_retour_prevue = emprunt.date_retour_prevue.strftime("%Y-%m-%d") if emprunt.date_retour_prevue else "N/A"
                 date_retour_effective = emprunt.date_retour_effective.strftime("%Y-%m-%d") if emprunt.date_retour_effective else "N/A"
 
-                tag = 'evenrow' if i % 2 == 0 else 'oddrow'
+                tag = 'evenrow' if affiches % 2 == 0 else 'oddrow'
                 self.emprunts_tree.insert("", tk.END, values=(
                     emprunt.id, utilisateur.numero_carte, livre.isbn, date_emprunt, date_retour_prevue, date_retour_effective, statut), tags=(tag,))
+                affiches += 1
 
+        self.fin_page("emprunts", suivante)
         self.emprunts_tree.tag_configure('evenrow', background='white')
         self.emprunts_tree.tag_configure('oddrow', background='#f0f4ff')
 
     def _filter_users(self, *args):
-        text = self.user_search_var.get().lower()
+        text = self.user_search_var.get()
+        utilisateurs = (self.biblio.utilisateurs.get(numero)
+                        for numero in self.biblio.utilisateurs.index.correspondances(text))
+        lignes = [f"{uc.numero_carte} - {uc.prenom} {uc.nom}"
+                  for uc in islice(filter(None, utilisateurs), LIMITE_SUGGESTIONS)]
         self.user_listbox.delete(0, tk.END)
-        for uc in self.biblio.utilisateurs.values():
-            needle = f"{uc.nom} {uc.prenom} {uc.numero_carte}".lower()
-            if text in needle:
-                self.user_listbox.insert(tk.END, f"{uc.numero_carte} - {uc.prenom} {uc.nom}")
+        if lignes:
+            self.user_listbox.insert(tk.END, *lignes)
 
     def _filter_books(self, *args):
-        text = self.book_search_var.get().lower()
+        text = self.book_search_var.get()
+        livres = (self.biblio.catalogue.get(isbn) for isbn in self.biblio.catalogue.index.correspondances(text))
+        disponibles = (livre for livre in livres if livre is not None and livre.est_disponible())
+        lignes = [f"{livre.isbn} - {livre.titre}" for livre in islice(disponibles, LIMITE_SUGGESTIONS)]
         self.book_listbox.delete(0, tk.END)
-        for livre in self.biblio.catalogue.values():
-            if not livre.est_disponible():
-                continue
-            needle = f"{livre.titre} {livre.auteur} {livre.isbn}".lower()
-            if text in needle:
-                self.book_listbox.insert(tk.END, f"{livre.isbn} - {livre.titre}")
+        if lignes:
+            self.book_listbox.insert(tk.END, *lignes)
 
     def ajouter_emprunt_smart(self):
         user_sel = self.user_listbox.curselection()
@@ -462,15 +651,15 @@ class BibliothequeApp:
         numero_carte = self.user_listbox.get(user_sel[0]).split(" - ")[0]
         isbn = self.book_listbox.get(book_sel[0]).split(" - ")[0]
 
-        id_emprunt = self.biblio.emprunter_livre(numero_carte, isbn)
-        if id_emprunt is None:
-            messagebox.showerror("Erreur", "Emprunt impossible.")
-        else:
-            self.biblio.sauvegarder_donnees()
-            messagebox.showinfo("Succès", f"Emprunt n°{id_emprunt} enregistré.")
+        def termine(id_emprunt, motif):
+            if id_emprunt is None:
+                messagebox.showerror("Erreur", motif or "Emprunt impossible.")
+            else:
+                messagebox.showinfo("Succès", f"Emprunt n°{id_emprunt} enregistré.")
             self.refresh_emprunts()
             self._filter_users()
             self._filter_books()
+        self.ecrire(self.biblio.emprunter_livre, numero_carte, isbn, au_succes=termine)
 
     def retourner_emprunt(self):
         selected = self.emprunts_tree.selection()
@@ -479,14 +668,16 @@ class BibliothequeApp:
             return
         values = self.emprunts_tree.item(selected[0], "values")
         id_emprunt = int(values[0])
-        if self.biblio.retourner_livre(id_emprunt):
-            self.biblio.sauvegarder_donnees()
-            messagebox.showinfo("Succès", "Retour effectué.")
-            self.refresh_emprunts()
-            self._filter_users()
-            self._filter_books()
-        else:
-            messagebox.showerror("Erreur", "Retour impossible.")
+
+        def termine(retourne, motif):
+            if retourne:
+                messagebox.showinfo("Succès", "Retour effectué.")
+                self.refresh_emprunts()
+                self._filter_users()
+                self._filter_books()
+            else:
+                messagebox.showerror("Erreur", motif or "Retour impossible.")
+        self.ecrire(self.biblio.retourner_livre, id_emprunt, au_succes=termine)
 
 
     # --- Onglet Statistiques & Historique ---
@@ -538,11 +729,11 @@ class BibliothequeApp:
         self.history_tree.pack(fill=tk.BOTH, expand=True)
 
     def update_stats(self):
+        # Calculé en SQL sur la connexion en lecture seule, sans parcourir la mémoire
         rapport = self.biblio.generer_rapport()
-
-        emprunts_en_cours = sum(1 for e in self.biblio.emprunts.values() if e.statut is True)
-        utilisateurs_bloques = sum(1 for u in self.biblio.utilisateurs.values() if hasattr(u, 'est_bloque') and u.est_bloque())
-        total_amendes = sum(self.biblio.calculer_amende(e.id) for e in self.biblio.emprunts_en_retard())
+        emprunts_en_cours = rapport["emprunts_en_cours"]
+        utilisateurs_bloques = rapport["utilisateurs_bloques"]
+        total_amendes = rapport["amendes_totales"]
 
         if hasattr(self, 'stats_labels'):
             self.stats_labels["total_livres"].config(text=str(rapport.get('total_livres', 0)))
@@ -560,7 +751,7 @@ class BibliothequeApp:
             self.history_tree.delete(row)
 
         transactions = []
-        for emp in self.biblio.emprunts.values():
+        for emp in self._emprunts_affiches():
             user = self.biblio.utilisateurs.get(emp.id_utilisateur)
             livre = self.biblio.catalogue.get(emp.id_livre)
             if not user or not livre:
@@ -632,12 +823,13 @@ class BibliothequeApp:
                 messagebox.showerror("Erreur", "Les mots de passe ne correspondent pas.")
                 return
 
-            if self.biblio.changer_mot_de_passe(username, nouveau):
-                self.biblio.sauvegarder_donnees()
-                messagebox.showinfo("Succès", "Mot de passe modifié avec succès.")
-                fen.destroy()
-            else:
-                messagebox.showerror("Erreur", "Erreur lors du changement de mot de passe.")
+            def termine(change, motif):
+                if change:
+                    messagebox.showinfo("Succès", "Mot de passe modifié avec succès.")
+                    fen.destroy()
+                else:
+                    messagebox.showerror("Erreur", "Erreur lors du changement de mot de passe.")
+            self.ecrire(self.biblio.changer_mot_de_passe, username, nouveau, au_succes=termine)
 
         ttk.Button(frame, text="Valider", command=valider_changement).pack(pady=10)
 
@@ -650,7 +842,7 @@ def show_login():
 
     Path("data").mkdir(exist_ok=True)
     biblio = Bibliotheque(nom="Bibliothèque Centrale", adresse="Ouagadougou")
-    biblio.charger_donnees()
+    print(biblio.description_profil_sqlite())
 
     username_var = tk.StringVar()
     password_var = tk.StringVar()
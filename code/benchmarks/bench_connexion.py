@@ -0,0 +1,113 @@
+"""Compare le débit (ops/s) d'une connexion ouverte par appel et de la connexion partagée.
+
+Usage (depuis le dossier code/) :
+    python -m benchmarks.bench_connexion [nombre_operations]
+"""
+import sys
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import classes.Livre as module_livre
+from classes.Livre import Livre
+from classes.Connexion import obtenir_gestionnaire
+
+REQUETE = """
+    INSERT OR REPLACE INTO livres
+    (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible, date_ajout)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def preparer_base(chemin: Path):
+    conn = sqlite3.connect(chemin)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS livres (
+            isbn TEXT PRIMARY KEY, titre TEXT, auteur TEXT, editeur TEXT,
+            annee_publication INTEGER, categorie TEXT, nombre_pages INTEGER,
+            disponible INTEGER, date_ajout TEXT
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+def livres_de_test(n: int):
+    return [Livre(f"BENCH-{i:07d}", f"Titre {i}", f"Auteur {i % 500}", "Éditeur",
+                  2000 + i % 25, "Roman", 200) for i in range(n)]
+
+
+def avant(chemin: Path, livres) -> float:
+    """Ancien comportement : connect / execute / commit / close à chaque appel."""
+    debut = time.perf_counter()
+    for livre in livres:
+        conn = sqlite3.connect(chemin)
+        cursor = conn.cursor()
+        cursor.execute(REQUETE, (livre.isbn, livre.titre, livre.auteur, livre.editeur,
+                                 livre.annee_publication, livre.categorie, livre.nombre_pages,
+                                 1, livre.date_ajout.strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+        conn.close()
+    return time.perf_counter() - debut
+
+
+def apres(chemin: Path, livres) -> float:
+    """Nouveau comportement : Livre.save() sur la connexion partagée."""
+    module_livre.DB_PATH = chemin
+    debut = time.perf_counter()
+    for livre in livres:
+        livre.save()
+    duree = time.perf_counter() - debut
+    obtenir_gestionnaire(chemin).fermer()
+    return duree
+
+
+def lectures_avant(chemin: Path, isbns) -> float:
+    debut = time.perf_counter()
+    for isbn in isbns:
+        conn = sqlite3.connect(chemin)
+        conn.execute("SELECT * FROM livres WHERE isbn = ?", (isbn,)).fetchone()
+        conn.close()
+    return time.perf_counter() - debut
+
+
+def lectures_apres(chemin: Path, isbns) -> float:
+    gestionnaire = obtenir_gestionnaire(chemin)
+    debut = time.perf_counter()
+    for isbn in isbns:
+        gestionnaire.executer("SELECT * FROM livres WHERE isbn = ?", (isbn,)).fetchone()
+    duree = time.perf_counter() - debut
+    gestionnaire.fermer()
+    return duree
+
+
+def afficher(libelle: str, n: int, t_avant: float, t_apres: float):
+    print(libelle)
+    print(f"  connexion par appel : {n / t_avant:10.0f} ops/s ({t_avant:.3f} s)")
+    print(f"  connexion partagée  : {n / t_apres:10.0f} ops/s ({t_apres:.3f} s)")
+    print(f"  gain                : x{t_avant / t_apres:.2f}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    livres = livres_de_test(n)
+    with tempfile.TemporaryDirectory() as dossier:
+        base_avant = Path(dossier) / "avant.db"
+        base_apres = Path(dossier) / "apres.db"
+        preparer_base(base_avant)
+        preparer_base(base_apres)
+
+        t_avant = avant(base_avant, livres)
+        t_apres = apres(base_apres, livres)
+        isbns = [livre.isbn for livre in livres]
+        l_avant = lectures_avant(base_avant, isbns)
+        l_apres = lectures_apres(base_apres, isbns)
+
+    # Les écritures restent dominées par le fsync de chaque commit
+    afficher(f"{n} sauvegardes de livres (un commit chacune)", n, t_avant, t_apres)
+    afficher(f"{n} lectures de livre par ISBN", n, l_avant, l_apres)
+
+
+if __name__ == "__main__":
+    main()
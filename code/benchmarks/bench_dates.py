@@ -0,0 +1,67 @@
+"""Chargement et requêtes de dates sur une grande table d'emprunts (dates en secondes Unix).
+
+Usage (depuis le dossier code/) :
+    python -m benchmarks.bench_dates [nb_livres] [nb_emprunts]
+
+Par défaut : 100 000 livres, 1 000 000 d'emprunts (base générée comme dans
+bench_instantane). Mesure le démarrage sans instantané dans les deux modes
+de chargement, puis les requêtes de retards, d'historique par période et
+le rapport mensuel, avec leur plan d'exécution.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.bench_instantane import generer_base
+from classes.Bibliotheque import Bibliotheque
+
+
+def chronometrer(fonction, repetitions: int = 20) -> float:
+    """Durée moyenne d'un appel, en millisecondes."""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions * 1000
+
+
+def plan(biblio: Bibliotheque, sql: str, params=()) -> str:
+    return " | ".join(row[3] for row in biblio.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def main():
+    nb_livres = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    nb_emprunts = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    dossier_initial = os.getcwd()
+    os.environ["BIBLIOTHEQUE_INSTANTANE"] = "0"
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        try:
+            os.mkdir("data")
+            generer_base("data/bibliotheque.db", nb_livres, nb_emprunts)
+            print(f"Base générée : {nb_livres} livres, {nb_emprunts} emprunts")
+
+            for mode in ("complet", "actifs"):
+                debut = time.perf_counter()
+                biblio = Bibliotheque(mode_chargement=mode)
+                print(f"démarrage mode {mode:8s}: {time.perf_counter() - debut:6.2f} s "
+                      f"({len(biblio.emprunts)} emprunts en mémoire)")
+
+            retards = biblio.emprunts_en_retard()
+            print(f"emprunts_en_retard    : {chronometrer(biblio.emprunts_en_retard):7.2f} ms ({len(retards)})")
+            print("    " + plan(biblio, "SELECT id FROM emprunts WHERE statut = 1 AND date_retour_prevue < ? "
+                                    "ORDER BY date_retour_prevue", (int(time.time()),)))
+
+            periode = dict(debut=datetime(2017, 1, 1), fin=datetime(2017, 2, 1), limite=500)
+            print(f"historique (1 mois)   : {chronometrer(lambda: biblio.historique_emprunts(**periode)):7.2f} ms")
+            print(f"rapport_mensuel(2017) : {chronometrer(lambda: biblio.rapport_mensuel(2017), 5):7.2f} ms")
+            print("    " + plan(biblio, "SELECT COUNT(*) FROM emprunts WHERE date_emprunt >= ? AND date_emprunt < ?",
+                                (0, 1)))
+            biblio.fermer_connexion()
+        finally:
+            os.chdir(dossier_initial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Filtres de l'onglet Emprunts : parcours des chaînes concaténées contre index de trigrammes.
+
+Usage (depuis le dossier code/) :
+    python -m benchmarks.bench_filtres [nb_livres] [nb_utilisateurs]
+
+Par défaut : 100 000 livres et 50 000 utilisateurs en mémoire (graine
+fixe). Pour chaque motif, compare le parcours de l'ancien filtre, la
+liste de suggestions (LIMITE_SUGGESTIONS premières correspondances) et
+l'ensemble complet des correspondances donné par l'index ; puis le calcul
+des comptes par facette (catalogue entier et restreint à une recherche)
+contre un parcours par facette.
+"""
+import random
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from benchmarks.bench_recherche import MOTS, AUTEURS, CATEGORIES, chronometrer
+from operator import attrgetter
+
+from classes.Bibliotheque import Livre, Utilisateur
+from classes.Facettes import Facettes, FACETTES_LIVRES
+from classes.IndexRecherche import DictionnaireIndexe
+from classes.Normalisation import normaliser
+
+LIMITE_SUGGESTIONS = 200
+PRENOMS = ("Awa Fatou Aminata Mariam Salif Issa Moussa Adama Ousmane Rasmané Inoussa Alizèta "
+           "Claire Jean Pierre Marie Paul Sophie Luc Hélène").split()
+
+
+def texte_livre(livre):
+    return f"{livre.titre} {livre.auteur} {livre.isbn}"
+
+
+def texte_utilisateur(utilisateur):
+    return f"{utilisateur.nom} {utilisateur.prenom} {utilisateur.numero_carte}"
+
+
+def parcours(dictionnaire, texte, motif):
+    """Ancien filtre : chaîne concaténée puis normalisée à chaque comparaison."""
+    motif = normaliser(motif)
+    return [cle for cle, objet in list(dictionnaire.items()) if motif in normaliser(texte(objet))]
+
+
+def suggestions(dictionnaire, motif):
+    return list(islice(dictionnaire.index.correspondances(motif), LIMITE_SUGGESTIONS))
+
+
+def main():
+    nb_livres = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    nb_utilisateurs = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    hasard = random.Random(42)
+
+    debut = time.perf_counter()
+    catalogue = DictionnaireIndexe(attrgetter("cle_recherche"), facettes=Facettes(FACETTES_LIVRES))
+    for i in range(nb_livres):
+        isbn = f"978{i:010d}"
+        catalogue[isbn] = Livre(isbn, " ".join(hasard.sample(MOTS, hasard.randint(2, 5))).capitalize(),
+                                f"{hasard.choice(AUTEURS)} {hasard.choice(AUTEURS)}",
+                                f"Éditions {hasard.choice(AUTEURS)} {hasard.randint(1, 40)}",
+                                1900 + i % 125, hasard.choice(CATEGORIES))
+        catalogue[isbn].disponible = hasard.random() > 0.2
+    utilisateurs = DictionnaireIndexe(attrgetter("cle_recherche"))
+    for i in range(nb_utilisateurs):
+        numero = f"C{i:06d}"
+        utilisateurs[numero] = Utilisateur(numero, hasard.choice(AUTEURS), hasard.choice(PRENOMS), "")
+    print(f"{nb_livres} livres, {nb_utilisateurs} utilisateurs indexés en {time.perf_counter() - debut:.1f} s")
+
+    print(f"{'motif':22s} {'parcours':>10s} {'suggestions':>12s} {'ensemble':>10s}  correspondances")
+    for nom, dictionnaire, texte, motifs in (
+            ("livres", catalogue, texte_livre, ("rnier", "miserables", "SOCIÉTÉ", "guerre paix", "0004217", "ou", "zzz")),
+            ("utilisateurs", utilisateurs, texte_utilisateur, ("rnier", "rasmane", "alizeta", "C0123", "ki-zerbo", "a", "zzz"))):
+        for motif in motifs:
+            attendu = parcours(dictionnaire, texte, motif)
+            assert dictionnaire.index.rechercher(motif) == set(attendu), motif
+            temps_parcours = chronometrer(lambda: parcours(dictionnaire, texte, motif), 3)
+            temps_suggestions = chronometrer(lambda: suggestions(dictionnaire, motif))
+            temps_ensemble = chronometrer(lambda: dictionnaire.index.rechercher(motif))
+            print(f"{nom[:5]} {motif!r:16s} {temps_parcours:8.2f} ms {temps_suggestions:9.3f} ms "
+                  f"{temps_ensemble:8.3f} ms  {len(attendu)}")
+
+    print(f"\n{'facettes':22s} {'parcours':>10s} {'moteur':>12s}")
+    for motif in (None, "rnier", "guerre paix", "ou"):
+        parmi = catalogue.index.rechercher(motif) if motif else None
+        livres = [catalogue[isbn] for isbn in parmi] if motif else list(catalogue.values())
+        temps_parcours = chronometrer(lambda: {nom: Counter(map(extraire, livres))
+                                               for nom, extraire in FACETTES_LIVRES.items()}, 3)
+        temps_moteur = chronometrer(lambda: catalogue.facettes.comptes(parmi))
+        print(f"{motif or '(tout)'!r:22s} {temps_parcours:8.2f} ms {temps_moteur:9.3f} ms  {len(livres)} livres")
+    # Prêt puis retour : deux mises à jour incrémentales
+    livre = next(iter(catalogue.values()))
+    temps_pret = chronometrer(lambda: (setattr(livre, "disponible", False), setattr(livre, "disponible", True)), 1000)
+    print(f"prêt + retour : {temps_pret * 1000:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Démarrage de Bibliotheque avec et sans instantané binaire.
+
+Usage (depuis le dossier code/) :
+    python -m benchmarks.bench_instantane [nb_livres] [nb_emprunts]
+
+Par défaut : 100 000 livres, 1 000 000 d'emprunts (dont un par livre sur
+vingt encore en cours), 10 000 utilisateurs. La base est générée dans un
+dossier temporaire ; le cache disque du système reste chaud entre les
+mesures, seul le coût d'hydratation est comparé.
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from classes.Bibliotheque import Bibliotheque
+from classes.Connexion import vers_epoch
+from classes.Migrations import migrer
+
+
+def generer_base(chemin: str, nb_livres: int, nb_emprunts: int, nb_utilisateurs: int = 10000):
+    conn = sqlite3.connect(chemin)
+    migrer(conn)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO livres (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+        ((f"978{i:010d}", f"Titre {i}", f"Auteur {i % 5000}", "Éditeur", 1950 + i % 75, f"Catégorie {i % 40}", 100 + i % 400)
+         for i in range(nb_livres)))
+    conn.executemany(
+        "INSERT INTO utilisateurs (numero_carte, nom, prenom, email, statut) VALUES (?, ?, ?, ?, 'ACTIF')",
+        ((f"U{i:06d}", f"Nom{i}", f"Prénom{i}", f"u{i}@example.com") for i in range(nb_utilisateurs)))
+
+    origine = datetime(2015, 1, 1)
+
+    def emprunts():
+        for i in range(nb_emprunts):
+            isbn = f"978{i % nb_livres:010d}"
+            debut = origine + timedelta(minutes=5 * i)
+            fin = debut + timedelta(days=14)
+            actif = i >= nb_emprunts - nb_livres and (i % nb_livres) % 20 == 0
+            yield (f"U{i % nb_utilisateurs:06d}", isbn, vers_epoch(debut), vers_epoch(fin),
+                   None if actif else vers_epoch(debut + timedelta(days=10)), 1 if actif else 0)
+
+    conn.executemany(
+        "INSERT INTO emprunts (id_utilisateur, id_livre, date_emprunt, date_retour_prevue, date_retour_effective, statut)"
+        " VALUES (?, ?, ?, ?, ?, ?)", emprunts())
+    conn.commit()
+    conn.close()
+
+
+def demarrer(mode: str, instantane: bool) -> float:
+    os.environ["BIBLIOTHEQUE_INSTANTANE"] = "1" if instantane else "0"
+    debut = time.perf_counter()
+    biblio = Bibliotheque(mode_chargement=mode)
+    duree = time.perf_counter() - debut
+    assert biblio.catalogue
+    return duree, biblio
+
+
+def main():
+    nb_livres = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    nb_emprunts = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    dossier_initial = os.getcwd()
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        try:
+            os.mkdir("data")
+            debut = time.perf_counter()
+            generer_base("data/bibliotheque.db", nb_livres, nb_emprunts)
+            print(f"Base générée : {nb_livres} livres, {nb_emprunts} emprunts "
+                  f"({time.perf_counter() - debut:.1f} s)")
+
+            for mode in ("complet", "actifs"):
+                sans, biblio = demarrer(mode, instantane=False)
+                debut = time.perf_counter()
+                biblio.config["instantane_demarrage"] = True
+                biblio.fermer_connexion()
+                ecriture = time.perf_counter() - debut
+                avec, biblio = demarrer(mode, instantane=True)
+                taille = os.path.getsize(biblio.chemin_instantane) / 1e6
+                biblio.config["instantane_demarrage"] = False
+                biblio.fermer_connexion()
+                os.remove(biblio.chemin_instantane)
+                print(f"mode {mode:8s}: SQL {sans:6.2f} s | instantané {avec:6.2f} s "
+                      f"(x{sans / avec:.1f}, écriture {ecriture:.2f} s, {taille:.0f} Mo)")
+        finally:
+            os.chdir(dossier_initial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Pages par clé (keyset) contre LIMIT / OFFSET, et parcours complet en mémoire bornée.
+
+Usage (depuis le dossier code/) :
+    python -m benchmarks.bench_pagination [nb_livres] [nb_emprunts]
+
+Par défaut : 100 000 livres et 1 000 000 d'emprunts (base de
+bench_instantane). Pour la première, la médiane et la dernière page,
+compare Bibliotheque.page_emprunts / page_livres (clé de la page
+précédente) à la même page lue par OFFSET, puis Catalogue.page_livres
+(index trié en mémoire). Mesure enfin le parcours de tous les emprunts
+page par page et la mémoire Python maximale, contre un fetchall.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_instantane import generer_base
+from classes.Bibliotheque import Bibliotheque
+from classes.Catalogue import Catalogue
+from classes.Pagination import ORDRES, parcourir
+
+LIMITE = 200
+
+
+def chronometrer(fonction, repetitions: int = 20) -> float:
+    """Durée moyenne d'un appel, en millisecondes."""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions * 1000
+
+
+def cle_a_position(conn, table: str, ordre: str, position: int):
+    """Clé de la ligne qui précède `position` dans l'ordre `ordre` (None pour la première page)."""
+    if position == 0:
+        return None
+    colonnes = ORDRES[table][ordre]
+    row = conn.execute(f"SELECT {', '.join(colonnes)} FROM {table} ORDER BY {', '.join(colonnes)} "
+                       "LIMIT 1 OFFSET ?", (position - 1,)).fetchone()
+    return tuple(row)
+
+
+def comparer(biblio, table: str, ordre: str, lire_page, total: int):
+    conn = biblio.lecteur.connexion()
+    colonnes = ", ".join(ORDRES[table][ordre])
+    for nom, position in (("première", 0), ("médiane", total // 2), ("dernière", max(total - LIMITE, 0))):
+        apres = cle_a_position(conn, table, ordre, position)
+        cle = chronometrer(lambda: lire_page(apres, LIMITE, ordre=ordre))
+        decalage = chronometrer(lambda: conn.execute(f"SELECT * FROM {table} ORDER BY {colonnes} LIMIT ? OFFSET ?",
+                                                     (LIMITE, position)).fetchall(), 5)
+        print(f"{table + ' par ' + ordre:28s} {nom:9s} {cle:8.2f} ms {decalage:10.2f} ms")
+
+
+def main():
+    nb_livres = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    nb_emprunts = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    dossier_initial = os.getcwd()
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        try:
+            os.mkdir("data")
+            debut = time.perf_counter()
+            generer_base("data/bibliotheque.db", nb_livres, nb_emprunts)
+            print(f"Base générée : {nb_livres} livres, {nb_emprunts} emprunts ({time.perf_counter() - debut:.1f} s)")
+            os.environ["BIBLIOTHEQUE_INSTANTANE"] = "0"
+            biblio = Bibliotheque(mode_chargement="actifs")
+
+            print(f"{'liste':28s} {'page':9s} {'par clé':>11s} {'par OFFSET':>13s}")
+            comparer(biblio, "emprunts", "id", biblio.page_emprunts, nb_emprunts)
+            comparer(biblio, "livres", "titre", biblio.page_livres, nb_livres)
+
+            catalogue = Catalogue()
+            for livre in Catalogue.charger_tous():
+                catalogue.ajouter_livre(livre)
+            debut = time.perf_counter()
+            _, suivante = catalogue.page_livres(limite=LIMITE, ordre="titre")
+            print(f"Catalogue (mémoire) : index trié par titre construit en {(time.perf_counter() - debut) * 1000:.0f} ms")
+            milieu = catalogue._index_trie("titre").page(None, nb_livres // 2)[1]
+            print(f"{'catalogue par titre':28s} {'médiane':9s} "
+                  f"{chronometrer(lambda: catalogue.page_livres(milieu, LIMITE, ordre='titre')):8.2f} ms")
+
+            tracemalloc.start()
+            debut = time.perf_counter()
+            nombre = sum(1 for _ in parcourir(biblio.page_emprunts, limite=1000))
+            duree = time.perf_counter() - debut
+            pic = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            print(f"Parcours par pages de 1000 : {nombre} emprunts en {duree:.1f} s, pic {pic / 1e6:.1f} Mo")
+            debut = time.perf_counter()
+            lignes = biblio.lecteur.connexion().execute("SELECT * FROM emprunts ORDER BY id").fetchall()
+            duree = time.perf_counter() - debut
+            pic = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"fetchall                    : {len(lignes)} lignes en {duree:.1f} s, pic {pic / 1e6:.1f} Mo")
+            del lignes
+            biblio.fermer_connexion()
+        finally:
+            os.chdir(dossier_initial)
+
+
+if __name__ == "__main__":
+    main()
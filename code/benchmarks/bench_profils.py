@@ -0,0 +1,49 @@
+"""Latence d'un cycle emprunt + retour selon le profil SQLite.
+
+Usage (depuis le dossier code/) :
+    python -m benchmarks.bench_profils [nombre_emprunts]
+"""
+import os
+import sys
+import statistics
+import tempfile
+import time
+
+from classes.Bibliotheque import Bibliotheque, Livre, Utilisateur
+from classes.Connexion import PROFILS_PRAGMA
+
+
+def mesurer(profil: str, n: int) -> list:
+    dossier_initial = os.getcwd()
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        try:
+            biblio = Bibliotheque(profil_sqlite=profil)
+            print(biblio.description_profil_sqlite())
+            biblio.inscrire_utilisateur(Utilisateur("U001", "Bench", "Desk", "desk@example.com"))
+            for i in range(n):
+                biblio.ajouter_livre(Livre(f"BENCH-{i:06d}", f"Titre {i}", "Auteur"))
+
+            latences = []
+            for i in range(n):
+                debut = time.perf_counter()
+                id_emprunt = biblio.emprunter_livre("U001", f"BENCH-{i:06d}")
+                biblio.retourner_livre(id_emprunt)
+                latences.append(time.perf_counter() - debut)
+            biblio.fermer_connexion()
+            return latences
+        finally:
+            os.chdir(dossier_initial)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    for profil in PROFILS_PRAGMA:
+        latences = sorted(mesurer(profil, n))
+        p95 = latences[int(len(latences) * 0.95) - 1]
+        print(f"  {n} emprunts+retours : médiane {statistics.median(latences) * 1000:.2f} ms, "
+              f"p95 {p95 * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Recherche dans le catalogue : parcours Python (`in`), index inversé en mémoire (BM25) et index FTS5.
+
+Usage (depuis le dossier code/) :
+    python -m benchmarks.bench_recherche [nb_livres]
+
+Par défaut : 100 000 livres aux titres composés de mots français tirés au
+hasard (graine fixe). Compare, pour quelques requêtes, le parcours de
+Catalogue.rechercher_par_titre sur le catalogue en mémoire,
+Catalogue.rechercher_avance (index inversé, préfixes, BM25, 20 résultats) et
+Catalogue.rechercher (FTS5, préfixes, classement bm25, 20 résultats).
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from classes.Catalogue import Catalogue
+from classes.Migrations import migrer
+
+MOTS = ("amour guerre paix nuit jour soleil lune mer terre ciel feu eau vent histoire roman secret "
+        "voyage retour royaume enfant père mère frère sœur maison jardin forêt montagne rivière ville "
+        "village chemin étoile ombre lumière silence mémoire rêve destin misérables étranger société "
+        "révolution liberté justice empire peuple prince reine roi chevalier dragon sorcier école "
+        "science philosophie mathématiques physique chimie biologie économie politique droit").split()
+AUTEURS = ("Hugo Zola Camus Sartre Duras Balzac Flaubert Proust Sand Verne Dumas Stendhal Colette "
+           "Senghor Césaire Kourouma Ouologuem Bâ Beti Laye Diop Ki-Zerbo Garnier Rousseau Voltaire").split()
+CATEGORIES = ("Roman", "Poésie", "Théâtre", "Essai", "Histoire", "Sciences", "Droit", "Jeunesse")
+
+
+def generer_catalogue(chemin: str, nb_livres: int):
+    hasard = random.Random(42)
+    conn = sqlite3.connect(chemin)
+    migrer(conn)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO livres (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+        ((f"978{i:010d}", " ".join(hasard.sample(MOTS, hasard.randint(2, 5))).capitalize(),
+          f"{hasard.choice(AUTEURS)} {hasard.choice(AUTEURS)}", f"Éditions {hasard.choice(AUTEURS)}",
+          1900 + i % 125, hasard.choice(CATEGORIES), 80 + i % 600)
+         for i in range(nb_livres)))
+    conn.commit()
+    conn.close()
+
+
+def chronometrer(fonction, repetitions: int = 20) -> float:
+    """Durée moyenne d'un appel, en millisecondes."""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions * 1000
+
+
+def main():
+    nb_livres = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dossier_initial = os.getcwd()
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        try:
+            os.mkdir("data")
+            debut = time.perf_counter()
+            generer_catalogue("data/bibliotheque.db", nb_livres)
+            print(f"Catalogue généré et indexé : {nb_livres} livres ({time.perf_counter() - debut:.1f} s)")
+
+            catalogue = Catalogue()
+            for livre in Catalogue.charger_tous():
+                catalogue.ajouter_livre(livre)
+
+            print(f"{'requête':28s} {'parcours':>10s} {'index':>10s} {'FTS5':>10s}  résultats (FTS5, premier ; index, premier)")
+            for requete in ("misérables", "guerre paix", "mise", "societe", "dragon roi hugo", "zzz"):
+                parcours = chronometrer(lambda: catalogue.rechercher_par_titre(requete), 5)
+                index = chronometrer(lambda: catalogue.rechercher_avance(requete))
+                fts = chronometrer(lambda: catalogue.rechercher(requete))
+                resultats = catalogue.rechercher(requete)
+                premier = resultats[0].titre if resultats else "-"
+                classes = catalogue.rechercher_avance(requete)
+                premier_index = classes[0].titre if classes else "-"
+                print(f"{requete:28s} {parcours:8.2f} ms {index:8.2f} ms {fts:8.2f} ms  "
+                      f"{len(resultats):3d}  {premier} ; {premier_index}")
+        finally:
+            os.chdir(dossier_initial)
+
+
+if __name__ == "__main__":
+    main()
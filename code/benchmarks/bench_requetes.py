@@ -0,0 +1,70 @@
+"""Recherche multicritère du catalogue : filtrages successifs contre plan par sélectivité.
+
+Usage (depuis le dossier code/) :
+    python -m benchmarks.bench_requetes [nb_livres]
+
+Par défaut : 100 000 livres (catalogue de bench_recherche). Pour quelques
+combinaisons de critères, compare l'ancien Catalogue.recherche_avancee (un
+filtrage de la liste par critère, dans l'ordre du dictionnaire, valeurs
+normalisées à chaque comparaison) au plan par index d'égalité et
+d'intervalles ; affiche le plan choisi (Catalogue.explain).
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_recherche import generer_catalogue, chronometrer
+from classes.Catalogue import Catalogue
+from classes.Normalisation import normaliser
+
+REQUETES = (
+    {"categorie": "roman"},
+    {"categorie": "roman", "auteur": "hugo zola"},
+    {"editeur": "editions camus", "categorie": "poesie", "annee_publication": 1987},
+    {"categorie": "essai", "annee_publication": (1990, 1999)},
+    {"annee_publication": (2000, None), "nombre_pages": (None, 100), "disponible": True},
+)
+
+
+def filtrages_successifs(catalogue, criteres: dict):
+    """Ancienne recherche_avancee (sans les intervalles, qu'elle ne savait pas traiter)."""
+    resultats = list(catalogue.livres.values())
+    for cle, valeur in criteres.items():
+        motif = normaliser(valeur)
+        resultats = [livre for livre in resultats if normaliser(getattr(livre, cle, "")) == motif]
+    return resultats
+
+
+def main():
+    nb_livres = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dossier_initial = os.getcwd()
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        try:
+            os.mkdir("data")
+            generer_catalogue("data/bibliotheque.db", nb_livres)
+            catalogue = Catalogue()
+            debut = time.perf_counter()
+            for livre in Catalogue.charger_tous():
+                catalogue.ajouter_livre(livre)
+            print(f"Catalogue chargé et indexé : {nb_livres} livres ({time.perf_counter() - debut:.1f} s)")
+
+            for criteres in REQUETES:
+                resultats = catalogue.recherche_avancee(criteres)
+                plan = chronometrer(lambda: catalogue.recherche_avancee(criteres))
+                intervalles = any(isinstance(valeur, tuple) for valeur in criteres.values())
+                if intervalles:
+                    ancien = "   (non géré)"
+                else:
+                    assert len(filtrages_successifs(catalogue, criteres)) == len(resultats)
+                    ancien = f"{chronometrer(lambda: filtrages_successifs(catalogue, criteres), 3):10.2f} ms"
+                print(f"\n{criteres}\n  filtrages successifs : {ancien}   plan : {plan:8.2f} ms   "
+                      f"({len(resultats)} livres)")
+                print("  " + catalogue.explain(criteres).replace("\n", "\n  "))
+        finally:
+            os.chdir(dossier_initial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from classes.Connexion import GestionnaireConnexion, vers_epoch
+from classes.Migrations import texte_vers_epoch
+
+# Archivage des emprunts clos : ils quittent la table chaude `emprunts` pour
+# une base par année d'emprunt (data/archive_AAAA.db), attachée (ATTACH) à
+# la demande. Les lectures d'historique sur une plage archivée interrogent
+# la base principale et les archives concernées dans une même requête.
+# Le schéma d'une archive est versionné par son PRAGMA user_version
+# (1 : dates en secondes Unix, comme la table principale).
+
+REPERTOIRE_ARCHIVES = Path("data")
+
+COLONNES_EMPRUNTS = ("id", "id_utilisateur", "id_livre", "date_emprunt", "date_retour_prevue",
+                     "date_retour_effective", "statut", "version")
+
+SCHEMA_ARCHIVE = """
+    CREATE TABLE IF NOT EXISTS {schema}.emprunts (
+        id INTEGER PRIMARY KEY,
+        id_utilisateur TEXT NOT NULL,
+        id_livre TEXT NOT NULL,
+        date_emprunt INTEGER NOT NULL,
+        date_retour_prevue INTEGER NOT NULL,
+        date_retour_effective INTEGER,
+        statut INTEGER NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+"""
+INDEX_ARCHIVE = (
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_archive_utilisateur ON emprunts(id_utilisateur)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_archive_livre ON emprunts(id_livre)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_archive_date_emprunt ON emprunts(date_emprunt)",
+)
+
+VERSION_ARCHIVE = 1
+
+_MOTIF_ARCHIVE = re.compile(r"^archive_(\d{4})\.db$")
+
+
+def chemin_archive(annee: int, repertoire=REPERTOIRE_ARCHIVES) -> Path:
+    return Path(repertoire) / f"archive_{annee}.db"
+
+
+def annees_archivees(repertoire=REPERTOIRE_ARCHIVES) -> list:
+    """Années pour lesquelles une base d'archive existe, dans l'ordre croissant."""
+    repertoire = Path(repertoire)
+    if not repertoire.is_dir():
+        return []
+    return sorted(int(m.group(1)) for m in (_MOTIF_ARCHIVE.match(f.name) for f in repertoire.iterdir()) if m)
+
+
+def _attacher(conn: sqlite3.Connection, annee: int, repertoire) -> str:
+    schema = f"archive_{annee}"
+    attachees = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if schema not in attachees:
+        conn.execute("ATTACH DATABASE ? AS " + schema, (str(chemin_archive(annee, repertoire)),))
+    if conn.execute(f"PRAGMA {schema}.user_version").fetchone()[0] < VERSION_ARCHIVE:
+        _migrer_archive(conn, schema)
+    return schema
+
+
+def _migrer_archive(conn: sqlite3.Connection, schema: str):
+    """Crée le schéma d'une archive neuve, ou convertit une archive à dates texte."""
+    conn.execute("BEGIN")
+    try:
+        existante = conn.execute(
+            f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'emprunts'").fetchone()
+        if existante:
+            conn.execute(f"ALTER TABLE {schema}.emprunts RENAME TO emprunts_texte")
+        conn.execute(SCHEMA_ARCHIVE.format(schema=schema))
+        if existante:
+            dates = {c: texte_vers_epoch(c) for c in ("date_emprunt", "date_retour_prevue", "date_retour_effective")}
+            conn.execute(f"""
+                INSERT INTO {schema}.emprunts ({", ".join(COLONNES_EMPRUNTS)})
+                SELECT {", ".join(dates.get(c, c) for c in COLONNES_EMPRUNTS)} FROM {schema}.emprunts_texte
+            """)
+            # supprime aussi les index de l'ancienne table, recréés ci-dessous
+            conn.execute(f"DROP TABLE {schema}.emprunts_texte")
+        for ddl in INDEX_ARCHIVE:
+            conn.execute(ddl.format(schema=schema))
+        conn.execute(f"PRAGMA {schema}.user_version = {VERSION_ARCHIVE}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+@contextmanager
+def archives_attachees(gestionnaire: GestionnaireConnexion, annees, repertoire=REPERTOIRE_ARCHIVES,
+                       creer: bool = False):
+    """Attache les archives des années données le temps du bloc ; produit la liste des schémas.
+
+    ATTACH et DETACH sont interdits dans une transaction : les écritures en
+    attente sont validées avant.
+    """
+    conn = gestionnaire.connexion()
+    gestionnaire.valider()
+    schemas = []
+    try:
+        for annee in annees:
+            if creer or chemin_archive(annee, repertoire).exists():
+                schemas.append(_attacher(conn, annee, repertoire))
+        yield schemas
+    finally:
+        if conn.in_transaction and not gestionnaire.en_transaction():
+            conn.commit()
+        for schema in schemas:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+
+def deplacer_vers_archives(gestionnaire: GestionnaireConnexion, avant: datetime,
+                           repertoire=REPERTOIRE_ARCHIVES) -> dict:
+    """Déplace les emprunts clos (retournés avant `avant`) vers les archives annuelles.
+
+    Retourne {année: nombre d'emprunts archivés}. Chaque année est traitée
+    dans sa propre transaction : copie (INSERT OR IGNORE) puis suppression
+    dans la table chaude. En WAL, le commit n'est pas atomique entre les deux
+    fichiers ; une interruption laisse au pire un emprunt en double, que le
+    passage suivant supprime de la table chaude.
+    """
+    conn = gestionnaire.connexion()
+    limite = vers_epoch(avant)
+    annee_emprunt = "strftime('%Y', date_emprunt, 'unixepoch', 'localtime')"
+    annees = [int(row[0]) for row in conn.execute(f"""
+        SELECT DISTINCT {annee_emprunt} FROM emprunts
+        WHERE statut = 0 AND date_retour_effective < ?
+    """, (limite,))]
+    colonnes = ", ".join(COLONNES_EMPRUNTS)
+    archives = {}
+    with archives_attachees(gestionnaire, annees, repertoire, creer=True) as schemas:
+        for annee, schema in zip(annees, schemas):
+            filtre = f"statut = 0 AND date_retour_effective < ? AND {annee_emprunt} = ?"
+            params = (limite, f"{annee:04d}")
+            with gestionnaire.transaction(ecriture=True):
+                conn.execute(f"INSERT OR IGNORE INTO {schema}.emprunts ({colonnes}) "
+                             f"SELECT {colonnes} FROM main.emprunts WHERE {filtre}", params)
+                archives[annee] = conn.execute(f"DELETE FROM main.emprunts WHERE {filtre}", params).rowcount
+    return archives
+
+
+def annees_couvertes(debut: datetime = None, fin: datetime = None, repertoire=REPERTOIRE_ARCHIVES) -> list:
+    """Années archivées qui recoupent la plage de dates d'emprunt [debut, fin)."""
+    return [annee for annee in annees_archivees(repertoire)
+            if (debut is None or annee >= debut.year) and (fin is None or annee <= fin.year)]
@@ -1,7 +1,8 @@
 from classes.Personne import Personne
-import sqlite3
 from datetime import datetime
 from pathlib import Path
+from classes.Connexion import obtenir_connexion, valider
+from classes.Migrations import migrer
 
 DB_PATH = Path("data/bibliotheque.db")
 
@@ -31,25 +32,11 @@ class Bibliothecaire(Personne):
     # --- Persistance SQLite ---
     @staticmethod
     def creer_table():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bibliothecaires (
-                id INTEGER PRIMARY KEY,
-                matricule TEXT UNIQUE,
-                nom TEXT,
-                prenom TEXT,
-                email TEXT,
-                telephone TEXT,
-                niveau_acces TEXT,
-                date_ajout TEXT
-            )
-        """)
-        conn.commit()
-        conn.close()
+        """Le schéma est géré par classes.Migrations (PRAGMA user_version)."""
+        migrer(obtenir_connexion(DB_PATH))
 
     def sauvegarder(self):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO bibliothecaires
@@ -60,16 +47,14 @@ class Bibliothecaire(Personne):
             self.email, self.telephone, self.niveau_acces,
             datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
     @staticmethod
     def charger_tous():
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM bibliothecaires")
         rows = cursor.fetchall()
-        conn.close()
         return [
             Bibliothecaire(id=row[0], matricule=row[1], nom=row[2],
                            prenom=row[3], email=row[4], telephone=row[5],
@@ -79,8 +64,7 @@ class Bibliothecaire(Personne):
 
     @staticmethod
     def supprimer(matricule: str):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM bibliothecaires WHERE matricule = ?", (matricule,))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
@@ -1,11 +1,39 @@
+import os
 import sqlite3
+import gc
+import time
 import hashlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from operator import attrgetter
 from typing import Optional
+from classes.Connexion import (obtenir_gestionnaire, PROFIL_PAR_DEFAUT, BaseOccupee, PolitiqueReessai,
+                               vers_epoch, depuis_epoch)
+from classes.Migrations import migrer, version_schema, revision_base, TABLES_JOURNALISEES
+from classes.Archivage import (COLONNES_EMPRUNTS, deplacer_vers_archives, archives_attachees,
+                                annees_archivees, annees_couvertes)
+from classes.Instantane import FICHIER_INSTANTANE, lire_instantane, ecrire_instantane
+from classes.Disponibilite import livres_divergents, reparer_disponibilite
+from classes.IndexRecherche import DictionnaireIndexe
+from classes.Facettes import Facettes, FACETTES_LIVRES, AttributSuivi
+from classes.Normalisation import cle_livre, cle_utilisateur
+from classes.Pagination import TAILLE_PAGE, page_sql
+
+# Nombre maximal de clés par requête IN lors de la synchronisation
+TAILLE_LOT_SYNCHRO = 500
+
+# Source des lignes relues (chargement, synchronisation) quand ce n'est pas la table elle-même :
+# la disponibilité des livres vient de vue_livres, calculée d'après les emprunts en cours
+SOURCES_LECTURE = {"livres": "vue_livres"}
 
 # Classes métiers minimales en interne
 class Livre:
-    def __init__(self, isbn, titre, auteur, editeur="Inconnu", annee_publication=2025, categorie="", nombre_pages=100):
+    # Prêts et retours modifient `disponible` sur place : le catalogue en est prévenu (comptes par facette)
+    disponible = AttributSuivi()
+    _observateur = None
+
+    def __init__(self, isbn, titre, auteur, editeur="Inconnu", annee_publication=2025, categorie="", nombre_pages=100,
+                 cle_recherche=None):
         self.isbn = isbn
         self.titre = titre
         self.auteur = auteur
@@ -14,6 +42,10 @@ class Livre:
         self.categorie = categorie
         self.nombre_pages = nombre_pages
         self.disponible = True
+        self.version = 0  # colonne livres.version (verrouillage optimiste)
+        # Texte normalisé des filtres, lu en base ou calculé une fois ici : un livre
+        # modifié est remplacé par un nouvel objet, titre / auteur / isbn ne changent pas sur place
+        self.cle_recherche = cle_recherche or cle_livre(titre, auteur, isbn)
 
     def est_disponible(self):
         return self.disponible
@@ -26,190 +58,572 @@ class Livre:
 
 
 class Utilisateur:
-    def __init__(self, numero_carte, nom, prenom, email, statut="ACTIF"):
+    def __init__(self, numero_carte, nom, prenom, email, statut="ACTIF", cle_recherche=None):
         self.numero_carte = numero_carte
         self.nom = nom
         self.prenom = prenom
         self.email = email
         self.statut = statut
         self.emprunts_actifs = []
+        self.cle_recherche = cle_recherche or cle_utilisateur(nom, prenom, numero_carte)
 
     def est_bloque(self):
         return self.statut.upper() == "BLOQUÉ"
 
 
+class DateEpoch:
+    """Attribut datetime conservé en secondes Unix, comme en base.
+
+    Le chargement ne crée aucun objet datetime : la conversion n'a lieu
+    qu'à la lecture de l'attribut.
+    """
+
+    def __set_name__(self, owner, nom):
+        self.attribut = "_" + nom
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return depuis_epoch(getattr(obj, self.attribut))
+
+    def __set__(self, obj, valeur):
+        setattr(obj, self.attribut, vers_epoch(valeur))
+
+
 class Emprunt:
+    date_emprunt = DateEpoch()
+    date_retour_prevue = DateEpoch()
+    date_retour_effective = DateEpoch()
+
     def __init__(self, id, id_utilisateur, id_livre, date_emprunt, date_retour_prevue,
-                 date_retour_effective=None, statut=True):
+                 date_retour_effective=None, statut=True, version=0):
         self.id = id
         self.id_utilisateur = id_utilisateur
         self.id_livre = id_livre
-        self.date_emprunt = date_emprunt
-        self.date_retour_prevue = date_retour_prevue
-        self.date_retour_effective = date_retour_effective
+        # datetime ou secondes Unix (lignes SQLite, instantané)
+        self._date_emprunt = date_emprunt if type(date_emprunt) is int else vers_epoch(date_emprunt)
+        self._date_retour_prevue = (date_retour_prevue if type(date_retour_prevue) is int
+                                    else vers_epoch(date_retour_prevue))
+        self._date_retour_effective = (date_retour_effective if type(date_retour_effective) is int
+                                       else vers_epoch(date_retour_effective))
         self.statut = statut  # True = emprunt actif, False = retourné
+        self.version = version
 
     def est_en_retard(self):
-        now = datetime.now()
-        if self.statut and self.date_retour_prevue and now > self.date_retour_prevue:
-            return True
-        return False
+        return bool(self.statut and self._date_retour_prevue is not None
+                    and time.time() > self._date_retour_prevue)
 
     def finaliser_retour(self):
         self.date_retour_effective = datetime.now()
         self.statut = False
 
 
+class ConflitConcurrence(Exception):
+    """Un autre poste a modifié la ligne depuis notre dernière lecture."""
+
+
 def hacher_mot_de_passe(mdp: str) -> str:
     return hashlib.sha256(mdp.encode()).hexdigest()
 
 
+@contextmanager
+def gc_suspendu():
+    """Suspend le ramasse-miettes cyclique pendant la création massive d'objets."""
+    actif = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if actif:
+            gc.enable()
+
+
 class Bibliotheque:
-    def __init__(self, nom="Bibliothèque Centrale", adresse="Ouagadougou"):
+    def __init__(self, nom="Bibliothèque Centrale", adresse="Ouagadougou", profil_sqlite: str = None,
+                 mode_chargement: str = None):
         self.nom = nom
         self.adresse = adresse
 
-        self.conn = sqlite3.connect("data/bibliotheque.db")
-        self.conn.row_factory = sqlite3.Row
-
-        # Dictionnaires pour stocker objets métier en mémoire
-        self.catalogue = {}       # isbn -> Livre
-        self.utilisateurs = {}    # numero_carte -> Utilisateur
-        self.emprunts = {}        # id emprunt -> Emprunt
-
         # Configuration
         self.config = {
             "max_emprunts": 5,
             "duree_emprunt": 14,  # jours
             "amende_par_jour": 0.5,
+            # Profil de PRAGMA SQLite ("desk" ou "durable"), voir classes.Connexion
+            "profil_sqlite": profil_sqlite or os.environ.get("BIBLIOTHEQUE_PROFIL_SQLITE", PROFIL_PAR_DEFAUT),
+            # "actifs" : seuls les emprunts en cours sont chargés en mémoire ;
+            # "complet" : tout l'historique (ancien comportement)
+            "mode_chargement": mode_chargement or os.environ.get("BIBLIOTHEQUE_MODE_CHARGEMENT", "actifs"),
+            # Démarrage depuis l'instantané binaire (data/bibliotheque.snapshot) s'il est à jour
+            "instantane_demarrage": os.environ.get("BIBLIOTHEQUE_INSTANTANE", "1") != "0",
+            # Attente maximale sur le verrou d'écriture d'un autre poste avant d'abandonner
+            "delai_verrou": float(os.environ.get("BIBLIOTHEQUE_DELAI_VERROU", "0.2")),  # secondes
+            "tentatives_verrou": 4,
+            # Les emprunts rendus depuis plus longtemps partent en archive (voir archiver_emprunts)
+            "conservation_emprunts_jours": 365,
         }
+        if self.config["mode_chargement"] not in ("actifs", "complet"):
+            raise ValueError(f"Mode de chargement inconnu : {self.config['mode_chargement']!r}")
+
+        # Connexion partagée (une par thread), gérée par classes.Connexion
+        self.gestionnaire = obtenir_gestionnaire("data/bibliotheque.db", profil=self.config["profil_sqlite"])
+        self.gestionnaire.changer_politique(PolitiqueReessai(delai_verrou=self.config["delai_verrou"],
+                                                             tentatives=self.config["tentatives_verrou"]))
+        # Connexions en lecture seule (mode=ro) des rapports et de l'historique, voir lecture_coherente
+        self.lecteur = obtenir_gestionnaire("data/bibliotheque.db", profil=self.config["profil_sqlite"],
+                                            lecture_seule=True)
+        self.pragmas_actifs = self.gestionnaire.pragmas()
+
+        # Dictionnaires pour stocker objets métier en mémoire
+        # catalogue et utilisateurs tiennent à jour un index de trigrammes (attribut .index)
+        self.catalogue = DictionnaireIndexe(attrgetter("cle_recherche"),       # isbn -> Livre
+                                            facettes=Facettes(FACETTES_LIVRES))
+        self.utilisateurs = DictionnaireIndexe(attrgetter("cle_recherche"))   # numero_carte -> Utilisateur
+        self.emprunts = {}        # id emprunt -> Emprunt
 
         # Comptes utilisateurs pour connexion (username -> mot de passe hashé)
         # Synchronisé avec la table SQLite "comptes"
         self.comptes = {}
 
         self.next_emprunt_id = 1
+        # Dernier numéro de séquence du journal des modifications appliqué (voir synchroniser)
+        self.revision_chargee = 0
+        self.chemin_instantane = FICHIER_INSTANTANE
+        self.repertoire_archives = self.gestionnaire.chemin.parent
+        # Motif du dernier refus dû à un autre poste (conflit ou base occupée), affiché par l'interface
+        self.dernier_conflit = None
+
+        # Unité de travail en cours : opérations inverses des modifications en mémoire
+        self._journal_annulation = []
+        self._profondeur_transaction = 0
 
         self.creer_tables()
-        self.charger_donnees()
+        if not (self.config["instantane_demarrage"] and self.charger_instantane()):
+            self.charger_donnees()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connexion du thread courant (l'interface et le thread d'écriture ont chacun la leur)."""
+        return self.gestionnaire.connexion()
 
     def creer_tables(self):
+        # Schéma versionné : une seule lecture de PRAGMA user_version si la base est à jour
+        migrer(self.conn)
         cursor = self.conn.cursor()
 
-        # Table comptes
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS comptes (
-                username TEXT PRIMARY KEY,
-                password_hash TEXT NOT NULL
-            )
-        """)
-
-        # Table livres
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS livres (
-                isbn TEXT PRIMARY KEY,
-                titre TEXT,
-                auteur TEXT,
-                editeur TEXT,
-                annee_publication INTEGER,
-                categorie TEXT,
-                nombre_pages INTEGER,
-                disponible INTEGER
-            )
-        """)
-
-        # Table utilisateurs
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS utilisateurs (
-                numero_carte TEXT PRIMARY KEY,
-                nom TEXT,
-                prenom TEXT,
-                email TEXT,
-                statut TEXT
-            )
-        """)
-
-        # Table emprunts
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS emprunts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                id_utilisateur TEXT,
-                id_livre TEXT,
-                date_emprunt TEXT,
-                date_retour_prevue TEXT,
-                date_retour_effective TEXT,
-                statut INTEGER,
-                FOREIGN KEY (id_utilisateur) REFERENCES utilisateurs(numero_carte),
-                FOREIGN KEY (id_livre) REFERENCES livres(isbn)
-            )
-        """)
-
         # Insérer admin par défaut si inexistant
         cursor.execute("SELECT COUNT(*) as count FROM comptes WHERE username = ?", ("admin",))
         if cursor.fetchone()["count"] == 0:
             mdp_hash = hacher_mot_de_passe("1234")
             cursor.execute("INSERT INTO comptes (username, password_hash) VALUES (?, ?)", ("admin", mdp_hash))
 
-        self.conn.commit()
+        self.sauvegarder_donnees()
+        # Archives d'un ancien format : converties ici, les rapports ne les ouvrent qu'en lecture seule
+        with archives_attachees(self.gestionnaire, annees_archivees(self.repertoire_archives),
+                                self.repertoire_archives):
+            pass
 
     def charger_donnees(self):
-        cursor = self.conn.cursor()
+        """(Re)charge tout l'état en mémoire ; peut être appelé plusieurs fois sans doublons."""
+        # lecture cohérente (une seule transaction), sans passes du ramasse-miettes
+        with self.gestionnaire.transaction(), gc_suspendu():
+            cursor = self.conn.cursor()
+            revision = self._lire_revision()
 
-        # Charger livres
-        cursor.execute("SELECT * FROM livres")
-        for row in cursor.fetchall():
-            livre = Livre(
-                isbn=row["isbn"],
-                titre=row["titre"],
-                auteur=row["auteur"],
-                editeur=row["editeur"],
-                annee_publication=row["annee_publication"],
-                categorie=row["categorie"],
-                nombre_pages=row["nombre_pages"]
-            )
-            livre.disponible = bool(row["disponible"])
-            self.catalogue[livre.isbn] = livre
+            self.catalogue.clear()
+            self.utilisateurs.clear()
+            self.emprunts.clear()
+            self.comptes.clear()
+
+            # Charger livres (disponibilité calculée par la vue, sans parcourir les emprunts)
+            cursor.execute("SELECT * FROM vue_livres")
+            for row in cursor.fetchall():
+                livre = self._livre_depuis_ligne(row)
+                self.catalogue[livre.isbn] = livre
+
+            # Charger utilisateurs
+            cursor.execute("SELECT * FROM utilisateurs")
+            for row in cursor.fetchall():
+                user = self._utilisateur_depuis_ligne(row)
+                self.utilisateurs[user.numero_carte] = user
 
-        # Charger utilisateurs
-        cursor.execute("SELECT * FROM utilisateurs")
-        for row in cursor.fetchall():
-            user = Utilisateur(
-                numero_carte=row["numero_carte"],
-                nom=row["nom"],
-                prenom=row["prenom"],
-                email=row["email"],
-                statut=row["statut"]
-            )
-            self.utilisateurs[user.numero_carte] = user
-
-        # Charger emprunts
-        cursor.execute("SELECT * FROM emprunts")
-        max_id = 0
-        for row in cursor.fetchall():
-            emprunt = Emprunt(
-                id=row["id"],
-                id_utilisateur=row["id_utilisateur"],
-                id_livre=row["id_livre"],
-                date_emprunt=datetime.fromisoformat(row["date_emprunt"]),
-                date_retour_prevue=datetime.fromisoformat(row["date_retour_prevue"]),
-                date_retour_effective=datetime.fromisoformat(row["date_retour_effective"]) if row["date_retour_effective"] else None,
-                statut=bool(row["statut"])
-            )
-            self.emprunts[emprunt.id] = emprunt
-            if emprunt.id > max_id:
-                max_id = emprunt.id
-            # Associe emprunt aux utilisateur et livre
-            if emprunt.id_utilisateur in self.utilisateurs:
-                if emprunt.statut:
-                    self.utilisateurs[emprunt.id_utilisateur].emprunts_actifs.append(emprunt)
-            if emprunt.id_livre in self.catalogue:
-                self.catalogue[emprunt.id_livre].disponible = not emprunt.statut
-        self.next_emprunt_id = max_id + 1
-
-        # Charger comptes
-        cursor.execute("SELECT * FROM comptes")
-        for row in cursor.fetchall():
-            self.comptes[row["username"]] = row["password_hash"]
+            # Charger emprunts : tous (mode "complet") ou seulement ceux en cours (mode "actifs"),
+            # l'historique clos restant alors dans SQLite (voir historique_emprunts)
+            mode_actifs = self.config["mode_chargement"] == "actifs"
+            if mode_actifs:
+                cursor.execute("SELECT * FROM emprunts WHERE statut = 1")
+            else:
+                cursor.execute("SELECT * FROM emprunts")
+            for row in cursor.fetchall():
+                emprunt = self._emprunt_depuis_ligne(row)
+                self.emprunts[emprunt.id] = emprunt
+                self._rattacher_emprunt(emprunt, marquer_livre=False)
+            max_id = cursor.execute("SELECT MAX(id) FROM emprunts").fetchone()[0] or 0
+            self.next_emprunt_id = max_id + 1
+
+            # Charger comptes
+            cursor.execute("SELECT * FROM comptes")
+            for row in cursor.fetchall():
+                self.comptes[row["username"]] = row["password_hash"]
+
+            self.revision_chargee = revision
+
+    def synchroniser(self) -> int:
+        """Applique les modifications faites par les autres postes depuis la dernière lecture.
+
+        Lit le journal des modifications à partir du dernier numéro de
+        séquence vu et ne relit que les lignes concernées : le coût est
+        proportionnel au nombre de changements, pas à la taille de la base.
+        Retourne le nombre de lignes appliquées (toutes si le journal a été
+        purgé au-delà de notre position et qu'un rechargement complet a eu lieu).
+        """
+        with self.gestionnaire.transaction():
+            revision = self._lire_revision()
+            if revision == self.revision_chargee:
+                return 0
+            cursor = self.conn.cursor()
+            seq_purgee = cursor.execute("SELECT seq_max FROM journal_purge WHERE id = 1").fetchone()[0]
+            if self.revision_chargee < seq_purgee:
+                self.charger_donnees()
+                return len(self.catalogue) + len(self.utilisateurs) + len(self.emprunts) + len(self.comptes)
+
+            cles = {table: set() for table in TABLES_JOURNALISEES}
+            cursor.execute("SELECT nom_table, cle FROM journal_modifications WHERE seq > ? AND seq <= ?",
+                           (self.revision_chargee, revision))
+            for nom_table, cle in cursor.fetchall():
+                cles[nom_table].add(cle)
+
+            nb_lignes = 0
+            # Livres et utilisateurs d'abord : les emprunts s'y rattachent
+            for isbn, row in self._lignes_journalisees("livres", cles["livres"]):
+                self.catalogue.pop(isbn, None)
+                if row is not None:
+                    self.catalogue[isbn] = self._livre_depuis_ligne(row)
+                nb_lignes += 1
+
+            for numero, row in self._lignes_journalisees("utilisateurs", cles["utilisateurs"]):
+                ancien = self.utilisateurs.pop(numero, None)
+                if row is not None:
+                    user = self._utilisateur_depuis_ligne(row)
+                    if ancien is not None:
+                        user.emprunts_actifs = ancien.emprunts_actifs
+                    else:
+                        user.emprunts_actifs = [e for e in self.emprunts.values()
+                                                if e.statut and e.id_utilisateur == numero]
+                    self.utilisateurs[numero] = user
+                nb_lignes += 1
+
+            # Emprunts appliqués sans toucher à la disponibilité (leur ordre est quelconque) :
+            # celle des livres concernés est relue ensuite dans vue_livres, comme au chargement
+            ids = {int(cle) for cle in cles["emprunts"]}
+            livres_concernes = set()
+            for id_emprunt, row in self._lignes_journalisees("emprunts", ids):
+                ancien = self.emprunts.pop(id_emprunt, None)
+                if ancien is not None:
+                    self._detacher_emprunt(ancien, marquer_livre=False)
+                    livres_concernes.add(ancien.id_livre)
+                if row is not None:
+                    emprunt = self._emprunt_depuis_ligne(row)
+                    if emprunt.statut or self.config["mode_chargement"] == "complet":
+                        self.emprunts[emprunt.id] = emprunt
+                    self._rattacher_emprunt(emprunt, marquer_livre=False)
+                    livres_concernes.add(emprunt.id_livre)
+                    self.next_emprunt_id = max(self.next_emprunt_id, emprunt.id + 1)
+                nb_lignes += 1
+            # Les livres du journal viennent d'être relus : leur disponibilité est déjà à jour
+            for isbn, row in self._lignes_journalisees("livres", livres_concernes - cles["livres"]):
+                if row is not None and isbn in self.catalogue:
+                    self.catalogue[isbn].disponible = bool(row["disponible"])
+
+            for username, row in self._lignes_journalisees("comptes", cles["comptes"]):
+                if row is None:
+                    self.comptes.pop(username, None)
+                else:
+                    self.comptes[username] = row["password_hash"]
+                nb_lignes += 1
+
+            self.revision_chargee = revision
+            return nb_lignes
+
+    def _lignes_journalisees(self, table: str, cles):
+        """Paires (clé, ligne courante) pour les clés du journal ; ligne None si supprimée."""
+        colonne = TABLES_JOURNALISEES[table]
+        source = SOURCES_LECTURE.get(table, table)
+        cles = list(cles)
+        for i in range(0, len(cles), TAILLE_LOT_SYNCHRO):
+            lot = cles[i:i + TAILLE_LOT_SYNCHRO]
+            marqueurs = ", ".join("?" * len(lot))
+            lignes = {row[colonne]: row for row in
+                      self.conn.execute(f"SELECT * FROM {source} WHERE {colonne} IN ({marqueurs})", lot)}
+            for cle in lot:
+                yield cle, lignes.get(cle)
+
+    def _lire_revision(self) -> int:
+        return revision_base(self.conn)
+
+    def _rattacher_emprunt(self, emprunt: Emprunt, marquer_livre: bool = True):
+        """Associe un emprunt en cours à son utilisateur et marque le livre indisponible.
+
+        `marquer_livre=False` quand le livre vient d'être lu dans vue_livres
+        (disponibilité déjà calculée).
+        """
+        if not emprunt.statut:
+            return
+        if emprunt.id_utilisateur in self.utilisateurs:
+            self.utilisateurs[emprunt.id_utilisateur].emprunts_actifs.append(emprunt)
+        if marquer_livre and emprunt.id_livre in self.catalogue:
+            self.catalogue[emprunt.id_livre].disponible = False
+
+    def _detacher_emprunt(self, emprunt: Emprunt, marquer_livre: bool = True):
+        """Retire un emprunt en cours de son utilisateur et marque le livre disponible.
+
+        `marquer_livre=False` : voir _rattacher_emprunt.
+        """
+        if not emprunt.statut:
+            return
+        user = self.utilisateurs.get(emprunt.id_utilisateur)
+        if user is not None:
+            user.emprunts_actifs = [e for e in user.emprunts_actifs if e.id != emprunt.id]
+        if marquer_livre and emprunt.id_livre in self.catalogue:
+            self.catalogue[emprunt.id_livre].disponible = True
+
+    @staticmethod
+    def _livre_depuis_ligne(row) -> Livre:
+        livre = Livre(
+            isbn=row["isbn"],
+            titre=row["titre"],
+            auteur=row["auteur"],
+            editeur=row["editeur"],
+            annee_publication=row["annee_publication"],
+            categorie=row["categorie"],
+            nombre_pages=row["nombre_pages"],
+            cle_recherche=row["cle_recherche"]
+        )
+        livre.disponible = bool(row["disponible"])
+        livre.version = row["version"]
+        return livre
+
+    @staticmethod
+    def _livre_suivi(livre) -> Livre:
+        """`livre` en Livre du catalogue ; un autre objet (classes.Livre.Livre de l'interface) est recopié.
+
+        Seul ce Livre signale les changements de `disponible` aux facettes.
+        """
+        if isinstance(livre, Livre):
+            return livre
+        return Livre(livre.isbn, livre.titre, livre.auteur, livre.editeur, livre.annee_publication,
+                     livre.categorie, livre.nombre_pages, getattr(livre, "cle_recherche", None))
+
+    @staticmethod
+    def _utilisateur_depuis_ligne(row) -> Utilisateur:
+        return Utilisateur(
+            numero_carte=row["numero_carte"],
+            nom=row["nom"],
+            prenom=row["prenom"],
+            email=row["email"],
+            statut=row["statut"],
+            cle_recherche=row["cle_recherche"]
+        )
+
+    def description_profil_sqlite(self) -> str:
+        """Résumé lisible du profil SQLite actif, affiché au démarrage."""
+        details = ", ".join(f"{cle}={valeur}" for cle, valeur in self.pragmas_actifs.items())
+        return f"Profil SQLite '{self.config['profil_sqlite']}' : {details}"
+
+    # --- Instantané de démarrage ---
+    def _signature_instantane(self) -> tuple:
+        """Ce qui doit être identique entre l'instantané et la base pour qu'il soit utilisable."""
+        return (str(self.gestionnaire.chemin.resolve()), version_schema(self.conn),
+                self.config["mode_chargement"], self._lire_revision())
+
+    def charger_instantane(self) -> bool:
+        """Restaure l'état en mémoire depuis l'instantané s'il correspond encore à la base.
+
+        Retourne False (sans rien modifier) si l'instantané est absent ou
+        périmé ; l'appelant repasse alors par charger_donnees().
+        """
+        etat = lire_instantane(self.chemin_instantane)
+        if etat is None or tuple(etat["signature"]) != self._signature_instantane():
+            return False
+
+        with gc_suspendu():
+            self._hydrater_instantane(etat)
+        self.revision_chargee = etat["signature"][3]
+        return True
+
+    def _hydrater_instantane(self, etat: dict):
+        self.catalogue.clear()
+        self.utilisateurs.clear()
+        self.emprunts = {}
+        for isbn, titre, auteur, editeur, annee, categorie, pages, disponible, version, cle in etat["livres"]:
+            livre = Livre(isbn, titre, auteur, editeur, annee, categorie, pages, cle)
+            livre.disponible = disponible
+            livre.version = version
+            self.catalogue[isbn] = livre
+        for numero, nom, prenom, email, statut, cle in etat["utilisateurs"]:
+            self.utilisateurs[numero] = Utilisateur(numero, nom, prenom, email, statut, cle)
+        for id_emprunt, numero, isbn, debut, prevue, effective, statut, version in etat["emprunts"]:
+            emprunt = Emprunt(id_emprunt, numero, isbn, debut, prevue, effective, statut, version)
+            self.emprunts[id_emprunt] = emprunt
+            if statut and numero in self.utilisateurs:
+                self.utilisateurs[numero].emprunts_actifs.append(emprunt)
+        self.comptes = etat["comptes"]
+        self.next_emprunt_id = etat["next_emprunt_id"]
+
+    def ecrire_instantane(self):
+        """Enregistre l'état en mémoire, après l'avoir aligné sur la base."""
+        self.synchroniser()
+        ecrire_instantane(self.chemin_instantane, {
+            "signature": self._signature_instantane(),
+            "livres": [(l.isbn, l.titre, l.auteur, l.editeur, l.annee_publication, l.categorie,
+                        l.nombre_pages, bool(l.disponible), getattr(l, "version", 0), l.cle_recherche)
+                       for l in self.catalogue.values()],
+            "utilisateurs": [(u.numero_carte, u.nom, u.prenom, u.email, u.statut, u.cle_recherche)
+                             for u in self.utilisateurs.values()],
+            "emprunts": [(e.id, e.id_utilisateur, e.id_livre, e._date_emprunt,
+                          e._date_retour_prevue, e._date_retour_effective, bool(e.statut),
+                          e.version)
+                         for e in self.emprunts.values()],
+            "comptes": self.comptes,
+            "next_emprunt_id": self.next_emprunt_id,
+        })
+
+    def fermer_connexion(self):
+        """Valide les écritures en attente et ferme la connexion partagée."""
+        self.sauvegarder_donnees()
+        if self.config["instantane_demarrage"]:
+            self.ecrire_instantane()
+        self.gestionnaire.fermer()
+        self.lecteur.fermer()
+
+    @staticmethod
+    def _emprunt_depuis_ligne(row) -> Emprunt:
+        return Emprunt(
+            id=row["id"],
+            id_utilisateur=row["id_utilisateur"],
+            id_livre=row["id_livre"],
+            date_emprunt=row["date_emprunt"],
+            date_retour_prevue=row["date_retour_prevue"],
+            date_retour_effective=row["date_retour_effective"],
+            statut=bool(row["statut"]),
+            version=row["version"]
+        )
+
+    def historique_emprunts(self, numero_carte: str = None, isbn: str = None,
+                            debut: datetime = None, fin: datetime = None,
+                            limite: int = 50, avant_id: int = None,
+                            inclure_actifs: bool = False, inclure_archives: bool = None) -> list:
+        """Page d'emprunts lue dans SQLite, du plus récent au plus ancien.
+
+        Filtre par utilisateur, livre et/ou date d'emprunt (debut inclus,
+        fin exclue). Pour la page suivante, passer `avant_id` = id du dernier
+        emprunt de la page courante. Les emprunts déjà en mémoire sont
+        retournés tels quels. Les archives annuelles sont aussi interrogées
+        si `inclure_archives` est vrai, ou par défaut dès que `debut` est
+        donné (seulement celles qui recoupent la plage).
+        """
+        conditions, params = [], []
+        if not inclure_actifs:
+            conditions.append("statut = 0")
+        if numero_carte is not None:
+            conditions.append("id_utilisateur = ?")
+            params.append(numero_carte)
+        if isbn is not None:
+            conditions.append("id_livre = ?")
+            params.append(isbn)
+        if debut is not None:
+            conditions.append("date_emprunt >= ?")
+            params.append(vers_epoch(debut))
+        if fin is not None:
+            conditions.append("date_emprunt < ?")
+            params.append(vers_epoch(fin))
+        if avant_id is not None:
+            conditions.append("id < ?")
+            params.append(avant_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        if inclure_archives is None:
+            inclure_archives = debut is not None
+        annees = annees_couvertes(debut, fin, self.repertoire_archives) if inclure_archives else []
+        if not annees:
+            rows = self.lecteur.connexion().execute(f"SELECT * FROM emprunts {where} ORDER BY id DESC LIMIT ?",
+                                                    params + [limite])
+            return [self.emprunts.get(row["id"]) or self._emprunt_depuis_ligne(row) for row in rows]
+
+        colonnes = ", ".join(COLONNES_EMPRUNTS)
+        with self.lecture_coherente(annees) as (conn, schemas):
+            union = " UNION ALL ".join(f"SELECT {colonnes} FROM {schema}.emprunts {where}"
+                                       for schema in ["main"] + schemas)
+            rows = conn.execute(f"{union} ORDER BY id DESC LIMIT ?",
+                                params * (len(schemas) + 1) + [limite]).fetchall()
+        page, vus = [], set()
+        for row in rows:
+            if row["id"] not in vus:  # doublon possible après un archivage interrompu
+                vus.add(row["id"])
+                page.append(self.emprunts.get(row["id"]) or self._emprunt_depuis_ligne(row))
+        return page
+
+    def compter_emprunts(self) -> int:
+        """Nombre total d'emprunts, historique et archives compris."""
+        with self.lecture_coherente(annees_archivees(self.repertoire_archives)) as (conn, schemas):
+            return sum(conn.execute(f"SELECT COUNT(*) FROM {schema}.emprunts").fetchone()[0]
+                       for schema in ["main"] + schemas)
+
+    def archiver_emprunts(self, avant: datetime = None) -> int:
+        """Déplace vers data/archive_AAAA.db les emprunts rendus avant `avant`.
+
+        Par défaut, ceux rendus depuis plus de `conservation_emprunts_jours`.
+        Retourne le nombre d'emprunts archivés.
+        """
+        if avant is None:
+            avant = datetime.now() - timedelta(days=self.config["conservation_emprunts_jours"])
+        archives = deplacer_vers_archives(self.gestionnaire, avant, self.repertoire_archives)
+        limite = vers_epoch(avant)
+        for id_emprunt in [e.id for e in self.emprunts.values()
+                           if not e.statut and e._date_retour_effective is not None
+                           and e._date_retour_effective < limite]:
+            del self.emprunts[id_emprunt]
+        return sum(archives.values())
+
+    # --- Unité de travail ---
+    @contextmanager
+    def transaction(self):
+        """Regroupe plusieurs opérations en un seul commit.
+
+        En cas d'exception, SQLite et les dictionnaires en mémoire
+        (catalogue, utilisateurs, emprunts, comptes) sont remis dans leur
+        état d'entrée du bloc. Les blocs peuvent être imbriqués. Le verrou
+        d'écriture est réservé dès l'entrée (voir PolitiqueReessai) : si un
+        autre poste le garde trop longtemps, BaseOccupee est levée.
+
+            with biblio.transaction():
+                for id_emprunt in chariot:
+                    biblio.retourner_livre(id_emprunt)
+        """
+        repere = len(self._journal_annulation)
+        self._profondeur_transaction += 1
+        try:
+            with self.gestionnaire.transaction(ecriture=True):
+                yield self
+        except BaseException:
+            self._annuler_jusqua(repere)
+            raise
+        finally:
+            self._profondeur_transaction -= 1
+            if self._profondeur_transaction == 0:
+                self._journal_annulation.clear()
+
+    def _noter_annulation(self, annulation):
+        """Enregistre l'opération inverse d'une modification en mémoire."""
+        self._journal_annulation.append(annulation)
+
+    def _annuler_jusqua(self, repere: int):
+        while len(self._journal_annulation) > repere:
+            self._journal_annulation.pop()()
+
+    def sauvegarder_donnees(self):
+        """Valide les écritures en attente (sans effet dans une transaction ouverte)."""
+        self.gestionnaire.valider()
 
     # --- Méthodes comptes ---
     def verifier_identifiants(self, username: str, mot_de_passe: str) -> bool:
@@ -220,44 +634,82 @@ class Bibliotheque:
         if username not in self.comptes:
             return False
         mdp_hash = hacher_mot_de_passe(nouveau_mdp)
-        cursor = self.conn.cursor()
-        cursor.execute("UPDATE comptes SET password_hash = ? WHERE username = ?", (mdp_hash, username))
-        self.conn.commit()
-        self.comptes[username] = mdp_hash
+        with self.transaction():
+            cursor = self.conn.cursor()
+            cursor.execute("UPDATE comptes SET password_hash = ? WHERE username = ?", (mdp_hash, username))
+            ancien_hash = self.comptes[username]
+            self.comptes[username] = mdp_hash
+            self._noter_annulation(lambda: self.comptes.__setitem__(username, ancien_hash))
         return True
 
     # --- Livres ---
     def ajouter_livre(self, livre: Livre) -> bool:
         if livre.isbn in self.catalogue:
             return False
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO livres (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (livre.isbn, livre.titre, livre.auteur, livre.editeur, livre.annee_publication,
-              livre.categorie, livre.nombre_pages, 1))
-        self.conn.commit()
-        self.catalogue[livre.isbn] = livre
+        livre = self._livre_suivi(livre)
+        with self.transaction():
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT INTO livres (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible,
+                                    cle_recherche)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (livre.isbn, livre.titre, livre.auteur, livre.editeur, livre.annee_publication,
+                  livre.categorie, livre.nombre_pages, 1, livre.cle_recherche))
+            livre.version = 0
+            self.catalogue[livre.isbn] = livre
+            self._noter_annulation(lambda: self.catalogue.pop(livre.isbn, None))
         return True
 
     def modifier_livre(self, old_isbn: str, nouveau_livre: Livre) -> bool:
+        self.dernier_conflit = None
         if old_isbn not in self.catalogue:
             return False
         if old_isbn != nouveau_livre.isbn and nouveau_livre.isbn in self.catalogue:
             return False
-        cursor = self.conn.cursor()
-        if old_isbn != nouveau_livre.isbn:
-            cursor.execute("DELETE FROM livres WHERE isbn = ?", (old_isbn,))
-        cursor.execute("""
-            INSERT OR REPLACE INTO livres (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (nouveau_livre.isbn, nouveau_livre.titre, nouveau_livre.auteur, nouveau_livre.editeur,
-              nouveau_livre.annee_publication, nouveau_livre.categorie, nouveau_livre.nombre_pages,
-              int(nouveau_livre.est_disponible())))
-        self.conn.commit()
-        if old_isbn != nouveau_livre.isbn:
-            del self.catalogue[old_isbn]
-        self.catalogue[nouveau_livre.isbn] = nouveau_livre
+        ancien_livre = self.catalogue[old_isbn]
+        nouveau_livre = self._livre_suivi(nouveau_livre)
+        version = getattr(ancien_livre, "version", 0)
+        try:
+            with self.transaction():
+                cursor = self.conn.cursor()
+                if old_isbn == nouveau_livre.isbn:
+                    row = cursor.execute("""
+                        UPDATE livres SET titre = ?, auteur = ?, editeur = ?, annee_publication = ?,
+                                          categorie = ?, nombre_pages = ?, cle_recherche = ?, version = version + 1
+                        WHERE isbn = ? AND version = ?
+                        RETURNING version
+                    """, (nouveau_livre.titre, nouveau_livre.auteur, nouveau_livre.editeur,
+                          nouveau_livre.annee_publication, nouveau_livre.categorie, nouveau_livre.nombre_pages,
+                          nouveau_livre.cle_recherche, old_isbn, version)).fetchone()
+                    if row is None:
+                        raise ConflitConcurrence(f"Le livre {old_isbn} a été modifié depuis un autre poste.")
+                    nouvelle_version = row[0]
+                else:
+                    cursor.execute("DELETE FROM livres WHERE isbn = ? AND version = ?", (old_isbn, version))
+                    if cursor.rowcount == 0:
+                        raise ConflitConcurrence(f"Le livre {old_isbn} a été modifié depuis un autre poste.")
+                    try:
+                        cursor.execute("""
+                            INSERT INTO livres (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages,
+                                                disponible, cle_recherche)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """, (nouveau_livre.isbn, nouveau_livre.titre, nouveau_livre.auteur, nouveau_livre.editeur,
+                              nouveau_livre.annee_publication, nouveau_livre.categorie, nouveau_livre.nombre_pages,
+                              int(ancien_livre.est_disponible()), nouveau_livre.cle_recherche))
+                    except sqlite3.IntegrityError:
+                        raise ConflitConcurrence(f"L'ISBN {nouveau_livre.isbn} vient d'être créé sur un autre poste.")
+                    nouvelle_version = 0
+                nouveau_livre.disponible = ancien_livre.disponible
+                nouveau_livre.version = nouvelle_version
+                self.catalogue.pop(old_isbn)
+                self.catalogue[nouveau_livre.isbn] = nouveau_livre
+
+                def annuler():
+                    self.catalogue.pop(nouveau_livre.isbn, None)
+                    self.catalogue[old_isbn] = ancien_livre
+                self._noter_annulation(annuler)
+        except (ConflitConcurrence, BaseOccupee) as erreur:
+            return self._refus_concurrence(erreur, False)
         return True
 
     def supprimer_livre(self, isbn: str) -> bool:
@@ -267,23 +719,26 @@ class Bibliotheque:
         for e in self.emprunts.values():
             if e.id_livre == isbn and e.statut:
                 return False
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM livres WHERE isbn = ?", (isbn,))
-        self.conn.commit()
-        del self.catalogue[isbn]
+        with self.transaction():
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM livres WHERE isbn = ?", (isbn,))
+            livre = self.catalogue.pop(isbn)
+            self._noter_annulation(lambda: self.catalogue.__setitem__(isbn, livre))
         return True
 
     # --- Utilisateurs ---
     def inscrire_utilisateur(self, utilisateur: Utilisateur) -> bool:
         if utilisateur.numero_carte in self.utilisateurs:
             return False
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO utilisateurs (numero_carte, nom, prenom, email, statut)
-            VALUES (?, ?, ?, ?, ?)
-        """, (utilisateur.numero_carte, utilisateur.nom, utilisateur.prenom, utilisateur.email, utilisateur.statut))
-        self.conn.commit()
-        self.utilisateurs[utilisateur.numero_carte] = utilisateur
+        with self.transaction():
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT INTO utilisateurs (numero_carte, nom, prenom, email, statut, cle_recherche)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (utilisateur.numero_carte, utilisateur.nom, utilisateur.prenom, utilisateur.email, utilisateur.statut,
+                  utilisateur.cle_recherche))
+            self.utilisateurs[utilisateur.numero_carte] = utilisateur
+            self._noter_annulation(lambda: self.utilisateurs.pop(utilisateur.numero_carte, None))
         return True
 
     def modifier_utilisateur(self, old_numero: str, user_modifie: Utilisateur) -> bool:
@@ -291,17 +746,22 @@ class Bibliotheque:
             return False
         if old_numero != user_modifie.numero_carte and user_modifie.numero_carte in self.utilisateurs:
             return False
-        cursor = self.conn.cursor()
-        if old_numero != user_modifie.numero_carte:
-            cursor.execute("DELETE FROM utilisateurs WHERE numero_carte = ?", (old_numero,))
-        cursor.execute("""
-            INSERT OR REPLACE INTO utilisateurs (numero_carte, nom, prenom, email, statut)
-            VALUES (?, ?, ?, ?, ?)
-        """, (user_modifie.numero_carte, user_modifie.nom, user_modifie.prenom, user_modifie.email, user_modifie.statut))
-        self.conn.commit()
-        if old_numero != user_modifie.numero_carte:
-            del self.utilisateurs[old_numero]
-        self.utilisateurs[user_modifie.numero_carte] = user_modifie
+        with self.transaction():
+            cursor = self.conn.cursor()
+            if old_numero != user_modifie.numero_carte:
+                cursor.execute("DELETE FROM utilisateurs WHERE numero_carte = ?", (old_numero,))
+            cursor.execute("""
+                INSERT OR REPLACE INTO utilisateurs (numero_carte, nom, prenom, email, statut, cle_recherche)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user_modifie.numero_carte, user_modifie.nom, user_modifie.prenom, user_modifie.email, user_modifie.statut,
+                  user_modifie.cle_recherche))
+            ancien_user = self.utilisateurs.pop(old_numero)
+            self.utilisateurs[user_modifie.numero_carte] = user_modifie
+
+            def annuler():
+                self.utilisateurs.pop(user_modifie.numero_carte, None)
+                self.utilisateurs[old_numero] = ancien_user
+            self._noter_annulation(annuler)
         return True
 
     def supprimer_utilisateur(self, numero_carte: str) -> bool:
@@ -311,14 +771,16 @@ class Bibliotheque:
                 return False
         if numero_carte not in self.utilisateurs:
             return False
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM utilisateurs WHERE numero_carte = ?", (numero_carte,))
-        self.conn.commit()
-        del self.utilisateurs[numero_carte]
+        with self.transaction():
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM utilisateurs WHERE numero_carte = ?", (numero_carte,))
+            user = self.utilisateurs.pop(numero_carte)
+            self._noter_annulation(lambda: self.utilisateurs.__setitem__(numero_carte, user))
         return True
 
     # --- Emprunts ---
     def emprunter_livre(self, numero_carte: str, isbn: str) -> Optional[int]:
+        self.dernier_conflit = None
         user = self.utilisateurs.get(numero_carte)
         livre = self.catalogue.get(isbn)
         if not user or not livre or not livre.est_disponible():
@@ -331,60 +793,270 @@ class Bibliotheque:
 
         date_emprunt = datetime.now()
         date_retour_prevue = date_emprunt + timedelta(days=self.config["duree_emprunt"])
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO emprunts (id_utilisateur, id_livre, date_emprunt, date_retour_prevue, date_retour_effective, statut)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (numero_carte, isbn, date_emprunt.isoformat(), date_retour_prevue.isoformat(), None, 1))
-        self.conn.commit()
-        id_emprunt = cursor.lastrowid
-
-        emprunt = Emprunt(
-            id=id_emprunt,
-            id_utilisateur=numero_carte,
-            id_livre=isbn,
-            date_emprunt=date_emprunt,
-            date_retour_prevue=date_retour_prevue,
-            statut=True
-        )
-        self.emprunts[id_emprunt] = emprunt
+        try:
+            with self.transaction():
+                cursor = self.conn.cursor()
+                # Les vérifications ci-dessus portent sur la mémoire : on les refait en base,
+                # un autre poste ayant pu prêter le livre depuis la dernière synchronisation
+                row = cursor.execute("""
+                    UPDATE livres SET disponible = 0, version = version + 1
+                    WHERE isbn = ? AND disponible = 1
+                    RETURNING version
+                """, (isbn,)).fetchone()
+                if row is None:
+                    raise ConflitConcurrence(f"Le livre {isbn} a déjà été emprunté depuis un autre poste.")
+                # Mémoire modifiée seulement après toutes les vérifications et l'annulation inscrite
+                nouvelle_version_livre = row[0]
+                cursor.execute("SELECT COUNT(*) FROM emprunts WHERE id_utilisateur = ? AND statut = 1", (numero_carte,))
+                if cursor.fetchone()[0] >= self.config["max_emprunts"]:
+                    raise ConflitConcurrence(f"L'utilisateur {numero_carte} a atteint le maximum d'emprunts "
+                                             "(emprunts faits sur un autre poste).")
+                cursor.execute("""
+                    INSERT INTO emprunts (id_utilisateur, id_livre, date_emprunt, date_retour_prevue, date_retour_effective, statut)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (numero_carte, isbn, vers_epoch(date_emprunt), vers_epoch(date_retour_prevue), None, 1))
+                id_emprunt = cursor.lastrowid
+                ancienne_version_livre = getattr(livre, "version", 0)
+
+                emprunt = Emprunt(
+                    id=id_emprunt,
+                    id_utilisateur=numero_carte,
+                    id_livre=isbn,
+                    date_emprunt=date_emprunt,
+                    date_retour_prevue=date_retour_prevue,
+                    statut=True
+                )
 
-        livre.marquer_emprunte()
-        user.emprunts_actifs.append(emprunt)
+                def annuler():
+                    self.emprunts.pop(id_emprunt, None)
+                    livre.disponible = True
+                    livre.version = ancienne_version_livre
+                    if emprunt in user.emprunts_actifs:
+                        user.emprunts_actifs.remove(emprunt)
+                self._noter_annulation(annuler)
+
+                self.emprunts[id_emprunt] = emprunt
+                livre.disponible = False  # déjà écrit en base par l'UPDATE conditionnel
+                livre.version = nouvelle_version_livre
+                user.emprunts_actifs.append(emprunt)
+        except (ConflitConcurrence, BaseOccupee) as erreur:
+            return self._refus_concurrence(erreur, None)
         return id_emprunt
 
     def retourner_livre(self, id_emprunt: int) -> bool:
+        self.dernier_conflit = None
         emprunt = self.emprunts.get(id_emprunt)
         if not emprunt or not emprunt.statut:
             return False
-        emprunt.finaliser_retour()
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE emprunts SET date_retour_effective = ?, statut = ?
-            WHERE id = ?
-        """, (emprunt.date_retour_effective.isoformat(), 0, id_emprunt))
-        self.conn.commit()
-
         livre = self.catalogue.get(emprunt.id_livre)
         utilisateur = self.utilisateurs.get(emprunt.id_utilisateur)
-        if livre:
-            livre.marquer_disponible()
-        if utilisateur:
-            utilisateur.emprunts_actifs = [e for e in utilisateur.emprunts_actifs if e.id != id_emprunt]
-        emprunt.statut = False
+        try:
+            with self.transaction():
+                anciens_actifs = utilisateur.emprunts_actifs if utilisateur else None
+                anciennes_versions = (emprunt.version, getattr(livre, "version", 0))
+
+                def annuler():
+                    emprunt.statut = True
+                    emprunt.date_retour_effective = None
+                    emprunt.version = anciennes_versions[0]
+                    if livre:
+                        livre.disponible = False
+                        livre.version = anciennes_versions[1]
+                    if utilisateur:
+                        utilisateur.emprunts_actifs = anciens_actifs
+                self._noter_annulation(annuler)
+
+                emprunt.finaliser_retour()
+                cursor = self.conn.cursor()
+                row = cursor.execute("""
+                    UPDATE emprunts SET date_retour_effective = ?, statut = 0, version = version + 1
+                    WHERE id = ? AND statut = 1 AND version = ?
+                    RETURNING version
+                """, (vers_epoch(emprunt.date_retour_effective), id_emprunt, anciennes_versions[0])).fetchone()
+                if row is None:
+                    raise ConflitConcurrence(f"L'emprunt n°{id_emprunt} a été modifié ou retourné depuis un autre poste.")
+                emprunt.version = row[0]
+                row = cursor.execute("""
+                    UPDATE livres SET disponible = 1, version = version + 1
+                    WHERE isbn = ?
+                    RETURNING version
+                """, (emprunt.id_livre,)).fetchone()
+
+                if livre:
+                    livre.disponible = True
+                    if row is not None:
+                        livre.version = row[0]
+                if utilisateur:
+                    utilisateur.emprunts_actifs = [e for e in utilisateur.emprunts_actifs if e.id != id_emprunt]
+                emprunt.statut = False
+        except (ConflitConcurrence, BaseOccupee) as erreur:
+            return self._refus_concurrence(erreur, False)
         return True
 
+    def _refus_concurrence(self, erreur: Exception, resultat):
+        """Note le motif du refus et réaligne la mémoire sur la base ; retourne `resultat`."""
+        self.dernier_conflit = str(erreur)
+        if isinstance(erreur, ConflitConcurrence):
+            self.synchroniser()
+        return resultat
+
+    def retourner_livres(self, ids_emprunts) -> int:
+        """Traite un chariot de retours en une seule transaction ; retourne le nombre de retours effectués."""
+        with self.transaction():
+            return sum(1 for id_emprunt in ids_emprunts if self.retourner_livre(id_emprunt))
+
+    # --- Disponibilité ---
+    def verifier_disponibilite(self) -> list:
+        """Livres dont `livres.disponible` contredit les emprunts en cours : (isbn, en base, attendu)."""
+        return livres_divergents(self.lecteur)
+
+    def reparer_disponibilite(self) -> int:
+        """Corrige en une requête toutes les dérives de `livres.disponible` ; retourne le nombre de livres corrigés.
+
+        La mémoire est alignée sur la base, y compris pour les livres déjà
+        justes en base mais faux en mémoire.
+        """
+        with self.transaction():
+            corriges = {isbn: version for isbn, _, version in reparer_disponibilite(self.gestionnaire)}
+            anciens = []
+            for row in self.conn.execute("SELECT isbn, disponible FROM vue_livres"):
+                livre = self.catalogue.get(row["isbn"])
+                if livre is None:
+                    continue
+                if livre.disponible != bool(row["disponible"]) or livre.isbn in corriges:
+                    anciens.append((livre, livre.disponible, livre.version))
+                    livre.disponible = bool(row["disponible"])
+                    livre.version = corriges.get(livre.isbn, livre.version)
+
+            def annuler():
+                for livre, disponible, version in anciens:
+                    livre.disponible, livre.version = disponible, version
+            self._noter_annulation(annuler)
+        return len(corriges)
+
     # --- Statistiques ---
-    def generer_rapport(self):
-        return {
-            "total_livres": len(self.catalogue),
-            "total_utilisateurs": len(self.utilisateurs),
-            "total_emprunts": len(self.emprunts),
-            "livres_disponibles": len([l for l in self.catalogue.values() if l.est_disponible()]),
-        }
+    @contextmanager
+    def lecture_coherente(self, annees=()):
+        """Instantané en lecture seule de la base (et des archives `annees`) ; produit (conn, schémas).
+
+        Les requêtes du bloc voient toutes le même état validé. En WAL
+        (profil "desk"), le bloc ne retarde ni les prêts ni les retours des
+        autres threads et postes, et n'en est pas retardé. Les écritures non
+        encore validées de ce processus n'y apparaissent pas.
+
+            with biblio.lecture_coherente() as (conn, schemas):
+                conn.execute("SELECT ...")
+        """
+        with archives_attachees(self.lecteur, annees, self.repertoire_archives) as schemas, \
+                self.lecteur.transaction() as conn:
+            yield conn, schemas
+
+    def comptes_facettes(self, recherche: str = "") -> dict:
+        """Nombre de livres par catégorie, éditeur, décennie et disponibilité.
+
+        Sur tout le catalogue, ou seulement sur les livres dont le texte
+        contient `recherche` (même filtre que l'interface). Les comptes sont
+        tenus à jour en mémoire : aucun parcours du catalogue.
+        """
+        parmi = self.catalogue.index.rechercher(recherche) if recherche.strip() else None
+        return self.catalogue.facettes.comptes(parmi)
+
+    def generer_rapport(self) -> dict:
+        """Compteurs du tableau de bord, calculés en SQL sur un même instantané."""
+        maintenant = int(time.time())
+        with self.lecture_coherente(annees_archivees(self.repertoire_archives)) as (conn, schemas):
+            rapport = dict(conn.execute("""
+                SELECT (SELECT COUNT(*) FROM livres) AS total_livres,
+                       (SELECT COUNT(*) FROM livres WHERE disponible = 1) AS livres_disponibles,
+                       (SELECT COUNT(*) FROM utilisateurs) AS total_utilisateurs,
+                       -- upper() de SQLite ne traite que l'ASCII : 'bloqué' devient 'BLOQUé'
+                       (SELECT COUNT(*) FROM utilisateurs
+                        WHERE upper(statut) IN ('BLOQUÉ', 'BLOQUé')) AS utilisateurs_bloques,
+                       (SELECT COUNT(*) FROM emprunts WHERE statut = 1) AS emprunts_en_cours
+            """).fetchone())
+            # Même calcul que calculer_amende : jours calendaires de retard à ce jour
+            retards = conn.execute("""
+                SELECT COUNT(*),
+                       TOTAL(MAX(0, julianday(date('now', 'localtime'))
+                                    - julianday(date(date_retour_prevue, 'unixepoch', 'localtime'))))
+                FROM emprunts WHERE statut = 1 AND date_retour_prevue < ?
+            """, (maintenant,)).fetchone()
+            rapport["emprunts_en_retard"] = retards[0]
+            rapport["amendes_totales"] = retards[1] * self.config["amende_par_jour"]
+            rapport["total_emprunts"] = sum(conn.execute(f"SELECT COUNT(*) FROM {schema}.emprunts").fetchone()[0]
+                                            for schema in ["main"] + schemas)
+        return rapport
 
     def emprunts_en_retard(self):
-        return [e for e in self.emprunts.values() if e.est_en_retard()]
+        """Emprunts en cours à échéance dépassée, de la plus ancienne à la plus récente.
+
+        Parcours de l'index partiel idx_emprunts_actifs_echeance (entiers),
+        sur la connexion en lecture seule. Liste complète : pour un affichage
+        ou un export, voir page_emprunts_en_retard.
+        """
+        rows = self.lecteur.connexion().execute("""
+            SELECT * FROM emprunts
+            WHERE statut = 1 AND date_retour_prevue < ?
+            ORDER BY date_retour_prevue, id
+        """, (int(time.time()),))
+        return [self.emprunts.get(row["id"]) or self._emprunt_depuis_ligne(row) for row in rows]
+
+    # ------------------------
+    #   PAGINATION (SQLITE)
+    # ------------------------
+    # Pages lues par clé sur la connexion en lecture seule (classes.Pagination) :
+    # (éléments, clé suivante), clé à repasser en `apres` ; None en fin de table.
+    # Les objets déjà en mémoire sont retournés tels quels.
+
+    def page_livres(self, apres=None, limite: int = TAILLE_PAGE, ordre: str = "isbn",
+                    disponibles: bool = False) -> tuple:
+        """Livres par ISBN, titre ou auteur ; `disponibles` : seulement les livres empruntables.
+
+        Par ISBN, les disponibles viennent de l'index partiel idx_livres_disponibles.
+        """
+        rows, suivante = page_sql(self.lecteur.connexion(), "livres", apres, limite, ordre,
+                                  ["disponible = 1"] if disponibles else [])
+        return [self.catalogue.get(row["isbn"]) or self._livre_depuis_ligne(row) for row in rows], suivante
+
+    def page_utilisateurs(self, apres=None, limite: int = TAILLE_PAGE, ordre: str = "numero_carte") -> tuple:
+        """Utilisateurs par numéro de carte ou par nom."""
+        rows, suivante = page_sql(self.lecteur.connexion(), "utilisateurs", apres, limite, ordre)
+        return [self.utilisateurs.get(row["numero_carte"]) or self._utilisateur_depuis_ligne(row)
+                for row in rows], suivante
+
+    def page_emprunts(self, apres=None, limite: int = TAILLE_PAGE, ordre: str = "id",
+                      statut: bool = None) -> tuple:
+        """Emprunts (archives exclues), en cours ou clos selon `statut` ; tous si None."""
+        conditions, params = [], []
+        if statut is not None:
+            conditions.append("statut = ?")
+            params.append(1 if statut else 0)
+        rows, suivante = page_sql(self.lecteur.connexion(), "emprunts", apres, limite, ordre, conditions, params)
+        return [self.emprunts.get(row["id"]) or self._emprunt_depuis_ligne(row) for row in rows], suivante
+
+    def page_emprunts_en_retard(self, apres=None, limite: int = TAILLE_PAGE) -> tuple:
+        """Page d'emprunts en retard : index partiel idx_emprunts_actifs_echeance, puis l'id."""
+        rows, suivante = page_sql(self.lecteur.connexion(), "emprunts", apres, limite, "date_retour_prevue",
+                                  ["statut = 1", "date_retour_prevue < ?"], [int(time.time())])
+        return [self.emprunts.get(row["id"]) or self._emprunt_depuis_ligne(row) for row in rows], suivante
+
+    def rapport_mensuel(self, annee: int) -> dict:
+        """Par mois de l'année : nombre d'emprunts et de retours en retard, archives comprises."""
+        bornes = (vers_epoch(datetime(annee, 1, 1)), vers_epoch(datetime(annee + 1, 1, 1)))
+        annees = annees_couvertes(datetime(annee, 1, 1), datetime(annee, 12, 31), self.repertoire_archives)
+        with self.lecture_coherente(annees) as (conn, schemas):
+            union = " UNION ALL ".join(
+                f"SELECT date_emprunt, date_retour_prevue, date_retour_effective FROM {schema}.emprunts "
+                "WHERE date_emprunt >= ? AND date_emprunt < ?"
+                for schema in ["main"] + schemas)
+            rows = conn.execute(f"""
+                SELECT CAST(strftime('%m', date_emprunt, 'unixepoch', 'localtime') AS INTEGER) AS mois,
+                       COUNT(*) AS emprunts,
+                       SUM(date_retour_effective > date_retour_prevue) AS retards
+                FROM ({union})
+                GROUP BY mois ORDER BY mois
+            """, bornes * (len(schemas) + 1)).fetchall()
+        return {row["mois"]: {"emprunts": row["emprunts"], "retards": row["retards"] or 0} for row in rows}
 
     def calculer_amende(self, id_emprunt: int) -> float:
         emprunt = self.emprunts.get(id_emprunt)
@@ -1,149 +1,263 @@
-import sqlite3
+import re
 from pathlib import Path
 from datetime import datetime
 from classes.Livre import Livre
+from classes.Connexion import obtenir_connexion, valider
+from classes.Migrations import migrer, index_plein_texte_present, COLONNES_PLEIN_TEXTE
+from classes.IndexRecherche import IndexInverse
+from classes.Normalisation import normaliser
+from classes.Pagination import IndexTrie, TAILLE_PAGE
+from classes.Requetes import MoteurRequetes
 
 DB_PATH = Path("data/bibliotheque.db")
 
+# Poids bm25 des colonnes de livres_fts (titre, auteur, editeur, categorie)
+POIDS_PLEIN_TEXTE = (10.0, 5.0, 1.0, 2.0)
+
+# Champs de Livre couverts par l'index inversé en mémoire, avec les mêmes poids que FTS5
+CHAMPS_INDEXES = COLONNES_PLEIN_TEXTE
+POIDS_CHAMPS = dict(zip(COLONNES_PLEIN_TEXTE, POIDS_PLEIN_TEXTE))
+
+# Champs de recherche_avancee : égalité normalisée (textes), égalité et intervalles (entiers)
+CHAMPS_FILTRES_TEXTE = ("isbn",) + CHAMPS_INDEXES
+CHAMPS_FILTRES_ENTIERS = ("annee_publication", "nombre_pages")
+
+# Ordres de page_livres : l'ISBN, ou un champ indexé (valeur normalisée) départagé par l'ISBN
+ORDRES_PAGES = ("isbn",) + CHAMPS_INDEXES
+
 class Catalogue:
     def __init__(self):
         self.livres = {}  # clé = ISBN, valeur = Livre
-        self._index_recherche=None
+        # Tenu à jour par ajouter_livre / modifier_livre / supprimer_livre
+        self._index_recherche = IndexInverse(CHAMPS_INDEXES)
+        # Index par champ de recherche_avancee (égalité, intervalles), voir classes.Requetes
+        self._requetes = MoteurRequetes(CHAMPS_FILTRES_TEXTE, CHAMPS_FILTRES_ENTIERS)
+        # isbn -> {champ: valeur normalisée (textes) ou entière}, calculé à l'ajout / la modification
+        self._cles = {}
+        # ordre -> IndexTrie, construit à la première page demandée dans cet ordre, tenu à jour ensuite
+        self._ordres = {}
 
     # --- Gestion en mémoire ---
     def ajouter_livre(self, livre) -> bool:
         if livre.isbn in self.livres:
             return False
         self.livres[livre.isbn] = livre
+        self._indexer(livre)
+        return True
+
+    def modifier_livre(self, ancien_isbn: str, livre) -> bool:
+        """Remplace le livre `ancien_isbn` (l'ISBN peut changer) et met l'index à jour."""
+        if ancien_isbn not in self.livres:
+            return False
+        if livre.isbn != ancien_isbn and livre.isbn in self.livres:
+            return False
+        del self.livres[ancien_isbn]
+        self.livres[livre.isbn] = livre
+        self._index_recherche.retirer(ancien_isbn)
+        self._requetes.retirer(ancien_isbn)
+        self._cles.pop(ancien_isbn, None)
+        for index in self._ordres.values():
+            index.retirer(ancien_isbn)
+        self._indexer(livre)
         return True
 
+    def reindexer(self, isbn: str):
+        """À appeler après avoir modifié directement les attributs d'un livre du catalogue."""
+        self._indexer(self.livres[isbn])
+
     def supprimer_livre(self, isbn: str) -> bool:
+        self._index_recherche.retirer(isbn)
+        self._requetes.retirer(isbn)
+        self._cles.pop(isbn, None)
+        for index in self._ordres.values():
+            index.retirer(isbn)
         return self.livres.pop(isbn, None) is not None
 
+    def _indexer(self, livre):
+        valeurs = {champ: getattr(livre, champ, "") for champ in CHAMPS_INDEXES}
+        self._index_recherche.ajouter(livre.isbn, valeurs)
+        # Valeurs normalisées une seule fois, partagées avec les index de recherche_avancee
+        self._cles[livre.isbn] = self._requetes.ajouter(livre.isbn, livre)
+        for ordre, index in self._ordres.items():
+            index.ajouter(livre.isbn, self._valeur_tri(livre.isbn, ordre))
+
+    def _valeur_tri(self, isbn: str, ordre: str) -> str:
+        return isbn if ordre == "isbn" else self._valeur_normalisee(self.livres[isbn], ordre)
+
+    def _valeur_normalisee(self, livre, champ: str) -> str:
+        cles = self._cles.get(livre.isbn)
+        if cles is not None and champ in cles:
+            return cles[champ]
+        return normaliser(getattr(livre, champ, ""))
+
+    # Recherches insensibles aux accents, à la casse et à la ponctuation ("societe" trouve "Société")
     def rechercher_par_titre(self, titre: str):
-        return [livre for livre in self.livres.values() if titre.lower() in livre.titre.lower()]
+        motif = normaliser(titre)
+        return [self.livres[isbn] for isbn, cles in self._cles.items() if motif in cles["titre"]]
 
     def rechercher_par_auteur(self, auteur: str):
-        return [livre for livre in self.livres.values() if auteur.lower() in livre.auteur.lower()]
+        motif = normaliser(auteur)
+        return [self.livres[isbn] for isbn, cles in self._cles.items() if motif in cles["auteur"]]
 
     def rechercher_par_categorie(self, categorie: str):
-        return [livre for livre in self.livres.values() if livre.categorie.lower() == categorie.lower()]
+        motif = normaliser(categorie)
+        return [self.livres[isbn] for isbn, cles in self._cles.items() if cles["categorie"] == motif]
 
     def recherche_avancee(self, criteres: dict):
-        resultats = list(self.livres.values())
-        for cle, valeur in criteres.items():
-            resultats = [livre for livre in resultats if getattr(livre, cle, "").lower() == valeur.lower()]
-        return resultats
+        """Livres qui satisfont tous les critères, par ISBN.
+
+        Critère : champ -> valeur (égalité ; textes comparés normalisés,
+        "roman" trouve "Roman") ou, pour annee_publication et nombre_pages,
+        (min, max) bornes incluses, None pour une borne ouverte. Le critère
+        le plus sélectif est appliqué en premier (voir explain).
+        """
+        return [self.livres[isbn] for isbn in sorted(self._requetes.rechercher(criteres, self.livres))]
+
+    def explain(self, criteres: dict) -> str:
+        """Plan de recherche_avancee(criteres) : étapes dans l'ordre, index utilisé, nombre de livres estimé."""
+        return self._requetes.expliquer(criteres, self.livres)
 
     def lister_livres_disponibles(self):
+        """Liste complète ; pour un affichage ou un export, voir page_livres(disponibles=True)."""
         return [livre for livre in self.livres.values() if livre.est_disponible()]
 
+    # --- Pagination (index triés en mémoire) ---
+    def page_livres(self, apres=None, limite: int = TAILLE_PAGE, ordre: str = "isbn",
+                    disponibles: bool = False) -> tuple:
+        """(livres, clé suivante) : `limite` livres au plus, dans l'ordre `ordre`, strictement après `apres`.
+
+        La clé suivante (None sur la dernière page) se repasse en `apres`.
+        Titre, auteur, éditeur et catégorie sont triés sur leur valeur
+        normalisée (sans accents ni casse). La disponibilité change sur
+        place : elle est filtrée au parcours, pas indexée.
+        """
+        index = self._index_trie(ordre)
+        if not disponibles:
+            isbns, suivante = index.page(apres, limite)
+            return [self.livres[isbn] for isbn in isbns], suivante
+        livres, suivante = [], None
+        for entree in index.parcourir(apres):
+            livre = self.livres[entree[1]]
+            if livre.est_disponible():
+                livres.append(livre)
+                if len(livres) == limite:
+                    suivante = entree
+                    break
+        return livres, suivante
+
+    def _index_trie(self, ordre: str) -> IndexTrie:
+        if ordre not in ORDRES_PAGES:
+            raise ValueError(f"Ordre inconnu : {ordre!r} (attendu : {', '.join(ORDRES_PAGES)})")
+        if ordre not in self._ordres:
+            self._ordres[ordre] = IndexTrie((isbn, self._valeur_tri(isbn, ordre)) for isbn in self.livres)
+        return self._ordres[ordre]
+
+    # --- Recherche plein texte (SQLite) ---
+    def rechercher(self, texte: str, limit: int = 20, offset: int = 0) -> list[Livre]:
+        """Livres dont titre, auteur, éditeur ou catégorie contiennent tous les mots de `texte`.
+
+        Chaque mot est un préfixe ("mise" trouve "misérables") ; les accents
+        et la casse sont ignorés. Classement bm25 (le titre pèse le plus),
+        via l'index FTS5 livres_fts. Sans FTS5 : LIKE sur les quatre
+        colonnes, tri par titre.
+        """
+        mots = re.findall(r"\w+", texte)
+        if not mots:
+            return []
+        conn = obtenir_connexion(DB_PATH)
+        if index_plein_texte_present(conn):
+            requete = " ".join(f'"{mot}"*' for mot in mots)
+            poids = ", ".join(str(p) for p in POIDS_PLEIN_TEXTE)
+            # Page classée d'abord, jointure ensuite : seules `limit` lignes de livres sont lues
+            rows = conn.execute(f"""
+                SELECT l.* FROM (
+                    SELECT rowid, bm25(livres_fts, {poids}) AS score FROM livres_fts
+                    WHERE livres_fts MATCH ?
+                    ORDER BY score LIMIT ? OFFSET ?
+                ) AS page JOIN livres l ON l.rowid = page.rowid
+                ORDER BY page.score
+            """, (requete, limit, offset))
+        else:
+            condition = "(" + " OR ".join(f"{c} LIKE ?" for c in COLONNES_PLEIN_TEXTE) + ")"
+            params = [f"%{mot}%" for mot in mots for _ in COLONNES_PLEIN_TEXTE]
+            rows = conn.execute(f"""
+                SELECT * FROM livres WHERE {" AND ".join([condition] * len(mots))}
+                ORDER BY titre LIMIT ? OFFSET ?
+            """, params + [limit, offset])
+        return [self.livres.get(row["isbn"]) or self._livre_depuis_ligne(row) for row in rows]
+
+    @staticmethod
+    def _livre_depuis_ligne(row) -> Livre:
+        return Livre(isbn=row["isbn"], titre=row["titre"], auteur=row["auteur"], editeur=row["editeur"],
+                     annee_publication=row["annee_publication"], categorie=row["categorie"],
+                     nombre_pages=row["nombre_pages"], disponibilite=bool(row["disponible"]))
+
     # --- Persistance SQLite ---
     @staticmethod
     def creer_table():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS catalogue (
-                isbn TEXT PRIMARY KEY,
-                titre TEXT,
-                auteur TEXT,
-                editeur TEXT,
-                annee_publication INTEGER,
-                categorie TEXT,
-                nombre_pages INTEGER,
-                disponible INTEGER,
-                date_ajout TEXT
-                    )
-        """)
-        conn.commit()
-        conn.close()
+        """Le schéma est géré par classes.Migrations (PRAGMA user_version)."""
+        migrer(obtenir_connexion(DB_PATH))
 
     def sauvegarder_livre(self, livre):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
-            INSERT OR REPLACE INTO catalogue
-            (isbn, titre, auteur, categorie, disponible, date_ajout)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT OR REPLACE INTO livres
+            (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible, date_ajout)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             livre.isbn,
             livre.titre,
             livre.auteur,
+            livre.editeur,
+            livre.annee_publication,
             livre.categorie,
+            livre.nombre_pages,
             1 if livre.est_disponible() else 0,
             datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
     @staticmethod
     def charger_tous():
 
         Catalogue.creer_table() 
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
                SELECT isbn, titre, auteur, editeur,
              annee_publication, categorie, nombre_pages, disponible
-             FROM catalogue
+             FROM livres
                  """)
 
         rows = cursor.fetchall()
-        conn.close()
         return [
                 Livre(isbn=row[0], titre=row[1], auteur=row[2],
                        editeur=row[3], annee_publication=row[4],
-                       categorie=row[5], nombre_pages=row[6], disponible=bool(row[7]))
+                       categorie=row[5], nombre_pages=row[6], disponibilite=bool(row[7]))
             for row in rows
         ]
     def build_index(self):
-        """Crée un index pour des recherches rapides"""
-        self._index_recherche = {
-            'titres': {},
-            'auteurs': {},
-            'categories': {}
-        }
-        
-        for isbn, livre in self.livres.items():
-            # Index par mots-clés du titre
-            for mot in livre.titre.lower().split():
-                if mot not in self._index_recherche['titres']:
-                    self._index_recherche['titres'][mot] = []
-                self._index_recherche['titres'][mot].append(isbn)
-            
-            # Index par auteur
-            if livre.auteur not in self._index_recherche['auteurs']:
-                self._index_recherche['auteurs'][livre.auteur] = []
-            self._index_recherche['auteurs'][livre.auteur].append(isbn)
-    
-    def rechercher_avance(self, terme: str) -> list[Livre]:
-        """Recherche avec index"""
-        if not self._index_recherche:
-            self.build_index()
-        
-        terme = terme.lower()
-        resultats = set()
-        
-        # Recherche dans les titres
-        for mot, isbns in self._index_recherche['titres'].items():
-            if terme in mot:
-                resultats.update(isbns)
-        
-        # Recherche dans les auteurs
-        for auteur, isbns in self._index_recherche['auteurs'].items():
-            if terme in auteur.lower():
-                resultats.update(isbns)
-        
-        return [self.livres[isbn] for isbn in resultats]
+        """Reconstruit entièrement l'index (après un chargement en masse de self.livres)."""
+        self._index_recherche.vider()
+        self._requetes.vider()
+        self._cles.clear()
+        self._ordres.clear()
+        for livre in self.livres.values():
+            self._indexer(livre)
+
+    def rechercher_avance(self, terme: str, limit: int = 20) -> list[Livre]:
+        """Les `limit` livres les plus pertinents pour `terme`, meilleur d'abord (BM25 en mémoire).
+
+        Chaque mot de `terme` doit commencer un mot du titre, de l'auteur, de
+        l'éditeur ou de la catégorie ; le titre pèse le plus (POIDS_CHAMPS).
+        """
+        classement = self._index_recherche.rechercher_classe(terme, limit, POIDS_CHAMPS)
+        return [self.livres[isbn] for isbn, _ in classement]
 
     @staticmethod
     def supprimer_livre_db(isbn: str):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT isbn, titre, auteur, editeur,
-                  annee_publication, categorie, nombre_pages, disponible
-                  FROM catalogue   """)
-        conn.commit()
-        conn.close()
+        cursor.execute("DELETE FROM livres WHERE isbn = ?", (isbn,))
+        valider(DB_PATH)
@@ -0,0 +1,358 @@
+import sqlite3
+import threading
+import atexit
+import time
+import random
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+DB_PATH = Path("data/bibliotheque.db")
+
+# Nombre de requêtes préparées gardées en cache par connexion
+TAILLE_CACHE_REQUETES = 256
+
+# Profils de PRAGMA appliqués à l'ouverture de chaque connexion.
+#   desk    : comptoir de prêt, WAL (lecteurs et rédacteur ne se bloquent plus),
+#             fsync seulement aux checkpoints, gros cache de pages et mmap.
+#   durable : journal classique et fsync complet à chaque commit.
+PROFILS_PRAGMA = {
+    "desk": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,        # en Kio (négatif) : 64 Mio
+        "mmap_size": 268435456,      # 256 Mio
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+}
+PROFIL_PAR_DEFAUT = "desk"
+
+
+
+class BaseOccupee(sqlite3.OperationalError):
+    """Le verrou d'écriture n'a pas pu être obtenu dans le budget de la politique de réessai."""
+
+
+class PolitiqueReessai:
+    """Attente sur verrou SQLite : busy_timeout court puis quelques réessais espacés.
+
+    Un poste de prêt doit échouer vite (et le dire) plutôt que rester bloqué
+    derrière l'écriture d'un autre processus.
+    """
+
+    def __init__(self, delai_verrou: float = 0.2, tentatives: int = 4,
+                 attente_initiale: float = 0.02, attente_max: float = 0.25):
+        self.delai_verrou = delai_verrou          # busy_timeout de SQLite, en secondes
+        self.tentatives = tentatives
+        self.attente_initiale = attente_initiale
+        self.attente_max = attente_max
+
+    def attentes(self):
+        """Pauses entre tentatives : exponentielles, plafonnées, avec gigue."""
+        attente = self.attente_initiale
+        for _ in range(self.tentatives - 1):
+            yield random.uniform(attente / 2, attente)
+            attente = min(attente * 2, self.attente_max)
+
+
+POLITIQUE_PAR_DEFAUT = PolitiqueReessai()
+
+
+def est_erreur_verrou(erreur: sqlite3.OperationalError) -> bool:
+    message = str(erreur).lower()
+    return "locked" in message or "busy" in message
+
+
+# ------------------------
+#   DATES EN SECONDES UNIX
+# ------------------------
+# Les dates des emprunts sont stockées en secondes depuis l'époque Unix
+# (colonnes INTEGER) : comparaisons et parcours d'index sur des entiers.
+# Une colonne nommée "col [horodatage]" dans un SELECT est convertie en
+# datetime (heure locale) par le convertisseur enregistré ci-dessous.
+
+def vers_epoch(date):
+    """datetime (heure locale) -> secondes Unix ; None et entiers passent tels quels."""
+    if date is None or isinstance(date, int):
+        return date
+    return int(date.timestamp())
+
+
+def depuis_epoch(secondes):
+    return None if secondes is None else datetime.fromtimestamp(secondes)
+
+
+sqlite3.register_converter("horodatage", lambda valeur: datetime.fromtimestamp(int(valeur)))
+
+
+_NOMS_SYNCHRONOUS = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+_NOMS_TEMP_STORE = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+
+
+def appliquer_profil(conn: sqlite3.Connection, nom: str, lecture_seule: bool = False):
+    """Applique le profil de PRAGMA `nom` sur une connexion ouverte.
+
+    En lecture seule, journal_mode (propriété du fichier, fixée par les
+    connexions en écriture) n'est pas touché.
+    """
+    if nom not in PROFILS_PRAGMA:
+        raise ValueError(f"Profil SQLite inconnu : {nom!r} (attendu : {', '.join(PROFILS_PRAGMA)})")
+    for pragma, valeur in PROFILS_PRAGMA[nom].items():
+        if lecture_seule and pragma == "journal_mode":
+            continue
+        conn.execute(f"PRAGMA {pragma} = {valeur}").fetchall()
+
+
+def lire_pragmas(conn: sqlite3.Connection) -> dict:
+    """Valeurs effectives des PRAGMA gérés par les profils."""
+    valeurs = {}
+    for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store"):
+        row = conn.execute(f"PRAGMA {pragma}").fetchone()
+        valeurs[pragma] = row[0] if row is not None else None
+    valeurs["journal_mode"] = str(valeurs["journal_mode"]).upper()
+    valeurs["synchronous"] = _NOMS_SYNCHRONOUS.get(valeurs["synchronous"], valeurs["synchronous"])
+    valeurs["temp_store"] = _NOMS_TEMP_STORE.get(valeurs["temp_store"], valeurs["temp_store"])
+    return valeurs
+
+
+class GestionnaireConnexion:
+    """Connexion SQLite partagée par thread pour un fichier de base donné.
+
+    Chaque thread obtient sa propre connexion (sqlite3 interdit le partage
+    entre threads), ouverte à la première demande puis réutilisée jusqu'à
+    l'appel explicite de `fermer()`.
+
+    Avec `lecture_seule=True`, les connexions sont ouvertes en `mode=ro`
+    (URI) : rapports et exports y lisent un instantané WAL cohérent sans
+    jamais prendre le verrou d'écriture ni gêner les prêts en cours.
+    """
+
+    def __init__(self, chemin=DB_PATH, profil: str = None, taille_cache: int = TAILLE_CACHE_REQUETES,
+                 politique: PolitiqueReessai = None, lecture_seule: bool = False):
+        self.chemin = Path(chemin)
+        self.profil = profil
+        self.lecture_seule = lecture_seule
+        self.taille_cache = taille_cache
+        self.politique = politique or POLITIQUE_PAR_DEFAUT
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+        self._ouvertes = []  # toutes les connexions ouvertes, tous threads confondus
+
+    # ------------------------
+    #   CYCLE DE VIE
+    # ------------------------
+
+    def _ouvrir(self) -> sqlite3.Connection:
+        if self.lecture_seule:
+            # La base doit exister : une connexion en lecture seule ne la crée pas
+            cible, uri = self.chemin.resolve().as_uri() + "?mode=ro", True
+        else:
+            self.chemin.parent.mkdir(parents=True, exist_ok=True)
+            cible, uri = self.chemin, False
+        conn = sqlite3.connect(
+            cible,
+            uri=uri,
+            cached_statements=self.taille_cache,
+            check_same_thread=False,
+            timeout=self.politique.delai_verrou,
+            detect_types=sqlite3.PARSE_COLNAMES,
+        )
+        conn.row_factory = sqlite3.Row
+        # INSERT OR REPLACE (anciennes classes, storage.py) déclenche alors les triggers
+        # AFTER DELETE : journal des modifications et index plein texte restent exacts
+        conn.execute("PRAGMA recursive_triggers = ON")
+        if self.profil:
+            appliquer_profil(conn, self.profil, self.lecture_seule)
+        if self.lecture_seule:
+            conn.execute("PRAGMA query_only = ON")
+        with self._verrou:
+            self._ouvertes.append(conn)
+        return conn
+
+    def connexion(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant, en l'ouvrant si besoin."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._ouvrir()
+            self._local.conn = conn
+        return conn
+
+    def changer_profil(self, nom: str):
+        """Change le profil des prochaines connexions et de celle du thread courant."""
+        if nom not in PROFILS_PRAGMA:
+            raise ValueError(f"Profil SQLite inconnu : {nom!r} (attendu : {', '.join(PROFILS_PRAGMA)})")
+        self.profil = nom
+        if self.est_ouverte():
+            appliquer_profil(self._local.conn, nom, self.lecture_seule)
+
+    def changer_politique(self, politique: PolitiqueReessai):
+        """Change la politique d'attente sur verrou (connexion courante comprise)."""
+        self.politique = politique
+        if self.est_ouverte():
+            self._local.conn.execute(f"PRAGMA busy_timeout = {int(politique.delai_verrou * 1000)}")
+
+    def pragmas(self) -> dict:
+        """PRAGMA effectifs de la connexion du thread courant."""
+        return lire_pragmas(self.connexion())
+
+    def est_ouverte(self) -> bool:
+        return getattr(self._local, "conn", None) is not None
+
+    def fermer(self):
+        """Ferme la connexion du thread courant (valide les écritures en attente)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._verrou:
+            if conn in self._ouvertes:
+                self._ouvertes.remove(conn)
+        conn.commit()
+        conn.close()
+
+    def fermer_tout(self):
+        """Ferme toutes les connexions ouvertes par ce gestionnaire (fin de programme)."""
+        with self._verrou:
+            ouvertes, self._ouvertes = self._ouvertes, []
+        for conn in ouvertes:
+            try:
+                conn.commit()
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self.connexion()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fermer()
+        return False
+
+    # ------------------------
+    #   EXÉCUTION
+    # ------------------------
+
+    def executer(self, sql: str, params=()) -> sqlite3.Cursor:
+        """Exécute une requête sur la connexion partagée (requête préparée mise en cache)."""
+        return self.connexion().execute(sql, params)
+
+    def executer_plusieurs(self, sql: str, lignes) -> sqlite3.Cursor:
+        return self.connexion().executemany(sql, lignes)
+
+    # ------------------------
+    #   UNITÉ DE TRAVAIL
+    # ------------------------
+
+    def en_transaction(self) -> bool:
+        """Vrai si une unité de travail est ouverte dans le thread courant."""
+        return getattr(self._local, "profondeur", 0) > 0
+
+    def _debuter_ecriture(self, conn: sqlite3.Connection):
+        """BEGIN IMMEDIATE avec réessais : le verrou d'écriture est pris avant toute lecture."""
+        attentes = self.politique.attentes()
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as erreur:
+                if not est_erreur_verrou(erreur):
+                    raise
+                attente = next(attentes, None)
+                if attente is None:
+                    raise BaseOccupee(f"Base occupée par un autre poste ({self.chemin})") from erreur
+                time.sleep(attente)
+
+    @contextmanager
+    def transaction(self, ecriture: bool = False):
+        """Unité de travail : un seul commit à la sortie du bloc le plus externe.
+
+        Les blocs imbriqués sont des SAVEPOINT : une exception annule le bloc
+        où elle survient puis se propage. Avec `ecriture=True`, le bloc
+        externe réserve le verrou d'écriture dès le début (BEGIN IMMEDIATE) :
+        la contention se manifeste là, selon la politique de réessai, et non
+        au milieu des modifications.
+        """
+        conn = self.connexion()
+        profondeur = getattr(self._local, "profondeur", 0)
+        if profondeur == 0:
+            if not conn.in_transaction:
+                if ecriture:
+                    self._debuter_ecriture(conn)
+                else:
+                    conn.execute("BEGIN")
+        else:
+            conn.execute(f"SAVEPOINT uow_{profondeur}")
+        self._local.profondeur = profondeur + 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.profondeur = profondeur
+            if profondeur == 0:
+                conn.rollback()
+            else:
+                conn.execute(f"ROLLBACK TO uow_{profondeur}")
+                conn.execute(f"RELEASE uow_{profondeur}")
+            raise
+        self._local.profondeur = profondeur
+        if profondeur == 0:
+            conn.commit()
+        else:
+            conn.execute(f"RELEASE uow_{profondeur}")
+
+    def valider(self):
+        """Commit, sauf si une unité de travail est ouverte (elle validera à sa sortie)."""
+        if not self.en_transaction():
+            self.connexion().commit()
+
+
+# ------------------------
+#   REGISTRE DES GESTIONNAIRES
+# ------------------------
+
+_gestionnaires = {}
+_verrou_registre = threading.Lock()
+
+
+def obtenir_gestionnaire(chemin=DB_PATH, profil: str = None, lecture_seule: bool = False) -> GestionnaireConnexion:
+    """Retourne le gestionnaire unique associé au fichier `chemin` (un par mode d'accès).
+
+    Si `profil` est donné et diffère du profil courant, il est appliqué.
+    """
+    cle = (Path(chemin).resolve(), lecture_seule)
+    with _verrou_registre:
+        gestionnaire = _gestionnaires.get(cle)
+        if gestionnaire is None:
+            gestionnaire = GestionnaireConnexion(chemin, profil=profil, lecture_seule=lecture_seule)
+            _gestionnaires[cle] = gestionnaire
+            return gestionnaire
+    if profil and profil != gestionnaire.profil:
+        gestionnaire.changer_profil(profil)
+    return gestionnaire
+
+
+def obtenir_connexion(chemin=DB_PATH) -> sqlite3.Connection:
+    return obtenir_gestionnaire(chemin).connexion()
+
+
+def valider(chemin=DB_PATH):
+    """Commit sur la connexion partagée, différé si une unité de travail est ouverte."""
+    obtenir_gestionnaire(chemin).valider()
+
+
+def fermer_connexions():
+    """Ferme toutes les connexions de tous les gestionnaires."""
+    with _verrou_registre:
+        gestionnaires = list(_gestionnaires.values())
+    for gestionnaire in gestionnaires:
+        gestionnaire.fermer_tout()
+
+
+atexit.register(fermer_connexions)
@@ -0,0 +1,69 @@
+import sys
+
+from classes.Connexion import DB_PATH, GestionnaireConnexion, obtenir_gestionnaire
+from classes.Migrations import migrer
+
+# Rapprochement de `livres.disponible` avec les emprunts en cours.
+#
+# La disponibilité existe à deux endroits : la colonne `livres.disponible`
+# (cible des UPDATE conditionnels d'emprunter_livre / retourner_livre) et
+# les lignes `emprunts` au statut 1. La vue `vue_livres` (migration 7) en
+# donne la valeur de référence ; le contrôle et la réparation comparent la
+# colonne à cette vue en une seule requête, pour tout le catalogue.
+#
+# Usage (depuis le dossier code/) :
+#     python -m classes.Disponibilite            # liste les écarts
+#     python -m classes.Disponibilite --reparer  # les corrige
+
+REQUETE_ECARTS = """
+    SELECT l.isbn, l.disponible AS disponible_stocke, v.disponible AS disponible_calcule
+    FROM livres l JOIN vue_livres v ON v.isbn = l.isbn
+    WHERE l.disponible IS NOT v.disponible
+    ORDER BY l.isbn
+"""
+
+# version + 1 : les autres postes voient la correction (journal des modifications)
+# et un emprunt préparé sur l'ancienne valeur est refusé comme conflit
+REQUETE_REPARATION = """
+    UPDATE livres SET disponible = v.disponible, version = livres.version + 1
+    FROM vue_livres v
+    WHERE v.isbn = livres.isbn AND livres.disponible IS NOT v.disponible
+    RETURNING livres.isbn, livres.disponible, livres.version
+"""
+
+
+def livres_divergents(gestionnaire: GestionnaireConnexion) -> list:
+    """(isbn, disponible en base, disponible d'après les emprunts) des livres en écart."""
+    return [tuple(row) for row in gestionnaire.connexion().execute(REQUETE_ECARTS)]
+
+
+def reparer_disponibilite(gestionnaire: GestionnaireConnexion) -> list:
+    """Aligne `livres.disponible` sur les emprunts en cours ; retourne (isbn, disponible, version) corrigés."""
+    with gestionnaire.transaction(ecriture=True) as conn:
+        return [(row[0], bool(row[1]), row[2]) for row in conn.execute(REQUETE_REPARATION)]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Contrôle de livres.disponible d'après les emprunts en cours.")
+    parser.add_argument("--base", default=str(DB_PATH))
+    parser.add_argument("--reparer", action="store_true", help="corrige les écarts trouvés")
+    args = parser.parse_args()
+
+    gestionnaire = obtenir_gestionnaire(args.base)
+    migrer(gestionnaire.connexion())  # vue_livres : migration 7
+    if args.reparer:
+        corriges = reparer_disponibilite(gestionnaire)
+        for isbn, disponible, _ in corriges:
+            print(f"{isbn} : disponible = {int(disponible)}")
+        print(f"{len(corriges)} livre(s) corrigé(s)")
+        return 0
+    ecarts = livres_divergents(gestionnaire)
+    for isbn, stocke, calcule in ecarts:
+        print(f"{isbn} : disponible = {stocke}, attendu {int(calcule)}")
+    print(f"{len(ecarts)} écart(s)")
+    return 1 if ecarts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import queue
+import threading
+from itertools import groupby
+
+# Écriture différée : les modifications demandées par l'interface sont
+# exécutées par un thread dédié, dans l'ordre de soumission. Les opérations
+# en attente sont regroupées par lots, un seul commit par lot. La fenêtre Tk
+# ne se fige plus pendant les commits (disque lent, verrou d'un autre poste).
+#
+# Les méthodes de Bibliotheque s'exécutent telles quelles dans le thread
+# d'écriture, sur sa propre connexion : elles y mettent aussi à jour les
+# dictionnaires en mémoire, que l'interface continue de lire directement.
+# Seul ce thread modifie alors la mémoire ; l'interface parcourt des copies
+# (list(...)) pour ne pas voir un dictionnaire changer de taille.
+#
+# Les rappels (succès / échec) ne sont jamais appelés depuis le thread
+# d'écriture : ils sont déposés dans une file que le thread Tk vide avec
+# traiter_terminees(), planifiée par root.after.
+
+TAILLE_FILE_ECRITURE = 256   # opérations en attente au plus (soumettre refuse au-delà)
+TAILLE_LOT_ECRITURE = 64     # opérations validées par un même commit au plus
+
+_ARRET = object()
+
+
+class Operation:
+    """Opération soumise au thread d'écriture."""
+    __slots__ = ("fonction", "args", "kwargs", "au_succes", "a_l_echec", "ecriture")
+
+    def __init__(self, fonction, args, kwargs, au_succes, a_l_echec, ecriture):
+        self.fonction = fonction
+        self.args = args
+        self.kwargs = kwargs
+        self.au_succes = au_succes
+        self.a_l_echec = a_l_echec
+        self.ecriture = ecriture
+
+
+class EcrivainDiffere:
+    """Thread d'écriture unique d'une Bibliotheque, alimenté par une file bornée.
+
+        ecrivain = EcrivainDiffere(biblio)
+        ecrivain.soumettre(biblio.retourner_livre, 42,
+                           au_succes=lambda ok, motif: ...,
+                           a_l_echec=lambda erreur: ...)
+        root.after(50, ...)  # appeler ecrivain.traiter_terminees() régulièrement
+
+    `au_succes(resultat, motif)` reçoit la valeur de retour de l'opération,
+    une fois le lot validé, et le motif du refus dû à un autre poste
+    (biblio.dernier_conflit juste après l'opération, None sinon).
+    `a_l_echec(erreur)` reçoit l'exception levée par l'opération ou par le
+    commit du lot ; les modifications en mémoire du lot sont alors annulées.
+    """
+
+    def __init__(self, biblio, taille_file: int = TAILLE_FILE_ECRITURE, taille_lot: int = TAILLE_LOT_ECRITURE):
+        self.biblio = biblio
+        self.taille_lot = taille_lot
+        self._file = queue.Queue(maxsize=taille_file)
+        self._terminees = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._boucle, name="ecrivain-bibliotheque", daemon=True)
+        self._thread.start()
+
+    # ------------------------
+    #   CÔTÉ INTERFACE
+    # ------------------------
+
+    def soumettre(self, fonction, *args, au_succes=None, a_l_echec=None, ecriture: bool = True, **kwargs) -> bool:
+        """Met l'opération en file sans attendre ; False si la file est pleine (ou l'écrivain arrêté).
+
+        `ecriture=False` pour une opération qui ne fait que lire la base
+        (ex. synchroniser) : elle passe dans l'ordre, mais hors transaction
+        d'écriture.
+        """
+        if not self._thread.is_alive():
+            return False
+        try:
+            self._file.put_nowait(Operation(fonction, args, kwargs, au_succes, a_l_echec, ecriture))
+        except queue.Full:
+            return False
+        return True
+
+    def en_attente(self) -> int:
+        """Nombre approximatif d'opérations pas encore exécutées."""
+        return self._file.qsize()
+
+    def traiter_terminees(self) -> int:
+        """Appelle les rappels des opérations terminées ; à appeler depuis le thread Tk."""
+        nombre = 0
+        while True:
+            try:
+                rappel, args = self._terminees.get_nowait()
+            except queue.Empty:
+                return nombre
+            rappel(*args)
+            nombre += 1
+
+    def arreter(self, delai: float = None):
+        """Exécute les opérations déjà soumises puis arrête le thread (attente bloquante)."""
+        if self._thread.is_alive():
+            self._file.put(_ARRET)
+            self._thread.join(delai)
+
+    # ------------------------
+    #   THREAD D'ÉCRITURE
+    # ------------------------
+
+    def _boucle(self):
+        try:
+            while True:
+                lot = [self._file.get()]
+                while lot[-1] is not _ARRET and len(lot) < self.taille_lot:
+                    try:
+                        lot.append(self._file.get_nowait())
+                    except queue.Empty:
+                        break
+                arret = lot[-1] is _ARRET
+                if arret:
+                    lot.pop()
+                for ecriture, groupe in groupby(lot, key=lambda operation: operation.ecriture):
+                    if ecriture:
+                        self._executer_lot(list(groupe))
+                    else:
+                        for operation in groupe:
+                            self._executer_lot([operation], transaction=False)
+                if arret:
+                    return
+        finally:
+            # Connexion propre au thread d'écriture
+            self.biblio.gestionnaire.fermer()
+
+    def _executer_lot(self, lot: list, transaction: bool = True):
+        """Exécute le lot ; les succès ne sont annoncés qu'après le commit."""
+        resultats = []
+        try:
+            if transaction:
+                with self.biblio.transaction():
+                    for operation in lot:
+                        resultats.append(self._executer(operation))
+            else:
+                resultats.append(self._executer(lot[0]))
+        except Exception as erreur:
+            # Début (BEGIN IMMEDIATE, BaseOccupee) ou commit du lot impossible : la mémoire a été
+            # remise en l'état par Bibliotheque.transaction, tout le lot échoue
+            conn = self.biblio.gestionnaire.connexion()
+            if conn.in_transaction and not self.biblio.gestionnaire.en_transaction():
+                conn.rollback()
+            for operation in lot:
+                self._annoncer(operation.a_l_echec, erreur)
+            return
+        for operation, (reussie, valeur, motif) in zip(lot, resultats):
+            if reussie:
+                self._annoncer(operation.au_succes, valeur, motif)
+            else:
+                self._annoncer(operation.a_l_echec, valeur)
+
+    def _executer(self, operation: Operation) -> tuple:
+        """(réussie, résultat ou exception, motif de refus) ; une exception n'interrompt pas le lot."""
+        self.biblio.dernier_conflit = None
+        try:
+            resultat = operation.fonction(*operation.args, **operation.kwargs)
+        except Exception as erreur:
+            # Le SAVEPOINT de l'opération est déjà annulé, les autres opérations du lot restent
+            return False, erreur, None
+        return True, resultat, self.biblio.dernier_conflit
+
+    def _annoncer(self, rappel, *args):
+        if rappel is not None:
+            self._terminees.put((rappel, args))
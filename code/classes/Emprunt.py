@@ -1,6 +1,7 @@
-import sqlite3
 from pathlib import Path
 from datetime import datetime, timedelta
+from classes.Connexion import obtenir_connexion, valider, vers_epoch
+from classes.Migrations import migrer
 
 DB_PATH = Path("data/bibliotheque.db")
 
@@ -47,7 +48,7 @@ class Emprunt:
         """
         Enregistre ou met à jour l'emprunt dans la table `emprunts`.
         """
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO emprunts
@@ -58,34 +59,20 @@ class Emprunt:
             self.id,
             self.id_utilisateur,
             self.id_livre,
-            self.date_emprunt.strftime("%Y-%m-%d %H:%M:%S"),
-            self.date_retour_prevue.strftime("%Y-%m-%d %H:%M:%S"),
-            self.date_retour_effective.strftime("%Y-%m-%d %H:%M:%S") if self.date_retour_effective else None,
+            vers_epoch(self.date_emprunt),
+            vers_epoch(self.date_retour_prevue),
+            vers_epoch(self.date_retour_effective),
             1 if self.statut else 0
         ))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
     @staticmethod
     def creer_table():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS emprunts (
-                id INTEGER PRIMARY KEY,
-                id_utilisateur TEXT,
-                id_livre TEXT,
-                date_emprunt TEXT,
-                date_retour_prevue TEXT,
-                date_retour_effective TEXT,
-                statut INTEGER
-            )
-        """)
-        conn.commit()
-        conn.close()
+        """Le schéma est géré par classes.Migrations (PRAGMA user_version)."""
+        migrer(obtenir_connexion(DB_PATH))
 
     def sauvegarder_db(self):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO emprunts
@@ -95,24 +82,30 @@ class Emprunt:
             self.id,
             self.id_utilisateur,
             self.id_livre,
-            self.date_emprunt.strftime("%Y-%m-%d %H:%M:%S"),
-            self.date_retour_prevue.strftime("%Y-%m-%d %H:%M:%S"),
-            self.date_retour_effective.strftime("%Y-%m-%d %H:%M:%S") if self.date_retour_effective else None,
+            vers_epoch(self.date_emprunt),
+            vers_epoch(self.date_retour_prevue),
+            vers_epoch(self.date_retour_effective),
             1 if self.statut else 0
         ))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
     def mettre_a_jour_db(self):
         self.sauvegarder_db()
 
     @staticmethod
     def charger_tous():
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM emprunts")
+        # Dates en secondes Unix, converties en datetime par le convertisseur "horodatage"
+        cursor.execute("""
+            SELECT id, id_utilisateur, id_livre,
+                   date_emprunt AS "date_emprunt [horodatage]",
+                   date_retour_prevue AS "date_retour_prevue [horodatage]",
+                   date_retour_effective AS "date_retour_effective [horodatage]",
+                   statut
+            FROM emprunts
+        """)
         rows = cursor.fetchall()
-        conn.close()
 
         emprunts = []
         for row in rows:
@@ -121,9 +114,9 @@ class Emprunt:
                     id=row[0],
                     id_utilisateur=row[1],
                     id_livre=row[2],
-                    date_emprunt=datetime.strptime(row[3], "%Y-%m-%d %H:%M:%S"),
-                    date_retour_prevue=datetime.strptime(row[4], "%Y-%m-%d %H:%M:%S"),
-                    date_retour_effective=datetime.strptime(row[5], "%Y-%m-%d %H:%M:%S") if row[5] else None,
+                    date_emprunt=row[3],
+                    date_retour_prevue=row[4],
+                    date_retour_effective=row[5],
                     statut=bool(row[6])
                 )
             )
@@ -153,8 +146,7 @@ class Emprunt:
 
     @staticmethod
     def supprimer_db(emprunt_id: int):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM emprunts WHERE id = ?", (emprunt_id,))
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        valider(DB_PATH)
\ No newline at end of file
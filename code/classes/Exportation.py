@@ -0,0 +1,183 @@
+import csv
+import gzip
+import io
+import json
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from classes.Archivage import COLONNES_EMPRUNTS, annees_couvertes, archives_attachees
+from classes.Connexion import DB_PATH, depuis_epoch, obtenir_gestionnaire, vers_epoch
+
+# Export du catalogue, des utilisateurs et de l'historique des emprunts en
+# CSV ou JSON Lines, éventuellement compressé (gzip). Les lignes sont lues
+# par paquets de taille fixe (fetchmany) et écrites au fil de l'eau : la
+# mémoire utilisée ne dépend pas de la taille des tables.
+#
+# Un export d'emprunts filtré par dates lit aussi les archives annuelles
+# (data/archive_AAAA.db, voir classes.Archivage) qui recoupent la plage,
+# comme Bibliotheque.historique_emprunts.
+#
+# Usage (depuis le dossier code/) :
+#     python -m classes.Exportation emprunts historique.csv.gz --debut 2025-01-01 --fin 2025-06-30
+
+TAILLE_LOT_EXPORT = 1000
+
+# Tables exportables et colonne de tri (ordre stable d'un export à l'autre)
+TABLES_EXPORTABLES = {
+    "livres": "isbn",
+    "utilisateurs": "numero_carte",
+    "emprunts": "id",
+}
+
+# Colonnes exportées : les dates des emprunts (secondes Unix) sont écrites en ISO 8601, heure locale
+_DATE_ISO = "strftime('%Y-%m-%dT%H:%M:%S', {0}, 'unixepoch', 'localtime') AS {0}"
+SELECTIONS = {
+    "emprunts": ", ".join(["id", "id_utilisateur", "id_livre"]
+                          + [_DATE_ISO.format(c) for c in ("date_emprunt", "date_retour_prevue", "date_retour_effective")]
+                          + ["statut", "version"]),
+}
+
+
+def _borne(valeur, fin: bool = False) -> tuple:
+    """Date / datetime / texte ISO -> (secondes Unix comparables à date_emprunt, heure précisée ?).
+
+    Une date seule comme borne de fin inclut toute la journée : la borne
+    devient minuit le lendemain, exclu. Une borne avec heure est incluse.
+    """
+    if isinstance(valeur, str):
+        valeur = datetime.fromisoformat(valeur) if "T" in valeur or " " in valeur else date.fromisoformat(valeur)
+    if isinstance(valeur, datetime):
+        return vers_epoch(valeur), True
+    valeur = datetime.combine(valeur, datetime.min.time()) + (timedelta(days=1) if fin else timedelta())
+    return vers_epoch(valeur), False
+
+
+def requete_export(table: str, debut=None, fin=None, schemas=()) -> tuple:
+    """Requête SQL et paramètres de l'export ; le filtre de dates ne porte que sur `emprunts`.
+
+    `schemas` : archives attachées dont les emprunts s'ajoutent à ceux de la
+    base principale (un emprunt présent des deux côtés, après un archivage
+    interrompu, n'est exporté qu'une fois).
+    """
+    if table not in TABLES_EXPORTABLES:
+        raise ValueError(f"Table non exportable : {table!r} (attendu : {', '.join(TABLES_EXPORTABLES)})")
+    conditions, params = [], []
+    if debut is not None or fin is not None:
+        if table != "emprunts":
+            raise ValueError("Le filtre par dates ne s'applique qu'aux emprunts")
+        if debut is not None:
+            conditions.append("emprunts.date_emprunt >= ?")
+            params.append(_borne(debut)[0])
+        if fin is not None:
+            secondes, avec_heure = _borne(fin, fin=True)
+            conditions.append(f"emprunts.date_emprunt {'<=' if avec_heure else '<'} ?")
+            params.append(secondes)
+    if schemas and table != "emprunts":
+        raise ValueError("Seuls les emprunts sont archivés")
+    selection = SELECTIONS.get(table, "*")
+    if schemas:
+        colonnes = ", ".join(COLONNES_EMPRUNTS)
+        parties = [f"SELECT {colonnes} FROM main.emprunts AS emprunts"
+                   + (f" WHERE {' AND '.join(conditions)}" if conditions else "")]
+        for schema in schemas:
+            filtres = conditions + ["NOT EXISTS (SELECT 1 FROM main.emprunts AS chaud WHERE chaud.id = emprunts.id)"]
+            parties.append(f"SELECT {colonnes} FROM {schema}.emprunts AS emprunts WHERE {' AND '.join(filtres)}")
+        # Tri de l'union (tri temporaire) : base principale et archives se recoupent dans le temps
+        return (f"SELECT {selection} FROM ({' UNION ALL '.join(parties)}) AS emprunts "
+                f"ORDER BY emprunts.date_emprunt, id", params * len(parties))
+    if not conditions:
+        return f"SELECT {selection} FROM {table} ORDER BY {TABLES_EXPORTABLES[table]}", params
+    # Tri aligné sur idx_emprunts_date_emprunt : pas de tri temporaire en mémoire
+    return (f"SELECT {selection} FROM {table} WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {table}.date_emprunt, id", params)
+
+
+def annees_export(table: str, debut=None, fin=None, repertoire=DB_PATH.parent) -> list:
+    """Années archivées à lire pour exporter `table` entre `debut` et `fin` (aucune sans filtre de dates)."""
+    if table != "emprunts" or (debut is None and fin is None):
+        return []
+    bornes = [None if valeur is None else depuis_epoch(_borne(valeur, fin=est_fin)[0])
+              for valeur, est_fin in ((debut, False), (fin, True))]
+    return annees_couvertes(*bornes, repertoire)
+
+
+def _ouvrir_sortie(chemin: Path, compresser: bool):
+    if compresser:
+        return io.TextIOWrapper(gzip.open(chemin, "wb"), encoding="utf-8", newline="")
+    return open(chemin, "w", encoding="utf-8", newline="")
+
+
+def lignes_par_lots(curseur, taille_lot: int = TAILLE_LOT_EXPORT):
+    """Génère les lignes d'un curseur en ne gardant qu'un lot en mémoire."""
+    while True:
+        lot = curseur.fetchmany(taille_lot)
+        if not lot:
+            return
+        yield from lot
+
+
+def exporter(table: str, chemin, format_fichier: str = None, compresser: bool = None,
+             debut=None, fin=None, taille_lot: int = TAILLE_LOT_EXPORT, chemin_base=DB_PATH) -> int:
+    """Exporte `table` dans `chemin` et retourne le nombre de lignes écrites.
+
+    Le format ("csv" ou "jsonl") et la compression se déduisent de
+    l'extension s'ils ne sont pas donnés (ex. historique.jsonl.gz).
+    `debut` / `fin` filtrent les emprunts sur leur date d'emprunt ; les
+    archives des années de la plage sont lues avec la base principale.
+    """
+    chemin = Path(chemin)
+    suffixes = [s.lower() for s in chemin.suffixes]
+    if compresser is None:
+        compresser = bool(suffixes) and suffixes[-1] == ".gz"
+    if format_fichier is None:
+        extension = [s for s in suffixes if s != ".gz"]
+        format_fichier = extension[-1].lstrip(".") if extension else "csv"
+    if format_fichier not in ("csv", "jsonl"):
+        raise ValueError(f"Format d'export inconnu : {format_fichier!r} (attendu : csv ou jsonl)")
+
+    gestionnaire = obtenir_gestionnaire(chemin_base, lecture_seule=True)
+    annees = annees_export(table, debut, fin, Path(chemin_base).parent)
+    nb_lignes = 0
+    # Une seule transaction de lecture : l'export reflète un état cohérent de la base et des archives
+    with archives_attachees(gestionnaire, annees, Path(chemin_base).parent) as schemas, \
+            gestionnaire.transaction(), _ouvrir_sortie(chemin, compresser) as sortie:
+        sql, params = requete_export(table, debut, fin, schemas)
+        curseur = gestionnaire.connexion().cursor()
+        curseur.arraysize = taille_lot
+        curseur.execute(sql, params)
+        colonnes = [description[0] for description in curseur.description]
+        if format_fichier == "csv":
+            ecrivain = csv.writer(sortie, delimiter=";")
+            ecrivain.writerow(colonnes)
+            for ligne in lignes_par_lots(curseur, taille_lot):
+                ecrivain.writerow(tuple(ligne))
+                nb_lignes += 1
+        else:
+            for ligne in lignes_par_lots(curseur, taille_lot):
+                sortie.write(json.dumps(dict(zip(colonnes, ligne)), ensure_ascii=False))
+                sortie.write("\n")
+                nb_lignes += 1
+    return nb_lignes
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Export d'une table en CSV ou JSON Lines (gzip possible).")
+    parser.add_argument("table", choices=tuple(TABLES_EXPORTABLES))
+    parser.add_argument("fichier", help="ex. livres.csv, emprunts.jsonl.gz")
+    parser.add_argument("--format", dest="format_fichier", choices=("csv", "jsonl"))
+    parser.add_argument("--gzip", dest="compresser", action="store_true", default=None)
+    parser.add_argument("--debut", help="date d'emprunt minimale (AAAA-MM-JJ), archives comprises")
+    parser.add_argument("--fin", help="date d'emprunt maximale, incluse (AAAA-MM-JJ)")
+    parser.add_argument("--lot", type=int, default=TAILLE_LOT_EXPORT)
+    args = parser.parse_args()
+
+    nb_lignes = exporter(args.table, args.fichier, args.format_fichier, args.compresser,
+                         args.debut, args.fin, args.lot)
+    print(f"{nb_lignes} lignes exportées dans {args.fichier}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import threading
+from collections import Counter
+from operator import itemgetter
+
+# Comptes par facette du catalogue (catégorie, éditeur, décennie de
+# publication, disponibilité) tenus à jour à chaque ajout, modification,
+# suppression, prêt et retour : pour chaque facette, valeur -> ensemble des
+# clés (ISBN) qui la portent. Le compte d'une valeur est la taille de son
+# ensemble ; rien n'est recalculé à l'affichage.
+#
+# Restreints à un résultat de recherche, les comptes d'une facette viennent
+# soit de l'intersection de chacun de ses ensembles avec les clés du
+# résultat, soit d'un parcours des seules clés du résultat : le moins
+# coûteux des deux, estimé d'après la taille des ensembles.
+#
+# Les mises à jour viennent aussi du thread d'écriture (EcrivainDiffere) :
+# un verrou sépare lectures et mises à jour des ensembles.
+
+# Coût d'une clé parcourue (lecture de ses valeurs + comptage), en recherches dans un set
+COUT_RELATIF_COMPTAGE = 3
+
+
+def decennie(livre):
+    """1987 -> 1980 ; None si l'année est absente ou invalide."""
+    try:
+        return int(livre.annee_publication) // 10 * 10
+    except (TypeError, ValueError):
+        return None
+
+
+FACETTES_LIVRES = {
+    "categorie": lambda livre: livre.categorie or "",
+    "editeur": lambda livre: livre.editeur or "",
+    "decennie": decennie,
+    "disponible": lambda livre: bool(livre.disponible),
+}
+
+
+
+class AttributSuivi:
+    """Attribut dont chaque changement de valeur est signalé à `obj._observateur(obj)`.
+
+    Le dictionnaire qui contient l'objet (DictionnaireIndexe) y inscrit son
+    observateur : les comptes suivent ainsi prêts et retours (livre.disponible
+    modifié sur place) sans que chaque appelant ait à les prévenir.
+    """
+
+    def __set_name__(self, owner, nom):
+        self.attribut = "_" + nom
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return getattr(obj, self.attribut)
+
+    def __set__(self, obj, valeur):
+        ancienne = getattr(obj, self.attribut, valeur)
+        setattr(obj, self.attribut, valeur)
+        observateur = getattr(obj, "_observateur", None)
+        if observateur is not None and valeur != ancienne:
+            observateur(obj)
+
+
+class Facettes:
+    """Comptes par valeur de chaque facette, mis à jour objet par objet.
+
+        facettes = Facettes(FACETTES_LIVRES)
+        facettes.ajouter(livre.isbn, livre)
+        facettes.comptes()                      # {"categorie": {"Roman": 120, ...}, ...}
+        facettes.comptes(parmi=isbn_trouves)    # mêmes comptes, restreints à une recherche
+    """
+
+    def __init__(self, extracteurs: dict):
+        self.extracteurs = dict(extracteurs)
+        self._ensembles = {nom: {} for nom in self.extracteurs}   # facette -> valeur -> set(clés)
+        self._valeurs = {}                                       # clé -> valeurs, dans l'ordre des facettes
+        self._verrou = threading.RLock()
+
+    def __len__(self):
+        return len(self._valeurs)
+
+    def ajouter(self, cle, objet):
+        """Enregistre (ou réenregistre après modification) l'objet `cle`."""
+        valeurs = tuple(extraire(objet) for extraire in self.extracteurs.values())
+        with self._verrou:
+            anciennes = self._valeurs.get(cle)
+            if anciennes == valeurs:
+                return
+            if anciennes is not None:
+                self.retirer(cle)
+            for ensembles, valeur in zip(self._ensembles.values(), valeurs):
+                cles = ensembles.get(valeur)
+                if cles is None:
+                    ensembles[valeur] = {cle}
+                else:
+                    cles.add(cle)
+            self._valeurs[cle] = valeurs
+
+    def retirer(self, cle) -> bool:
+        with self._verrou:
+            valeurs = self._valeurs.pop(cle, None)
+            if valeurs is None:
+                return False
+            for ensembles, valeur in zip(self._ensembles.values(), valeurs):
+                cles = ensembles[valeur]
+                cles.discard(cle)
+                if not cles:
+                    del ensembles[valeur]
+            return True
+
+    def vider(self):
+        with self._verrou:
+            self._ensembles = {nom: {} for nom in self.extracteurs}
+            self._valeurs = {}
+
+    def cles(self, nom: str, valeur) -> set:
+        """Clés portant `valeur` pour la facette `nom` (pour affiner une recherche par facette)."""
+        with self._verrou:
+            return set(self._ensembles[nom].get(valeur, ()))
+
+    def comptes(self, parmi=None, noms=None) -> dict:
+        """{facette: {valeur: nombre}} par nombre décroissant, sur tout le catalogue ou sur les clés `parmi`."""
+        noms = noms or tuple(self.extracteurs)
+        if parmi is not None and not isinstance(parmi, (set, frozenset)):
+            parmi = set(parmi)
+        bruts = {}
+        lignes = None  # valeurs des clés de `parmi`, lues une fois pour toutes les facettes parcourues
+        # Ensembles lus sous verrou : le thread d'écriture ne les modifie pas pendant les intersections
+        with self._verrou:
+            for rang, nom in enumerate(self.extracteurs):
+                if nom not in noms:
+                    continue
+                ensembles = self._ensembles[nom].items()
+                if parmi is None:
+                    bruts[nom] = {valeur: len(cles) for valeur, cles in ensembles}
+                elif (len(ensembles) <= COUT_RELATIF_COMPTAGE * len(parmi)
+                      and sum(min(len(cles), len(parmi)) for _, cles in ensembles)
+                      <= COUT_RELATIF_COMPTAGE * len(parmi)):
+                    bruts[nom] = {valeur: len(cles & parmi) for valeur, cles in ensembles}
+                else:
+                    if lignes is None:
+                        lignes = list(filter(None, map(self._valeurs.get, parmi)))
+                    bruts[nom] = Counter(map(itemgetter(rang), lignes))
+        return {nom: dict(sorted(((v, n) for v, n in comptes.items() if n), key=lambda item: item[1], reverse=True))
+                for nom, comptes in bruts.items()}
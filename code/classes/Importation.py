@@ -0,0 +1,275 @@
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from classes.Bibliotheque import Bibliotheque, Livre
+from classes.Normalisation import cle_livre
+
+# Import en masse du catalogue (fichiers d'acquisition CSV ou JSON Lines).
+# Le fichier est lu ligne à ligne par des générateurs, chaque ligne est
+# validée puis les livres sont écrits par lots : un executemany et une
+# transaction par lot, au lieu d'un commit par livre avec ajouter_livre().
+#
+# Usage (depuis le dossier code/) :
+#     python -m classes.Importation acquisitions.csv [--lot 1000] [--rejets rejets.csv]
+
+TAILLE_LOT_IMPORT = 1000
+TAILLE_LECTURE_VERSIONS = 500  # ISBN par requête IN (...) en relisant les versions d'un lot
+
+# Noms de colonnes acceptés dans les fichiers -> attribut de Livre
+ALIAS_COLONNES = {
+    "isbn": "isbn",
+    "titre": "titre",
+    "auteur": "auteur",
+    "editeur": "editeur",
+    "annee": "annee_publication",
+    "annee_publication": "annee_publication",
+    "categorie": "categorie",
+    "pages": "nombre_pages",
+    "nombre_pages": "nombre_pages",
+}
+
+REQUETE_UPSERT = """
+    INSERT INTO livres (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, cle_recherche,
+                        disponible, date_ajout)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'))
+    ON CONFLICT(isbn) DO UPDATE SET
+        titre = excluded.titre,
+        auteur = excluded.auteur,
+        editeur = excluded.editeur,
+        annee_publication = excluded.annee_publication,
+        categorie = excluded.categorie,
+        nombre_pages = excluded.nombre_pages,
+        cle_recherche = excluded.cle_recherche,
+        version = version + 1
+    WHERE (titre, auteur, editeur, annee_publication, categorie, nombre_pages)
+          IS NOT (excluded.titre, excluded.auteur, excluded.editeur,
+                  excluded.annee_publication, excluded.categorie, excluded.nombre_pages)
+"""
+
+
+class LigneInvalide(ValueError):
+    """Ligne du fichier rejetée (le message en donne le motif)."""
+
+    def __init__(self, motif: str, contenu=None):
+        super().__init__(motif)
+        self.contenu = contenu
+
+
+# ------------------------
+#   ISBN
+# ------------------------
+
+def normaliser_isbn(isbn) -> str:
+    """Retire tirets et espaces, met le X final en majuscule et vérifie la clé de contrôle.
+
+    Les ISBN-10 et ISBN-13 sont conservés tels quels (pas de conversion),
+    pour rester cohérents avec les ISBN déjà présents dans la base.
+    """
+    isbn = str(isbn or "").replace("-", "").replace(" ", "").strip().upper()
+    if len(isbn) == 10:
+        if not (isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == "X")):
+            raise LigneInvalide(f"ISBN-10 mal formé : {isbn!r}")
+        chiffres = [10 if c == "X" else int(c) for c in isbn]
+        if sum((10 - i) * c for i, c in enumerate(chiffres)) % 11 != 0:
+            raise LigneInvalide(f"Clé de contrôle ISBN-10 invalide : {isbn}")
+    elif len(isbn) == 13:
+        if not isbn.isdigit():
+            raise LigneInvalide(f"ISBN-13 mal formé : {isbn!r}")
+        if sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(isbn)) % 10 != 0:
+            raise LigneInvalide(f"Clé de contrôle ISBN-13 invalide : {isbn}")
+    else:
+        raise LigneInvalide(f"ISBN de longueur invalide : {isbn!r}")
+    return isbn
+
+
+# ------------------------
+#   LECTURE EN FLUX
+# ------------------------
+
+def lire_csv(chemin, delimiteur: str = None):
+    """Génère (numéro de ligne, dictionnaire) ; le délimiteur (, ; ou tabulation) est détecté si absent."""
+    with open(chemin, newline="", encoding="utf-8-sig") as fichier:
+        if delimiteur is None:
+            echantillon = fichier.read(4096)
+            fichier.seek(0)
+            try:
+                delimiteur = csv.Sniffer().sniff(echantillon, delimiters=",;\t").delimiter
+            except csv.Error:
+                delimiteur = ","
+        lecteur = csv.DictReader(fichier, delimiter=delimiteur)
+        for ligne in lecteur:
+            yield lecteur.line_num, ligne
+
+
+def lire_jsonl(chemin):
+    """Génère (numéro de ligne, dictionnaire) pour un fichier JSON Lines."""
+    with open(chemin, encoding="utf-8") as fichier:
+        for numero, texte in enumerate(fichier, start=1):
+            texte = texte.strip()
+            if not texte:
+                continue
+            try:
+                ligne = json.loads(texte)
+            except json.JSONDecodeError as erreur:
+                ligne = LigneInvalide(f"JSON invalide : {erreur.msg}", contenu=texte)
+            yield numero, ligne
+
+
+def lire_fichier(chemin, format_fichier: str = None):
+    """Choisit le lecteur d'après `format_fichier` ("csv" ou "jsonl") ou l'extension."""
+    format_fichier = format_fichier or Path(chemin).suffix.lstrip(".").lower()
+    if format_fichier in ("jsonl", "ndjson", "json"):
+        return lire_jsonl(chemin)
+    if format_fichier in ("csv", "txt", "tsv"):
+        return lire_csv(chemin, "\t" if format_fichier == "tsv" else None)
+    raise ValueError(f"Format d'import inconnu : {format_fichier!r} (attendu : csv ou jsonl)")
+
+
+# ------------------------
+#   VALIDATION
+# ------------------------
+
+def _entier(valeur, nom: str, defaut: int, minimum: int, maximum: int) -> int:
+    if valeur is None or str(valeur).strip() == "":
+        return defaut
+    try:
+        nombre = int(str(valeur).strip())
+    except ValueError:
+        raise LigneInvalide(f"{nom} non numérique : {valeur!r}")
+    if not minimum <= nombre <= maximum:
+        raise LigneInvalide(f"{nom} hors limites : {nombre}")
+    return nombre
+
+
+def valider_ligne(brute) -> tuple:
+    """Ligne brute -> tuple prêt pour REQUETE_UPSERT ; lève LigneInvalide sinon."""
+    if isinstance(brute, Exception):
+        raise brute
+    if not isinstance(brute, dict):
+        raise LigneInvalide("Ligne qui n'est pas un objet")
+    champs = {}
+    for cle, valeur in brute.items():
+        attribut = ALIAS_COLONNES.get(str(cle or "").strip().lower())
+        if attribut:
+            champs[attribut] = valeur.strip() if isinstance(valeur, str) else valeur
+
+    isbn = normaliser_isbn(champs.get("isbn"))
+    titre = champs.get("titre") or ""
+    auteur = champs.get("auteur") or ""
+    if not titre or not auteur:
+        raise LigneInvalide("Titre ou auteur manquant")
+    annee = _entier(champs.get("annee_publication"), "Année", datetime.now().year, 0, datetime.now().year + 1)
+    pages = _entier(champs.get("nombre_pages"), "Nombre de pages", 100, 1, 100_000)
+    return (isbn, str(titre), str(auteur), str(champs.get("editeur") or "Inconnu"),
+            annee, str(champs.get("categorie") or ""), pages, cle_livre(titre, auteur, isbn))
+
+
+# ------------------------
+#   IMPORT
+# ------------------------
+
+def _versions_lot(biblio: Bibliotheque, isbns: list) -> dict:
+    """isbn -> version en base, relue après l'upsert (qui l'incrémente pour un livre modifié)."""
+    versions = {}
+    for debut in range(0, len(isbns), TAILLE_LECTURE_VERSIONS):
+        tranche = isbns[debut:debut + TAILLE_LECTURE_VERSIONS]
+        rows = biblio.gestionnaire.executer(
+            f"SELECT isbn, version FROM livres WHERE isbn IN ({', '.join('?' * len(tranche))})", tranche)
+        versions.update((row[0], row[1]) for row in rows)
+    return versions
+
+
+def _appliquer_en_memoire(biblio: Bibliotheque, lot: list, versions: dict) -> int:
+    """Reporte un lot validé dans biblio.catalogue ; retourne le nombre de livres créés."""
+    crees = 0
+    for isbn, titre, auteur, editeur, annee, categorie, pages, cle in lot:
+        ancien = biblio.catalogue.get(isbn)
+        # Nouvel objet plutôt que modification sur place : la clé de recherche et l'index suivent
+        livre = Livre(isbn, titre, auteur, editeur, annee, categorie, pages, cle)
+        if ancien is None:
+            crees += 1
+        else:
+            livre.disponible = ancien.disponible
+        livre.version = versions.get(isbn, 0)
+        biblio.catalogue[isbn] = livre
+    return crees
+
+
+def importer_catalogue(biblio: Bibliotheque, chemin, format_fichier: str = None,
+                       taille_lot: int = TAILLE_LOT_IMPORT, fichier_rejets=None) -> dict:
+    """Importe (ou met à jour) les livres du fichier `chemin` et retourne les statistiques.
+
+    Les lignes rejetées sont écrites dans `fichier_rejets` (par défaut
+    <fichier>.rejets.csv) avec leur numéro de ligne et le motif. Un livre
+    déjà présent garde sa disponibilité ; sa version n'augmente que si
+    une de ses colonnes change.
+    """
+    chemin = Path(chemin)
+    fichier_rejets = Path(fichier_rejets) if fichier_rejets else chemin.with_name(chemin.name + ".rejets.csv")
+    stats = {"lues": 0, "importees": 0, "creees": 0, "mises_a_jour": 0, "inchangees": 0, "rejetees": 0}
+    debut = time.perf_counter()
+
+    lignes = lire_fichier(chemin, format_fichier)
+    with open(fichier_rejets, "w", newline="", encoding="utf-8") as sortie_rejets:
+        rejets = csv.writer(sortie_rejets, delimiter=";")
+        rejets.writerow(["ligne", "motif", "contenu"])
+        while True:
+            brutes = list(islice(lignes, taille_lot))
+            if not brutes:
+                break
+            lot = {}
+            for numero, brute in brutes:
+                stats["lues"] += 1
+                try:
+                    valeurs = valider_ligne(brute)
+                except LigneInvalide as motif:
+                    stats["rejetees"] += 1
+                    contenu = motif.contenu if motif.contenu is not None else json.dumps(brute, ensure_ascii=False)
+                    rejets.writerow([numero, str(motif), contenu])
+                    continue
+                lot[valeurs[0]] = valeurs  # un ISBN répété dans le lot : la dernière ligne l'emporte
+            if not lot:
+                continue
+            valeurs_lot = list(lot.values())
+            with biblio.gestionnaire.transaction(ecriture=True):
+                # rowcount : lignes insérées ou réellement modifiées (les livres identiques sont ignorés)
+                ecrites = biblio.gestionnaire.executer_plusieurs(REQUETE_UPSERT, valeurs_lot).rowcount
+                versions = _versions_lot(biblio, list(lot))
+            crees = _appliquer_en_memoire(biblio, valeurs_lot, versions)
+            stats["importees"] += len(valeurs_lot)
+            stats["creees"] += crees
+            stats["mises_a_jour"] += ecrites - crees
+            stats["inchangees"] += len(valeurs_lot) - ecrites
+
+    stats["duree"] = time.perf_counter() - debut
+    stats["livres_par_seconde"] = stats["importees"] / stats["duree"] if stats["duree"] else 0.0
+    stats["fichier_rejets"] = str(fichier_rejets)
+    return stats
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Import du catalogue depuis un fichier CSV ou JSON Lines.")
+    parser.add_argument("fichier")
+    parser.add_argument("--format", dest="format_fichier", choices=("csv", "tsv", "jsonl"))
+    parser.add_argument("--lot", type=int, default=TAILLE_LOT_IMPORT)
+    parser.add_argument("--rejets")
+    args = parser.parse_args()
+
+    biblio = Bibliotheque()
+    stats = importer_catalogue(biblio, args.fichier, args.format_fichier, args.lot, args.rejets)
+    biblio.fermer_connexion()
+    print(f"{stats['lues']} lignes lues, {stats['importees']} livres importés "
+          f"({stats['creees']} créés, {stats['mises_a_jour']} mis à jour, {stats['inchangees']} inchangés), "
+          f"{stats['rejetees']} rejetées")
+    print(f"{stats['duree']:.2f} s, {stats['livres_par_seconde']:.0f} livres/s ; rejets : {stats['fichier_rejets']}")
+    return 0 if stats["importees"] or not stats["lues"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+import heapq
+import math
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import partial
+from operator import itemgetter
+
+from classes.Normalisation import normaliser
+
+# Index inversé en mémoire du catalogue : pour chaque champ indexé, mot ->
+# clés (ISBN) des livres qui le contiennent, avec le nombre d'occurrences.
+# L'index suit les ajouts, suppressions et modifications un livre à la
+# fois ; aucune reconstruction complète n'est nécessaire.
+#
+# Les mots de chaque champ sont aussi gardés dans une liste triée : une
+# recherche par préfixe est un intervalle trouvé par dichotomie (bisect),
+# pas un parcours de tout le vocabulaire.
+#
+# Les statistiques de BM25 sont tenues à jour au fil des modifications :
+# fréquence documentaire (taille de la liste d'un mot), longueur de chaque
+# champ et longueur totale par champ (d'où la longueur moyenne). Une
+# recherche classée ne lit que les listes des mots de la requête.
+
+_FIN_PREFIXE = "\U0010ffff"  # plus grand point de code : borne haute des mots commençant par un préfixe
+
+# Paramètres usuels de BM25 : saturation de la fréquence, normalisation par la longueur
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def decouper(texte) -> list:
+    """Mots d'un texte normalisé (sans accents ni casse : "Société" -> "societe")."""
+    return normaliser(texte).split()
+
+
+class IndexInverse:
+    """Index mot -> clés, par champ, avec recherche exacte ou par préfixe et classement BM25.
+
+        index = IndexInverse(("titre", "auteur", "categorie"))
+        index.ajouter("978...", {"titre": "Les Misérables", "auteur": "Victor Hugo", ...})
+        index.rechercher("mis hugo")            # -> {"978..."}
+        index.rechercher_classe("mis hugo", 20)  # -> [("978...", 7.31), ...], meilleur d'abord
+    """
+
+    def __init__(self, champs):
+        self.champs = tuple(champs)
+        self._postings = {champ: {} for champ in self.champs}     # champ -> mot -> {clé: occurrences}
+        self._vocabulaire = {champ: [] for champ in self.champs}  # champ -> mots triés
+        self._longueurs = {champ: {} for champ in self.champs}    # champ -> clé -> nombre de mots
+        self._total_longueurs = dict.fromkeys(self.champs, 0)     # champ -> somme des longueurs
+        self._documents = {}                                      # clé -> {champ: {mot: occurrences}}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, cle):
+        return cle in self._documents
+
+    # ------------------------
+    #   MISE À JOUR
+    # ------------------------
+
+    def ajouter(self, cle, valeurs: dict):
+        """Indexe (ou réindexe) le document `cle` ; `valeurs` : champ -> texte."""
+        if cle in self._documents:
+            self.retirer(cle)
+        mots_par_champ = {}
+        for champ in self.champs:
+            mots = decouper(valeurs.get(champ))
+            occurrences = Counter(mots)
+            mots_par_champ[champ] = occurrences
+            self._longueurs[champ][cle] = len(mots)
+            self._total_longueurs[champ] += len(mots)
+            postings = self._postings[champ]
+            for mot, nombre in occurrences.items():
+                cles = postings.get(mot)
+                if cles is None:
+                    postings[mot] = {cle: nombre}
+                    insort(self._vocabulaire[champ], mot)
+                else:
+                    cles[cle] = nombre
+        self._documents[cle] = mots_par_champ
+
+    def retirer(self, cle) -> bool:
+        mots_par_champ = self._documents.pop(cle, None)
+        if mots_par_champ is None:
+            return False
+        for champ, occurrences in mots_par_champ.items():
+            self._total_longueurs[champ] -= self._longueurs[champ].pop(cle)
+            postings = self._postings[champ]
+            for mot in occurrences:
+                cles = postings[mot]
+                del cles[cle]
+                if not cles:
+                    del postings[mot]
+                    vocabulaire = self._vocabulaire[champ]
+                    del vocabulaire[bisect_left(vocabulaire, mot)]
+        return True
+
+    def mettre_a_jour(self, ancienne_cle, cle, valeurs: dict):
+        """Modification d'un document, éventuellement avec changement de clé (ISBN)."""
+        self.retirer(ancienne_cle)
+        self.ajouter(cle, valeurs)
+
+    def vider(self):
+        self.__init__(self.champs)
+
+    # ------------------------
+    #   RECHERCHE
+    # ------------------------
+
+    def mots_commencant_par(self, prefixe: str, champ: str) -> list:
+        """Mots du champ qui commencent par `prefixe`, par dichotomie dans le vocabulaire trié."""
+        vocabulaire = self._vocabulaire[champ]
+        debut = bisect_left(vocabulaire, prefixe)
+        fin = bisect_left(vocabulaire, prefixe + _FIN_PREFIXE, debut)
+        return vocabulaire[debut:fin]
+
+    def _termes(self, mot: str, prefixe: bool, champ: str) -> list:
+        if prefixe:
+            return self.mots_commencant_par(mot, champ)
+        return [mot] if mot in self._postings[champ] else []
+
+    def cles_pour_mot(self, mot: str, prefixe: bool = False, champs=None) -> set:
+        """Clés des documents contenant `mot` (ou un mot qui commence par `mot`) dans l'un des champs."""
+        resultat = set()
+        for champ in champs or self.champs:
+            postings = self._postings[champ]
+            for terme in self._termes(mot, prefixe, champ):
+                resultat.update(postings[terme])
+        return resultat
+
+    def rechercher(self, texte: str, prefixe: bool = True, champs=None) -> set:
+        """Clés des documents contenant tous les mots de `texte` (chacun dans l'un des champs).
+
+        Avec `prefixe`, chaque mot peut n'être que le début d'un mot indexé.
+        Les listes sont intersectées de la plus courte à la plus longue.
+        """
+        mots = set(decouper(texte))
+        if not mots:
+            return set()
+        listes = sorted((self.cles_pour_mot(mot, prefixe, champs) for mot in mots), key=len)
+        resultat = listes[0]
+        for cles in listes[1:]:
+            if not resultat:
+                break
+            resultat = resultat & cles
+        return resultat
+
+    def _listes_mot(self, mot: str, prefixe: bool, poids: dict) -> list:
+        """(postings, longueurs du champ, facteur, norme moyenne) de chaque terme qui répond à `mot`."""
+        nb_documents = len(self._documents)
+        listes = []
+        for champ in self.champs:
+            poids_champ = poids.get(champ, 1.0)
+            if not poids_champ or not self._total_longueurs[champ]:
+                continue
+            moyenne = self._total_longueurs[champ] / nb_documents
+            postings = self._postings[champ]
+            for terme in self._termes(mot, prefixe, champ):
+                cles = postings[terme]
+                idf = math.log(1 + (nb_documents - len(cles) + 0.5) / (len(cles) + 0.5))
+                listes.append((cles, self._longueurs[champ], poids_champ * idf * (BM25_K1 + 1), moyenne))
+        return listes
+
+    @staticmethod
+    def _score(occurrences, longueur, facteur, moyenne) -> float:
+        return facteur * occurrences / (occurrences + BM25_K1 * (1 - BM25_B + BM25_B * longueur / moyenne))
+
+    def rechercher_classe(self, texte: str, limite: int = 20, poids: dict = None, prefixe: bool = True) -> list:
+        """(clé, score) des `limite` meilleurs documents contenant tous les mots de `texte`, meilleur d'abord.
+
+        Score : somme, sur les mots de la requête et les champs, du BM25 du
+        champ multiplié par son poids (`poids` : champ -> poids, 1 par
+        défaut). Le mot aux listes les plus courtes est lu en premier ; pour
+        les suivants, les documents déjà retenus sont cherchés dans leurs
+        listes quand ils sont moins nombreux qu'elles. Les `limite` premiers
+        sont tirés par un tas, sans trier tous les résultats.
+        """
+        poids = poids or {}
+        mots = [self._listes_mot(mot, prefixe, poids) for mot in dict.fromkeys(decouper(texte))]
+        if not mots or not all(mots):
+            return []
+        mots.sort(key=lambda listes: sum(len(cles) for cles, *_ in listes))
+        scores = None
+        for listes in mots:
+            taille = sum(len(cles) for cles, *_ in listes)
+            nouveaux = {}
+            if scores is not None and len(scores) * len(listes) < taille:
+                for cle, score in scores.items():
+                    for cles, longueurs, facteur, moyenne in listes:
+                        occurrences = cles.get(cle)
+                        if occurrences:
+                            score += self._score(occurrences, longueurs[cle], facteur, moyenne)
+                            nouveaux[cle] = score
+            else:
+                for cles, longueurs, facteur, moyenne in listes:
+                    for cle, occurrences in cles.items():
+                        nouveaux[cle] = nouveaux.get(cle, 0.0) + self._score(occurrences, longueurs[cle], facteur, moyenne)
+                if scores is not None:
+                    nouveaux = {cle: score + scores[cle] for cle, score in nouveaux.items() if cle in scores}
+            scores = nouveaux
+            if not scores:
+                return []
+        return heapq.nlargest(limite, scores.items(), key=itemgetter(1))
+
+
+# ------------------------
+#   INDEX DE TRIGRAMMES
+# ------------------------
+
+# Les filtres de l'interface cherchent une sous-chaîne quelconque ("rnier"
+# trouve "Garnier"), ce qu'un index de mots ne sait pas faire. Toute
+# sous-chaîne de 3 caractères ou plus contient ses propres trigrammes : les
+# documents qui les ont tous sont les seuls candidats possibles, et chacun
+# est ensuite vérifié sur son texte.
+#
+# Chaque document reçoit un numéro croissant ; les listes de numéros par
+# trigramme sont des array triés (4 octets par entrée, contre une trentaine
+# pour un set) et un ajout est un simple append. Parcourir une liste dans
+# l'ordre des numéros redonne l'ordre d'insertion du dict indexé.
+
+TAILLE_TRIGRAMME = 3
+
+
+def trigrammes(texte: str) -> set:
+    return set(map("".join, zip(texte, texte[1:], texte[2:])))
+
+
+class IndexTrigrammes:
+    """Index trigramme -> documents, pour la recherche de sous-chaînes.
+
+        index = IndexTrigrammes(attrgetter("cle_recherche"))
+        index.ajouter("C001", utilisateur)
+        list(index.correspondances("RNIER"))   # -> ["C001"] si la clé contient "rnier"
+    """
+
+    def __init__(self, cle_de):
+        self.cle_de = cle_de                  # objet -> texte cherché, déjà normalisé (voir classes.Normalisation)
+        self._numeros = {}                    # clé -> numéro
+        self._documents = []                  # numéro -> (clé, texte), None si retiré
+        self._postings = {}                   # trigramme -> array des numéros, croissants
+
+    def __len__(self):
+        return len(self._numeros)
+
+    # ------------------------
+    #   MISE À JOUR
+    # ------------------------
+
+    def ajouter(self, cle, objet):
+        if cle in self._numeros:
+            self.retirer(cle)
+        texte = self.cle_de(objet) or ""
+        numero = len(self._documents)
+        self._documents.append((cle, texte))
+        self._numeros[cle] = numero
+        postings = self._postings
+        for trigramme in trigrammes(texte):
+            numeros = postings.get(trigramme)
+            if numeros is None:
+                postings[trigramme] = array("l", (numero,))
+            else:
+                numeros.append(numero)
+
+    def retirer(self, cle) -> bool:
+        numero = self._numeros.pop(cle, None)
+        if numero is None:
+            return False
+        _, texte = self._documents[numero]
+        self._documents[numero] = None
+        for trigramme in trigrammes(texte):
+            numeros = self._postings[trigramme]
+            del numeros[bisect_left(numeros, numero)]
+            if not numeros:
+                del self._postings[trigramme]
+        # Renumérote quand les places libérées dépassent les documents présents
+        if len(self._documents) > 2 * len(self._numeros) + 1024:
+            self._compacter()
+        return True
+
+    def vider(self):
+        self._numeros, self._documents, self._postings = {}, [], {}
+
+    def _compacter(self):
+        documents = [doc for doc in self._documents if doc is not None]
+        postings = {}
+        for numero, (_, texte) in enumerate(documents):
+            for trigramme in trigrammes(texte):
+                numeros = postings.get(trigramme)
+                if numeros is None:
+                    postings[trigramme] = array("l", (numero,))
+                else:
+                    numeros.append(numero)
+        # Liste des documents remplacée d'un bloc : un lecteur concurrent
+        # peut manquer un résultat, jamais en vérifier un contre le mauvais texte
+        self._documents = documents
+        self._postings = postings
+        self._numeros = {cle: numero for numero, (cle, _) in enumerate(documents)}
+
+    # ------------------------
+    #   RECHERCHE
+    # ------------------------
+
+    def correspondances(self, motif: str):
+        """Clés des documents dont le texte contient `motif` (normalisé), dans l'ordre d'insertion.
+
+        Générateur : l'appelant peut s'arrêter aux premiers résultats. Sous
+        3 caractères, tous les documents sont candidats.
+        """
+        motif = normaliser(motif)
+        documents = self._documents
+        if len(motif) < TAILLE_TRIGRAMME:
+            candidats = range(len(documents))
+        else:
+            listes = [self._postings.get(trigramme) for trigramme in trigrammes(motif)]
+            if not all(listes):
+                return
+            # La plus courte liste suffit : la vérification du texte fait le reste
+            candidats = min(listes, key=len)[:]
+        for numero in candidats:
+            document = documents[numero] if numero < len(documents) else None
+            if document is not None and motif in document[1]:
+                yield document[0]
+
+    def rechercher(self, motif: str) -> set:
+        return set(self.correspondances(motif))
+
+
+class DictionnaireIndexe(dict):
+    """dict dont chaque écriture met à jour un IndexTrigrammes (attribut `index`) et, si fournies, des Facettes.
+
+    Sert pour Bibliotheque.catalogue et Bibliotheque.utilisateurs : toutes
+    leurs modifications (chargement, synchronisation, annulations) passent
+    par ces méthodes. Les objets ne doivent pas changer de texte sur place ;
+    les attributs de facette modifiés sur place (AttributSuivi) sont
+    signalés par l'objet lui-même.
+    """
+
+    def __init__(self, cle_de, facettes=None):
+        super().__init__()
+        self.index = IndexTrigrammes(cle_de)
+        self.facettes = facettes
+
+    def __setitem__(self, cle, valeur):
+        ancien = super().get(cle)
+        super().__setitem__(cle, valeur)
+        self.index.ajouter(cle, valeur)
+        if self.facettes is not None:
+            if ancien is not None and ancien is not valeur:
+                ancien._observateur = None
+            self.facettes.ajouter(cle, valeur)
+            valeur._observateur = partial(self._objet_modifie, cle)
+
+    def _objet_modifie(self, cle, objet):
+        if super().get(cle) is objet:
+            self.facettes.ajouter(cle, objet)
+
+    def _detacher(self, cle, valeur):
+        self.index.retirer(cle)
+        if self.facettes is not None:
+            self.facettes.retirer(cle)
+            valeur._observateur = None
+
+    def __delitem__(self, cle):
+        valeur = super().pop(cle)
+        self._detacher(cle, valeur)
+
+    def pop(self, cle, *defaut):
+        if cle not in self:
+            return super().pop(cle, *defaut)
+        valeur = super().pop(cle)
+        self._detacher(cle, valeur)
+        return valeur
+
+    def popitem(self):
+        cle, valeur = super().popitem()
+        self._detacher(cle, valeur)
+        return cle, valeur
+
+    def setdefault(self, cle, defaut=None):
+        if cle not in self:
+            self[cle] = defaut
+        return self[cle]
+
+    def update(self, *args, **kwargs):
+        for cle, valeur in dict(*args, **kwargs).items():
+            self[cle] = valeur
+
+    def clear(self):
+        if self.facettes is not None:
+            for valeur in self.values():
+                valeur._observateur = None
+            self.facettes.vider()
+        super().clear()
+        self.index.vider()
@@ -0,0 +1,49 @@
+import os
+import sys
+import marshal
+from pathlib import Path
+
+# Instantané binaire de l'état hydraté de Bibliotheque. Les objets y sont
+# stockés sous forme de tuples de types natifs sérialisés avec marshal
+# (pickle est plusieurs fois plus lent sur des millions d'objets) ; les
+# dates y sont des secondes Unix, comme en base, et ne sont converties en
+# datetime qu'à la lecture. Il n'est utilisé que s'il correspond exactement
+# à la base : même schéma, même mode de chargement et même position dans
+# le journal des modifications.
+
+FICHIER_INSTANTANE = Path("data/bibliotheque.snapshot")
+FORMAT_INSTANTANE = 4
+
+
+def _entete() -> tuple:
+    # marshal n'est garanti que pour une même version de Python
+    return (FORMAT_INSTANTANE, sys.version_info[0], sys.version_info[1])
+
+
+def ecrire_instantane(chemin, etat: dict):
+    """Écrit l'état de façon atomique (fichier temporaire puis remplacement)."""
+    chemin = Path(chemin)
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    temporaire = chemin.with_suffix(chemin.suffix + ".tmp")
+    with open(temporaire, "wb") as fichier:
+        fichier.write(marshal.dumps({"entete": _entete(), **etat}))
+    os.replace(temporaire, chemin)
+
+
+def lire_instantane(chemin):
+    """Retourne l'état enregistré, ou None si le fichier est absent, illisible ou d'un autre format."""
+    try:
+        with open(chemin, "rb") as fichier:
+            etat = marshal.loads(fichier.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(etat, dict) or etat.get("entete") != _entete():
+        return None
+    return etat
+
+
+def supprimer_instantane(chemin):
+    try:
+        os.remove(chemin)
+    except FileNotFoundError:
+        pass
@@ -1,7 +1,9 @@
-import sqlite3
 from pathlib import Path
 from datetime import datetime
 import re
+from classes.Connexion import obtenir_connexion, valider
+from classes.Migrations import migrer
+from classes.Normalisation import cle_livre
 
 DB_PATH = Path("data/bibliotheque.db")
 
@@ -18,6 +20,8 @@ class Livre:
         self.nombre_pages = nombre_pages
         self.disponible = disponibilite
         self.date_ajout = date_ajout or datetime.now()
+        # Clé des filtres (voir classes.Normalisation) : un livre modifié est remplacé par un nouvel objet
+        self.cle_recherche = cle_livre(titre, auteur, isbn)
 
     def __repr__(self):
         return (f"Livre(isbn='{self.isbn}', titre='{self.titre}', auteur='{self.auteur}', "
@@ -55,31 +59,17 @@ class Livre:
 
     @staticmethod
     def creer_table():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS livres (
-                isbn TEXT PRIMARY KEY,
-                titre TEXT,
-                auteur TEXT,
-                editeur TEXT,
-                annee_publication INTEGER,
-                categorie TEXT,
-                nombre_pages INTEGER,
-                disponible INTEGER,
-                date_ajout TEXT
-            )
-        """)
-        conn.commit()
-        conn.close()
+        """Le schéma est géré par classes.Migrations (PRAGMA user_version)."""
+        migrer(obtenir_connexion(DB_PATH))
 
     def save(self):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO livres
-            (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible, date_ajout)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible, date_ajout,
+             cle_recherche)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             self.isbn,
             self.titre,
@@ -89,21 +79,24 @@ class Livre:
             self.categorie,
             self.nombre_pages,
             1 if self.disponible else 0,
-            self.date_ajout.strftime("%Y-%m-%d %H:%M:%S")
+            self.date_ajout.strftime("%Y-%m-%d %H:%M:%S"),
+            self.cle_recherche
         ))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
     def mettre_a_jour_db(self):
-        self.sauvegarder_db()
+        """Écrit la disponibilité (seule colonne modifiée par marquer_emprunte / marquer_disponible)."""
+        conn = obtenir_connexion(DB_PATH)
+        conn.execute("UPDATE livres SET disponible = ?, version = version + 1 WHERE isbn = ?",
+                     (1 if self.disponible else 0, self.isbn))
+        valider(DB_PATH)
 
     @staticmethod
     def charger_tous():
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM livres")
         rows = cursor.fetchall()
-        conn.close()
 
         livres = []
         for row in rows:
@@ -169,8 +162,7 @@ class Livre:
 
     @staticmethod
     def supprimer_db(isbn: str):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM livres WHERE isbn = ?", (isbn,))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
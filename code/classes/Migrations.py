@@ -0,0 +1,484 @@
+import sqlite3
+
+from classes.Normalisation import cle_livre, cle_utilisateur
+
+# ------------------------
+#   SCHÉMA CANONIQUE
+# ------------------------
+# Chaque migration amène la base de la version N-1 à la version N ; la
+# version courante est stockée dans PRAGMA user_version. Une base déjà à
+# jour ne coûte qu'une lecture de ce PRAGMA au démarrage.
+
+TABLES = {
+    "comptes": """
+        CREATE TABLE IF NOT EXISTS comptes (
+            username TEXT PRIMARY KEY,
+            password_hash TEXT NOT NULL
+        )
+    """,
+    "livres": """
+        CREATE TABLE IF NOT EXISTS livres (
+            isbn TEXT PRIMARY KEY,
+            titre TEXT,
+            auteur TEXT,
+            editeur TEXT,
+            annee_publication INTEGER,
+            categorie TEXT,
+            nombre_pages INTEGER,
+            disponible INTEGER,
+            date_ajout TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'))
+        )
+    """,
+    "utilisateurs": """
+        CREATE TABLE IF NOT EXISTS utilisateurs (
+            numero_carte TEXT PRIMARY KEY,
+            nom TEXT,
+            prenom TEXT,
+            email TEXT,
+            telephone TEXT,
+            statut TEXT,
+            historique TEXT
+        )
+    """,
+    "bibliothecaires": """
+        CREATE TABLE IF NOT EXISTS bibliothecaires (
+            id INTEGER PRIMARY KEY,
+            matricule TEXT UNIQUE,
+            nom TEXT,
+            prenom TEXT,
+            email TEXT,
+            telephone TEXT,
+            niveau_acces TEXT,
+            date_ajout TEXT
+        )
+    """,
+    "emprunts": """
+        CREATE TABLE IF NOT EXISTS emprunts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_utilisateur TEXT,
+            id_livre TEXT,
+            date_emprunt TEXT,
+            date_retour_prevue TEXT,
+            date_retour_effective TEXT,
+            statut INTEGER,
+            FOREIGN KEY (id_utilisateur) REFERENCES utilisateurs(numero_carte),
+            FOREIGN KEY (id_livre) REFERENCES livres(isbn)
+        )
+    """,
+}
+
+# Colonnes ajoutées par ALTER TABLE quand une ancienne base ne les a pas
+COLONNES = {
+    "livres": {"date_ajout": "TEXT"},
+    "utilisateurs": {"telephone": "TEXT", "historique": "TEXT"},
+    "bibliothecaires": {"date_ajout": "TEXT"},
+}
+
+# Anciens noms de colonnes (bases créées par les premières versions)
+RENOMMAGES = {
+    "emprunts": {"numero_carte": "id_utilisateur", "isbn": "id_livre"},
+}
+
+
+def colonnes_table(conn: sqlite3.Connection, table: str) -> list:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def table_existe(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+# ------------------------
+#   MIGRATIONS
+# ------------------------
+
+def _migration_1_schema_canonique(conn: sqlite3.Connection):
+    """Unifie les schémas de storage.init_db, Livre, Catalogue et Bibliotheque."""
+    for ddl in TABLES.values():
+        conn.execute(ddl)
+
+    for table, renommages in RENOMMAGES.items():
+        existantes = colonnes_table(conn, table)
+        for ancien, nouveau in renommages.items():
+            if ancien in existantes and nouveau not in existantes:
+                conn.execute(f"ALTER TABLE {table} RENAME COLUMN {ancien} TO {nouveau}")
+
+    for table, colonnes in COLONNES.items():
+        existantes = colonnes_table(conn, table)
+        for colonne, type_sql in colonnes.items():
+            if colonne not in existantes:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {colonne} {type_sql}")
+
+    conn.execute("""
+        UPDATE livres SET date_ajout = strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')
+        WHERE date_ajout IS NULL
+    """)
+
+    # Table "catalogue" créée par erreur par Catalogue.creer_table : fusion dans livres
+    if table_existe(conn, "catalogue"):
+        conn.execute("""
+            INSERT OR IGNORE INTO livres
+            (isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible, date_ajout)
+            SELECT isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages, disponible,
+                   COALESCE(date_ajout, strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'))
+            FROM catalogue
+        """)
+        conn.execute("DROP TABLE catalogue")
+
+
+def _migration_2_index_emprunts(conn: sqlite3.Connection):
+    """Index secondaires pour les requêtes par utilisateur, livre et échéance."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprunts_utilisateur_statut
+        ON emprunts (id_utilisateur, statut)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprunts_livre_statut
+        ON emprunts (id_livre, statut)
+    """)
+    # Index partiel : seuls les emprunts en cours, triés par échéance (retards)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprunts_actifs_echeance
+        ON emprunts (date_retour_prevue) WHERE statut = 1
+    """)
+
+
+def _migration_3_index_date_emprunt(conn: sqlite3.Connection):
+    """Historique paginé par période (Bibliotheque.historique_emprunts)."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emprunts_date_emprunt
+        ON emprunts (date_emprunt)
+    """)
+
+
+# Tables journalisées et leur clé primaire
+TABLES_JOURNALISEES = {
+    "livres": "isbn",
+    "utilisateurs": "numero_carte",
+    "emprunts": "id",
+    "comptes": "username",
+}
+
+
+def creer_triggers_journal(conn: sqlite3.Connection, table: str, cle: str):
+    """Triggers qui inscrivent chaque insertion, modification et suppression dans le journal."""
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO journal_modifications (nom_table, cle, operation) VALUES ('{table}', NEW.{cle}, 'I');
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_update AFTER UPDATE ON {table}
+        BEGIN
+            INSERT INTO journal_modifications (nom_table, cle, operation)
+            SELECT '{table}', OLD.{cle}, 'D' WHERE OLD.{cle} IS NOT NEW.{cle};
+            INSERT INTO journal_modifications (nom_table, cle, operation) VALUES ('{table}', NEW.{cle}, 'U');
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_delete AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO journal_modifications (nom_table, cle, operation) VALUES ('{table}', OLD.{cle}, 'D');
+        END
+    """)
+
+
+def _migration_4_journal_modifications(conn: sqlite3.Connection):
+    """Journal des modifications (CDC) pour synchroniser plusieurs postes sur la même base.
+
+    Le numéro de séquence du journal sert de révision de la base.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal_modifications (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom_table TEXT NOT NULL,
+            cle TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            horodatage TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now'))
+        )
+    """)
+    # Plus grand numéro de séquence supprimé par purger_journal()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal_purge (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq_max INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO journal_purge (id, seq_max) VALUES (1, 0)")
+
+    for table, cle in TABLES_JOURNALISEES.items():
+        creer_triggers_journal(conn, table, cle)
+
+
+def _migration_5_versions(conn: sqlite3.Connection):
+    """Colonne `version` (verrouillage optimiste) et disponibilité des livres recalculée.
+
+    emprunter_livre / retourner_livre s'appuient désormais sur des UPDATE
+    conditionnels de `livres.disponible` : la colonne doit refléter les
+    emprunts en cours.
+    """
+    for table in ("livres", "emprunts"):
+        if "version" not in colonnes_table(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        UPDATE livres
+        SET disponible = NOT EXISTS (SELECT 1 FROM emprunts e WHERE e.id_livre = livres.isbn AND e.statut = 1)
+        WHERE disponible IS NOT (NOT EXISTS (SELECT 1 FROM emprunts e WHERE e.id_livre = livres.isbn AND e.statut = 1))
+    """)
+
+
+def texte_vers_epoch(colonne: str) -> str:
+    """Expression SQL : date texte (ISO, heure locale) -> secondes Unix, NULL conservé."""
+    return f"CAST(strftime('%s', {colonne}, 'utc') AS INTEGER)"
+
+
+def _migration_6_dates_entieres(conn: sqlite3.Connection):
+    """Dates des emprunts en secondes Unix (INTEGER) au lieu de texte.
+
+    SQLite ne change pas le type d'une colonne : la table est reconstruite,
+    puis ses index et triggers recréés. Le compteur AUTOINCREMENT est
+    conservé (les identifiants déjà archivés ne doivent pas être réattribués).
+    """
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'emprunts'").fetchone()
+    conn.execute("""
+        CREATE TABLE emprunts_v6 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_utilisateur TEXT,
+            id_livre TEXT,
+            date_emprunt INTEGER,
+            date_retour_prevue INTEGER,
+            date_retour_effective INTEGER,
+            statut INTEGER,
+            version INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (id_utilisateur) REFERENCES utilisateurs(numero_carte),
+            FOREIGN KEY (id_livre) REFERENCES livres(isbn)
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO emprunts_v6 (id, id_utilisateur, id_livre, date_emprunt, date_retour_prevue,
+                                 date_retour_effective, statut, version)
+        SELECT id, id_utilisateur, id_livre, {texte_vers_epoch("date_emprunt")},
+               {texte_vers_epoch("date_retour_prevue")}, {texte_vers_epoch("date_retour_effective")},
+               statut, version
+        FROM emprunts
+    """)
+    conn.execute("DROP TABLE emprunts")
+    conn.execute("ALTER TABLE emprunts_v6 RENAME TO emprunts")
+    if sequence is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'emprunts'", (sequence[0],))
+
+    _migration_2_index_emprunts(conn)
+    _migration_3_index_date_emprunt(conn)
+    creer_triggers_journal(conn, "emprunts", TABLES_JOURNALISEES["emprunts"])
+
+
+# Disponibilité déduite des emprunts en cours (parcours de idx_emprunts_livre_statut)
+DISPONIBLE_CALCULE = "NOT EXISTS (SELECT 1 FROM emprunts e WHERE e.id_livre = livres.isbn AND e.statut = 1)"
+
+
+def _migration_7_vue_livres(conn: sqlite3.Connection):
+    """Vue `vue_livres` : les livres avec leur disponibilité calculée, et dérive corrigée.
+
+    `livres.disponible` reste la colonne sur laquelle portent les UPDATE
+    conditionnels des prêts ; la vue donne la valeur de référence, tirée de
+    la table `emprunts` (voir classes.Disponibilite).
+    """
+    conn.execute(f"""
+        CREATE VIEW IF NOT EXISTS vue_livres AS
+        SELECT isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages,
+               {DISPONIBLE_CALCULE} AS disponible, date_ajout, version
+        FROM livres
+    """)
+    conn.execute("""
+        UPDATE livres SET disponible = v.disponible, version = livres.version + 1
+        FROM vue_livres v
+        WHERE v.isbn = livres.isbn AND livres.disponible IS NOT v.disponible
+    """)
+
+
+# Recherche plein texte (FTS5) : table externe sur `livres`, alimentée par triggers.
+# Le rowid de l'index est celui de `livres` : après un VACUUM, qui peut renuméroter
+# les rowid d'une table sans INTEGER PRIMARY KEY, appeler reconstruire_index_plein_texte.
+COLONNES_PLEIN_TEXTE = ("titre", "auteur", "editeur", "categorie")
+
+
+def fts5_disponible(conn: sqlite3.Connection) -> bool:
+    """Vrai si le module FTS5 est compilé (ou chargé) dans cette version de SQLite."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.essai_fts5 USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.essai_fts5")
+    return True
+
+
+def index_plein_texte_present(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'livres_fts'").fetchone() is not None
+
+
+def reconstruire_index_plein_texte(conn: sqlite3.Connection):
+    conn.execute("INSERT INTO livres_fts (livres_fts) VALUES ('rebuild')")
+
+
+def creer_index_plein_texte(conn: sqlite3.Connection) -> bool:
+    """Crée livres_fts et ses triggers puis l'indexe ; False (sans erreur) si FTS5 est absent."""
+    if not fts5_disponible(conn):
+        return False
+    colonnes = ", ".join(COLONNES_PLEIN_TEXTE)
+    anciennes = ", ".join(f"old.{c}" for c in COLONNES_PLEIN_TEXTE)
+    nouvelles = ", ".join(f"new.{c}" for c in COLONNES_PLEIN_TEXTE)
+    # remove_diacritics : "societe" trouve "Société" ; prefix : index des préfixes de 2 et 3 caractères
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS livres_fts USING fts5(
+            {colonnes}, content = 'livres', tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS livres_fts_insertion AFTER INSERT ON livres BEGIN
+            INSERT INTO livres_fts (rowid, {colonnes}) VALUES (new.rowid, {nouvelles});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS livres_fts_suppression AFTER DELETE ON livres BEGIN
+            INSERT INTO livres_fts (livres_fts, rowid, {colonnes}) VALUES ('delete', old.rowid, {anciennes});
+        END
+    """)
+    # Seules les colonnes indexées déclenchent la mise à jour (pas disponible / version à chaque prêt)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS livres_fts_modification AFTER UPDATE OF {colonnes} ON livres BEGIN
+            INSERT INTO livres_fts (livres_fts, rowid, {colonnes}) VALUES ('delete', old.rowid, {anciennes});
+            INSERT INTO livres_fts (rowid, {colonnes}) VALUES (new.rowid, {nouvelles});
+        END
+    """)
+    reconstruire_index_plein_texte(conn)
+    return True
+
+
+def _migration_8_recherche_plein_texte(conn: sqlite3.Connection):
+    """Index FTS5 du catalogue (titre, auteur, éditeur, catégorie), si FTS5 est disponible.
+
+    Sans FTS5, Catalogue.rechercher se rabat sur des LIKE ; l'index pourra
+    être créé plus tard avec creer_index_plein_texte.
+    """
+    creer_index_plein_texte(conn)
+
+
+# Colonnes d'où est tirée la clé de recherche normalisée de chaque table (voir classes.Normalisation)
+SOURCES_CLE_RECHERCHE = {
+    "livres": ("cle_livre", cle_livre, ("titre", "auteur", "isbn")),
+    "utilisateurs": ("cle_utilisateur", cle_utilisateur, ("nom", "prenom", "numero_carte")),
+}
+
+
+def _migration_9_cles_recherche(conn: sqlite3.Connection):
+    """Colonne `cle_recherche` (texte normalisé : sans accents, casse ni ponctuation) des livres et utilisateurs.
+
+    L'application la remplit à chaque création ou modification. Les
+    triggers la remettent à NULL quand une des colonnes sources change
+    sans elle (anciennes classes, outils externes) : une clé NULL est
+    recalculée au chargement, jamais utilisée périmée.
+    """
+    for table, (fonction, calcul, colonnes) in SOURCES_CLE_RECHERCHE.items():
+        if "cle_recherche" not in colonnes_table(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN cle_recherche TEXT")
+        conn.create_function(fonction, len(colonnes), calcul, deterministic=True)
+        conn.execute(f"UPDATE {table} SET cle_recherche = {fonction}({', '.join(colonnes)})")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_cle_perimee AFTER UPDATE OF {', '.join(colonnes)} ON {table}
+            WHEN NEW.cle_recherche IS OLD.cle_recherche
+            BEGIN
+                UPDATE {table} SET cle_recherche = NULL WHERE rowid = NEW.rowid;
+            END
+        """)
+    conn.execute("DROP VIEW IF EXISTS vue_livres")
+    conn.execute(f"""
+        CREATE VIEW vue_livres AS
+        SELECT isbn, titre, auteur, editeur, annee_publication, categorie, nombre_pages,
+               {DISPONIBLE_CALCULE} AS disponible, date_ajout, version, cle_recherche
+        FROM livres
+    """)
+
+
+def _migration_10_index_pagination(conn: sqlite3.Connection):
+    """Index des ordres de pagination (classes.Pagination.ORDRES) que les index existants ne servent pas.
+
+    Chaque index se termine par la clé unique : la page suivant (valeur, clé)
+    est une recherche dans l'index, pas un parcours. Emprunts : les index de
+    date (migrations 2 et 3) finissent déjà implicitement par l'id (rowid).
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_livres_titre ON livres (titre, isbn)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_livres_auteur ON livres (auteur, isbn)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_utilisateurs_nom ON utilisateurs (nom, numero_carte)")
+    # Index partiel : les livres disponibles, par ISBN (liste des livres empruntables)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_livres_disponibles ON livres (isbn) WHERE disponible = 1")
+
+
+MIGRATIONS = [
+    (1, _migration_1_schema_canonique),
+    (2, _migration_2_index_emprunts),
+    (3, _migration_3_index_date_emprunt),
+    (4, _migration_4_journal_modifications),
+    (5, _migration_5_versions),
+    (6, _migration_6_dates_entieres),
+    (7, _migration_7_vue_livres),
+    (8, _migration_8_recherche_plein_texte),
+    (9, _migration_9_cles_recherche),
+    (10, _migration_10_index_pagination),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def version_schema(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def revision_base(conn: sqlite3.Connection) -> int:
+    """Dernier numéro de séquence attribué dans le journal (0 si aucun)."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'journal_modifications'").fetchone()
+    return row[0] if row else 0
+
+
+def purger_journal(conn: sqlite3.Connection, jours: int = 30) -> int:
+    """Supprime les entrées du journal plus anciennes que `jours` ; retourne leur nombre.
+
+    Un poste dont la dernière séquence lue a été purgée recharge tout
+    (voir Bibliotheque.synchroniser).
+    """
+    limite = f"-{int(jours)} days"
+    seq_max = conn.execute(
+        "SELECT MAX(seq) FROM journal_modifications WHERE horodatage < strftime('%Y-%m-%d %H:%M:%S', 'now', ?)",
+        (limite,)).fetchone()[0]
+    if seq_max is None:
+        return 0
+    supprimees = conn.execute("DELETE FROM journal_modifications WHERE seq <= ?", (seq_max,)).rowcount
+    conn.execute("UPDATE journal_purge SET seq_max = MAX(seq_max, ?) WHERE id = 1", (seq_max,))
+    return supprimees
+
+
+def migrer(conn: sqlite3.Connection) -> int:
+    """Applique les migrations manquantes, chacune dans sa propre transaction.
+
+    Retourne la version du schéma après migration.
+    """
+    version = version_schema(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+    if conn.in_transaction:
+        conn.commit()
+    for numero, migration in MIGRATIONS:
+        if numero <= version:
+            continue
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {numero}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        version = numero
+    return version
@@ -0,0 +1,35 @@
+import re
+import unicodedata
+
+# Normalisation des textes cherchés : "Société", "SOCIETE" et "société"
+# donnent la même clé, de même que "Ki-Zerbo" et "ki zerbo".
+#   1. ligatures françaises développées (œ, æ ne se décomposent pas en NFKD) ;
+#   2. NFKD puis suppression des signes diacritiques (é -> e, ç -> c) ;
+#   3. casefold (ß -> ss) ;
+#   4. toute suite de ponctuation ou d'espaces remplacée par une espace.
+#
+# Les clés des livres et des utilisateurs sont calculées à leur création ou
+# modification et stockées avec la ligne (colonne cle_recherche, migration
+# 9) : la saisie dans un filtre ne normalise que le motif tapé.
+
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "OE", "æ": "ae", "Æ": "AE"})
+_SEPARATEURS = re.compile(r"[\W_]+")
+
+
+def normaliser(texte) -> str:
+    """'  L’Œuvre — Société ' -> 'l oeuvre societe'."""
+    texte = str(texte or "")
+    if not texte.isascii():
+        decompose = unicodedata.normalize("NFKD", texte.translate(_LIGATURES))
+        texte = "".join(c for c in decompose if not unicodedata.combining(c))
+    return _SEPARATEURS.sub(" ", texte.casefold()).strip()
+
+
+def cle_livre(titre, auteur, isbn) -> str:
+    """Clé de recherche d'un livre (filtres de l'interface)."""
+    return normaliser(f"{titre or ''} {auteur or ''} {isbn or ''}")
+
+
+def cle_utilisateur(nom, prenom, numero_carte) -> str:
+    """Clé de recherche d'un utilisateur (filtres de l'interface)."""
+    return normaliser(f"{nom or ''} {prenom or ''} {numero_carte or ''}")
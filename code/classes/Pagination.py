@@ -0,0 +1,168 @@
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+
+# Pagination par clé (keyset) : une page est lue à partir de la clé de tri
+# du dernier élément de la page précédente, jamais par OFFSET. Chaque page
+# coûte une recherche dans un index (SQLite) ou une dichotomie dans une
+# liste triée (mémoire), puis la lecture de `limite` éléments : le coût
+# ne dépend ni du numéro de la page ni de la taille de la table, et seule
+# la page courante est en mémoire.
+#
+# Une page est un couple (éléments, clé suivante) ; la clé suivante vaut
+# None sur la dernière page. Elle se repasse telle quelle (`apres`) pour
+# lire la page d'après.
+
+TAILLE_PAGE = 200
+
+# Ordres de parcours SQLite : colonne de tri éventuelle, puis clé unique
+# (départage des égalités). Chaque ordre a son index (migrations 2, 3 et 10).
+ORDRES = {
+    "livres": {
+        "isbn": ("isbn",),
+        "titre": ("titre", "isbn"),
+        "auteur": ("auteur", "isbn"),
+    },
+    "utilisateurs": {
+        "numero_carte": ("numero_carte",),
+        "nom": ("nom", "numero_carte"),
+    },
+    "emprunts": {
+        "id": ("id",),
+        "date_emprunt": ("date_emprunt", "id"),
+        "date_retour_prevue": ("date_retour_prevue", "id"),
+    },
+}
+
+
+def colonnes_ordre(table: str, ordre: str) -> tuple:
+    try:
+        return ORDRES[table][ordre]
+    except KeyError:
+        attendus = ", ".join(ORDRES.get(table, ()))
+        raise ValueError(f"Ordre inconnu pour {table} : {ordre!r} (attendu : {attendus})") from None
+
+
+def condition_apres(colonnes: tuple, apres: tuple) -> tuple:
+    """Condition SQL « strictement après `apres` » dans l'ordre de `colonnes`, et ses paramètres.
+
+    La comparaison de tuples (col, clé) > (?, ?) est servie par l'index
+    (col, clé). Les NULL, triés en premier par SQLite, ne se comparent pas :
+    après une clé de tri NULL viennent les autres NULL de clé supérieure,
+    puis toutes les valeurs non NULL.
+    """
+    if len(apres) != len(colonnes):
+        raise ValueError(f"Clé de page invalide : {apres!r} (attendu : {', '.join(colonnes)})")
+    if len(colonnes) > 1 and apres[0] is None:
+        tri, cle = colonnes
+        return f"(({tri} IS NULL AND {cle} > ?) OR {tri} IS NOT NULL)", [apres[1]]
+    marques = ", ".join("?" * len(colonnes))
+    return f"({', '.join(colonnes)}) > ({marques})", list(apres)
+
+
+def page_sql(conn, table: str, apres=None, limite: int = TAILLE_PAGE, ordre: str = None,
+             conditions=(), params=()) -> tuple:
+    """Page de lignes de `table` dans l'ordre `ordre`, strictement après la clé `apres`.
+
+    `conditions` (SQL, jointes par AND) et `params` filtrent les lignes ;
+    un filtre couvert par un index partiel (ex. disponible = 1) garde le
+    coût d'une page constant.
+    """
+    colonnes = colonnes_ordre(table, ordre or next(iter(ORDRES[table])))
+    conditions, params = list(conditions), list(params)
+    if apres is not None:
+        condition, valeurs = condition_apres(colonnes, tuple(apres))
+        conditions.append(condition)
+        params.extend(valeurs)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = conn.execute(f"SELECT * FROM {table} {where} ORDER BY {', '.join(colonnes)} LIMIT ?",
+                        params + [limite]).fetchall()
+    suivante = tuple(rows[-1][c] for c in colonnes) if len(rows) == limite else None
+    return rows, suivante
+
+
+def parcourir(lire_page, apres=None, limite: int = TAILLE_PAGE, **options):
+    """Éléments après `apres` (tous par défaut), page après page : une seule page en mémoire à la fois.
+
+    `lire_page(apres=..., limite=..., **options)` est une méthode page_* ;
+    pour les exports et traitements par lots.
+    """
+    while True:
+        elements, apres = lire_page(apres=apres, limite=limite, **options)
+        yield from elements
+        if apres is None:
+            return
+
+
+# ------------------------
+#   INDEX TRIÉ EN MÉMOIRE
+# ------------------------
+
+class IndexTrie:
+    """Clés triées par (valeur de tri, clé), tenues à jour un élément à la fois.
+
+    La page suivant une clé se trouve par dichotomie. Les valeurs de tri
+    doivent être comparables entre elles (pas de None parmi des textes).
+    """
+    TAILLE_BLOC = 256  # entrées copiées à la fois par parcourir()
+
+    def __init__(self, paires=()):
+        self._tri_de = {}    # clé -> valeur de tri (pour retrouver l'entrée à retirer)
+        self._entrees = []   # [(valeur de tri, clé)], trié
+        self.construire(paires)
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def construire(self, paires):
+        """Remplace le contenu par les couples (clé, valeur de tri) : un seul tri, O(n log n)."""
+        self._tri_de = dict(paires)
+        self._entrees = sorted((tri, cle) for cle, tri in self._tri_de.items())
+
+    def ajouter(self, cle, tri):
+        if cle in self._tri_de:
+            if self._tri_de[cle] == tri:
+                return
+            self.retirer(cle)
+        self._tri_de[cle] = tri
+        insort(self._entrees, (tri, cle))
+
+    def retirer(self, cle):
+        if cle not in self._tri_de:
+            return
+        entree = (self._tri_de.pop(cle), cle)
+        del self._entrees[bisect_left(self._entrees, entree)]
+
+    def vider(self):
+        self._tri_de.clear()
+        self._entrees.clear()
+
+    def parcourir(self, apres=None):
+        """Entrées (valeur de tri, clé) strictement après `apres`, par blocs copiés."""
+        position = 0 if apres is None else bisect_right(self._entrees, tuple(apres))
+        while True:
+            bloc = self._entrees[position:position + self.TAILLE_BLOC]
+            if not bloc:
+                return
+            yield from bloc
+            position += len(bloc)
+
+    def _bornes(self, bas, haut) -> tuple:
+        debut = 0 if bas is None else bisect_left(self._entrees, bas, key=itemgetter(0))
+        fin = len(self._entrees) if haut is None else bisect_right(self._entrees, haut, key=itemgetter(0))
+        return debut, max(debut, fin)
+
+    def compter(self, bas=None, haut=None) -> int:
+        """Nombre de clés de valeur de tri entre `bas` et `haut` (inclus, None = sans borne), par dichotomie."""
+        debut, fin = self._bornes(bas, haut)
+        return fin - debut
+
+    def cles_entre(self, bas=None, haut=None) -> list:
+        debut, fin = self._bornes(bas, haut)
+        return [cle for _, cle in self._entrees[debut:fin]]
+
+    def page(self, apres=None, limite: int = TAILLE_PAGE) -> tuple:
+        """(clés, clé suivante) : `limite` clés au plus, strictement après `apres`."""
+        position = 0 if apres is None else bisect_right(self._entrees, tuple(apres))
+        entrees = self._entrees[position:position + limite]
+        suivante = entrees[-1] if len(entrees) == limite else None
+        return [cle for _, cle in entrees], suivante
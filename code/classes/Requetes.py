@@ -0,0 +1,161 @@
+from classes.Normalisation import normaliser
+from classes.Pagination import IndexTrie
+
+# Recherche multicritère en mémoire (Catalogue.recherche_avancee). Chaque
+# champ filtrable a un index d'égalité (valeur -> ensemble de clés) ; les
+# champs entiers (année, nombre de pages) ont en plus un index trié pour
+# les intervalles. Les index suivent les ajouts, modifications et
+# suppressions un objet à la fois.
+#
+# Le plan d'une requête estime le nombre de clés de chaque critère d'après
+# ses index (taille de l'ensemble, ou dichotomie dans l'index trié) : le
+# critère le plus sélectif donne les candidats de départ, les suivants les
+# réduisent par intersection, ou par vérification des seuls candidats quand
+# ceux-ci sont moins nombreux que les clés du critère. Un champ non indexé
+# est toujours vérifié en dernier, sur les candidats restants.
+
+ACCES_EGALITE = "index d'égalité"
+ACCES_INTERVALLE = "index trié"
+ACCES_AUCUN = "sans index"
+
+DEPART = "départ"
+INTERSECTION = "intersection"
+VERIFICATION = "vérification des candidats"
+PARCOURS = "parcours complet"
+
+
+def valeur_entiere(valeur):
+    """1987, "1987" -> 1987 ; None si la valeur est absente ou invalide."""
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+class MoteurRequetes:
+    """Index d'égalité et d'intervalles d'une collection d'objets, et planification des requêtes.
+
+    Textes comparés normalisés ("roman" trouve "Roman", voir
+    classes.Normalisation) ; entiers comparés comme entiers ("1987" = 1987).
+    """
+
+    def __init__(self, champs_texte, champs_entiers):
+        self._conversions = {champ: normaliser for champ in champs_texte}
+        self._conversions.update((champ, valeur_entiere) for champ in champs_entiers)
+        self._egalite = {champ: {} for champ in self._conversions}  # champ -> valeur -> set(clés)
+        self._intervalles = {champ: IndexTrie() for champ in champs_entiers}
+        self._valeurs = {}  # clé -> {champ: valeur convertie}
+
+    # --- Mise à jour des index ---
+    def ajouter(self, cle, objet) -> dict:
+        """Indexe (ou réindexe) `objet` ; retourne ses valeurs converties par champ."""
+        self.retirer(cle)
+        valeurs = {champ: conversion(getattr(objet, champ, None)) for champ, conversion in self._conversions.items()}
+        self._valeurs[cle] = valeurs
+        for champ, valeur in valeurs.items():
+            self._egalite[champ].setdefault(valeur, set()).add(cle)
+        for champ, index in self._intervalles.items():
+            if valeurs[champ] is not None:
+                index.ajouter(cle, valeurs[champ])
+        return valeurs
+
+    def retirer(self, cle):
+        valeurs = self._valeurs.pop(cle, None)
+        if valeurs is None:
+            return
+        for champ, valeur in valeurs.items():
+            cles = self._egalite[champ][valeur]
+            cles.discard(cle)
+            if not cles:
+                del self._egalite[champ][valeur]
+        for index in self._intervalles.values():
+            index.retirer(cle)
+
+    def vider(self):
+        self._valeurs.clear()
+        for valeurs in self._egalite.values():
+            valeurs.clear()
+        for index in self._intervalles.values():
+            index.vider()
+
+    # --- Planification ---
+    def _etape(self, champ, critere, objets) -> dict:
+        """Accès, estimation du nombre de clés, clés (si indexé) et test d'une clé, pour un critère."""
+        if isinstance(critere, (tuple, list)):
+            if champ not in self._intervalles or len(critere) != 2:
+                raise ValueError(f"Intervalle (min, max) accepté seulement pour : {', '.join(self._intervalles)}")
+            bas, haut = (None if borne is None else self._entier(champ, borne) for borne in critere)
+            index = self._intervalles[champ]
+            libelle = f"{champ} entre {'-∞' if bas is None else bas} et {'+∞' if haut is None else haut}"
+
+            def test(cle):
+                valeur = self._valeurs[cle][champ]
+                return valeur is not None and (bas is None or valeur >= bas) and (haut is None or valeur <= haut)
+            return {"critere": libelle, "acces": ACCES_INTERVALLE, "estimation": index.compter(bas, haut),
+                    "cles": lambda: index.cles_entre(bas, haut), "test": test}
+
+        if champ in self._conversions:
+            valeur = self._entier(champ, critere) if champ in self._intervalles else normaliser(critere)
+            cles = self._egalite[champ].get(valeur, ())
+            return {"critere": f"{champ} = {valeur!r}", "acces": ACCES_EGALITE, "estimation": len(cles),
+                    "cles": lambda: cles, "test": lambda cle: self._valeurs[cle][champ] == valeur}
+
+        # Champ non indexé (ex. disponibilité, modifiée sur place) : comparaison normalisée, objet par objet
+        attendu = normaliser(critere)
+        return {"critere": f"{champ} = {attendu!r}", "acces": ACCES_AUCUN, "estimation": len(objets),
+                "cles": None, "test": lambda cle: normaliser(getattr(objets[cle], champ, "")) == attendu}
+
+    @staticmethod
+    def _entier(champ, valeur) -> int:
+        entier = valeur_entiere(valeur)
+        if entier is None:
+            raise ValueError(f"Valeur entière attendue pour {champ} : {valeur!r}")
+        return entier
+
+    def planifier(self, criteres: dict, objets) -> list:
+        """Étapes de la requête, dans l'ordre d'exécution, avec la méthode choisie pour chacune.
+
+        Ordre : critères indexés du plus sélectif au moins sélectif, puis
+        critères non indexés. Les candidats ne sont jamais plus nombreux que
+        la plus petite estimation déjà vue : un intervalle plus large est
+        vérifié sur les candidats plutôt que lu dans l'index.
+        """
+        etapes = [self._etape(champ, critere, objets) for champ, critere in criteres.items()]
+        etapes.sort(key=lambda etape: (etape["cles"] is None, etape["estimation"]))
+        borne = None
+        for etape in etapes:
+            if borne is None:
+                etape["methode"] = PARCOURS if etape["cles"] is None else DEPART
+            elif etape["cles"] is not None and (etape["acces"] == ACCES_EGALITE or etape["estimation"] <= borne):
+                etape["methode"] = INTERSECTION
+            else:
+                etape["methode"] = VERIFICATION
+            borne = etape["estimation"] if borne is None else min(borne, etape["estimation"])
+        return etapes
+
+    # --- Exécution ---
+    def rechercher(self, criteres: dict, objets) -> set:
+        """Clés de `objets` (dict clé -> objet) qui satisfont tous les critères ; toutes si aucun critère."""
+        candidats = None
+        for etape in self.planifier(criteres, objets):
+            if etape["methode"] == DEPART:
+                candidats = set(etape["cles"]())
+            elif etape["methode"] == PARCOURS:
+                candidats = set(filter(etape["test"], objets))
+            elif etape["methode"] == INTERSECTION:
+                candidats.intersection_update(etape["cles"]())
+            else:
+                candidats = set(filter(etape["test"], candidats))
+            if not candidats:
+                return set()
+        return set(objets) if candidats is None else candidats
+
+    def expliquer(self, criteres: dict, objets) -> str:
+        """Plan choisi, une ligne par étape : critère, accès, nombre de clés estimé, méthode."""
+        etapes = self.planifier(criteres, objets)
+        if not etapes:
+            return f"Aucun critère : tous les éléments ({len(objets)})"
+        largeur = max(len(etape["critere"]) for etape in etapes)
+        return "\n".join(f"{rang}. {etape['critere']:{largeur}s}  {etape['acces']:16s} "
+                         f"~{etape['estimation']:<8d} {etape['methode']}"
+                         for rang, etape in enumerate(etapes, 1))
@@ -0,0 +1,248 @@
+import json
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from classes.Archivage import annees_archivees, chemin_archive
+from classes.Connexion import DB_PATH
+
+# Sauvegarde à chaud de la base (et des archives annuelles) avec l'API de
+# sauvegarde de SQLite (Connection.backup) : la copie avance par paquets de
+# pages, avec une courte pause entre deux paquets, pendant que les postes
+# continuent de prêter.
+#
+# La source est lue sur une connexion en lecture seule. En WAL, la copie se
+# fait dans une seule transaction de lecture : elle porte sur cet instantané
+# et n'est pas relancée à chaque écriture d'un autre poste (sans cela, une
+# base active ne finit jamais d'être copiée), et les écritures continuent.
+# Avec un journal classique (profil « durable »), une transaction de lecture
+# tenue bloquerait les écritures jusqu'à la fin de la copie : chaque paquet
+# prend alors son propre verrou de lecture, et la pause laisse passer les
+# écritures (une écriture relance la copie depuis le début).
+#
+# Chaque passage crée data/sauvegardes/AAAAMMJJ-HHMMSS/ (base et archives),
+# vérifie chaque copie (PRAGMA integrity_check), ne garde que les
+# `conserver` passages les plus récents et ajoute ses mesures à
+# data/sauvegardes/sauvegardes.jsonl.
+#
+# Usage (depuis le dossier code/) :
+#     python -m classes.Sauvegarde [--pages 256] [--pause 0.05] [--conserver 7]
+#     python -m classes.Sauvegarde --toutes-les 6     # planificateur : toutes les 6 heures
+
+REPERTOIRE_SAUVEGARDES = Path("data/sauvegardes")
+PAGES_PAR_ETAPE = 256        # 1 Mio par étape avec des pages de 4 Kio
+PAUSE_ENTRE_ETAPES = 0.05    # secondes
+CONSERVATION_SAUVEGARDES = 7
+JOURNAL_SAUVEGARDES = "sauvegardes.jsonl"
+
+_FORMAT_HORODATAGE = "%Y%m%d-%H%M%S"
+
+
+class SauvegardeCorrompue(Exception):
+    """La copie ne passe pas la vérification d'intégrité ; elle n'est pas conservée."""
+
+
+# ------------------------
+#   COPIE D'UN FICHIER
+# ------------------------
+
+def copier_base(source: Path, cible: Path, pages: int = PAGES_PAR_ETAPE, pause: float = PAUSE_ENTRE_ETAPES) -> dict:
+    """Copie `source` dans `cible` par l'API de sauvegarde et vérifie la copie ; retourne ses mesures."""
+    debut = time.perf_counter()
+    etapes = 0
+
+    def progression(statut, restantes, total):
+        nonlocal etapes
+        etapes += 1
+        # backup() n'attend `sleep` que sur SQLITE_BUSY / LOCKED : la pause entre paquets se fait ici
+        if restantes and pause:
+            time.sleep(pause)
+
+    provisoire = cible.with_name(cible.name + ".tmp")
+    src = sqlite3.connect(Path(source).resolve().as_uri() + "?mode=ro", uri=True)
+    dst = sqlite3.connect(provisoire)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # Instantané de lecture tenu pendant toute la copie (ne bloque pas les écritures en WAL)
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dst, pages=pages, progress=progression, sleep=pause)
+        if src.in_transaction:
+            src.rollback()
+        # Fichier autonome (pas de -wal à côté), quel que soit le mode de la source
+        dst.execute("PRAGMA journal_mode = DELETE").fetchone()
+        integrite = [row[0] for row in dst.execute("PRAGMA integrity_check")]
+        nb_pages = dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        src.close()
+        dst.close()
+    if integrite != ["ok"]:
+        provisoire.unlink()
+        raise SauvegardeCorrompue(f"{cible.name} : " + "; ".join(integrite[:5]))
+    provisoire.replace(cible)
+    return {
+        "fichier": cible.name,
+        "taille": cible.stat().st_size,
+        "pages": nb_pages,
+        "etapes": etapes,
+        "duree": round(time.perf_counter() - debut, 3),
+    }
+
+
+# ------------------------
+#   PASSAGE COMPLET
+# ------------------------
+
+def lister_sauvegardes(repertoire=REPERTOIRE_SAUVEGARDES) -> list:
+    """Répertoires de sauvegarde existants, du plus ancien au plus récent."""
+    repertoire = Path(repertoire)
+    if not repertoire.is_dir():
+        return []
+    passages = []
+    for dossier in repertoire.iterdir():
+        try:
+            datetime.strptime(dossier.name, _FORMAT_HORODATAGE)
+        except ValueError:
+            continue
+        if dossier.is_dir():
+            passages.append(dossier)
+    return sorted(passages, key=lambda dossier: dossier.name)
+
+
+def appliquer_rotation(repertoire=REPERTOIRE_SAUVEGARDES, conserver: int = CONSERVATION_SAUVEGARDES) -> list:
+    """Supprime les sauvegardes au-delà des `conserver` plus récentes ; retourne les noms supprimés."""
+    passages = lister_sauvegardes(repertoire)
+    anciennes = passages[:-conserver] if conserver > 0 else []
+    for dossier in anciennes:
+        shutil.rmtree(dossier)
+    return [dossier.name for dossier in anciennes]
+
+
+def sauvegarder(chemin_base=DB_PATH, repertoire=REPERTOIRE_SAUVEGARDES, pages: int = PAGES_PAR_ETAPE,
+                pause: float = PAUSE_ENTRE_ETAPES, conserver: int = CONSERVATION_SAUVEGARDES,
+                archives: bool = True) -> dict:
+    """Sauvegarde la base (et ses archives annuelles) dans un nouveau répertoire horodaté.
+
+    Retourne les mesures du passage, aussi ajoutées au journal des
+    sauvegardes. Si une copie est corrompue, SauvegardeCorrompue est levée,
+    le passage incomplet est supprimé et la rotation n'a pas lieu.
+    """
+    chemin_base = Path(chemin_base)
+    repertoire = Path(repertoire)
+    debut = time.perf_counter()
+    horodatage = datetime.now()
+    dossier = repertoire / horodatage.strftime(_FORMAT_HORODATAGE)
+    dossier.mkdir(parents=True, exist_ok=False)
+
+    sources = [chemin_base]
+    if archives:
+        sources += [chemin_archive(annee, chemin_base.parent) for annee in annees_archivees(chemin_base.parent)]
+    try:
+        fichiers = [copier_base(source, dossier / source.name, pages, pause) for source in sources]
+    except BaseException:
+        shutil.rmtree(dossier, ignore_errors=True)
+        raise
+
+    mesures = {
+        "date": horodatage.isoformat(timespec="seconds"),
+        "repertoire": str(dossier),
+        "duree": round(time.perf_counter() - debut, 3),
+        "taille": sum(f["taille"] for f in fichiers),
+        "fichiers": fichiers,
+        "integrite": "ok",
+        "supprimees": appliquer_rotation(repertoire, conserver),
+    }
+    with open(repertoire / JOURNAL_SAUVEGARDES, "a", encoding="utf-8") as journal:
+        journal.write(json.dumps(mesures, ensure_ascii=False) + "\n")
+    return mesures
+
+
+# ------------------------
+#   PLANIFICATEUR
+# ------------------------
+
+class PlanificateurSauvegarde:
+    """Lance `sauvegarder` toutes les `intervalle` secondes dans un thread de fond.
+
+    `au_resultat(mesures ou exception)` est appelé depuis ce thread après
+    chaque passage ; une interface Tk doit le relayer par root.after.
+    """
+
+    def __init__(self, intervalle: float, au_resultat=None, **options):
+        self.intervalle = intervalle
+        self.au_resultat = au_resultat
+        self.options = options
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._boucle, name="sauvegarde-bibliotheque", daemon=True)
+
+    def demarrer(self):
+        self._thread.start()
+        return self
+
+    def arreter(self, delai: float = None):
+        """Demande l'arrêt ; un passage en cours va jusqu'au bout."""
+        self._arret.set()
+        if self._thread.is_alive():
+            self._thread.join(delai)
+
+    def _boucle(self):
+        while not self._arret.wait(self.intervalle):
+            try:
+                resultat = sauvegarder(**self.options)
+            except (sqlite3.Error, OSError, SauvegardeCorrompue) as erreur:
+                resultat = erreur
+            if self.au_resultat is not None:
+                self.au_resultat(resultat)
+
+
+def afficher(mesures: dict):
+    for fichier in mesures["fichiers"]:
+        print(f"  {fichier['fichier']:24s} {fichier['taille'] / 1_048_576:8.1f} Mio  "
+              f"{fichier['etapes']:5d} étapes  {fichier['duree']:7.2f} s")
+    print(f"Sauvegarde {mesures['repertoire']} : {mesures['taille'] / 1_048_576:.1f} Mio en {mesures['duree']:.2f} s, "
+          f"intégrité {mesures['integrite']}"
+          + (f", supprimées : {', '.join(mesures['supprimees'])}" if mesures["supprimees"] else ""))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Sauvegarde à chaud de la base (API de sauvegarde SQLite).")
+    parser.add_argument("--base", default=str(DB_PATH))
+    parser.add_argument("--destination", default=str(REPERTOIRE_SAUVEGARDES))
+    parser.add_argument("--pages", type=int, default=PAGES_PAR_ETAPE, help="pages copiées par étape")
+    parser.add_argument("--pause", type=float, default=PAUSE_ENTRE_ETAPES, help="pause entre étapes (s)")
+    parser.add_argument("--conserver", type=int, default=CONSERVATION_SAUVEGARDES)
+    parser.add_argument("--sans-archives", dest="archives", action="store_false")
+    parser.add_argument("--toutes-les", dest="heures", type=float,
+                        help="relance la sauvegarde toutes les N heures (jusqu'à Ctrl+C)")
+    args = parser.parse_args()
+
+    options = dict(chemin_base=args.base, repertoire=args.destination, pages=args.pages,
+                   pause=args.pause, conserver=args.conserver, archives=args.archives)
+    try:
+        afficher(sauvegarder(**options))
+    except SauvegardeCorrompue as erreur:
+        print(f"Sauvegarde rejetée : {erreur}", file=sys.stderr)
+        if not args.heures:
+            return 1
+    if args.heures:
+        def rapporter(resultat):
+            if isinstance(resultat, dict):
+                afficher(resultat)
+            else:
+                print(f"Échec de la sauvegarde : {resultat}", file=sys.stderr)
+        planificateur = PlanificateurSauvegarde(args.heures * 3600, rapporter, **options).demarrer()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            planificateur.arreter()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
-import sqlite3
 from pathlib import Path
 from typing import List
 import re
 from classes.Personne import Personne
+from classes.Connexion import obtenir_connexion, valider
+from classes.Migrations import migrer
+from classes.Normalisation import cle_utilisateur
 
 DB_PATH = Path("data/bibliotheque.db")
 
@@ -14,6 +16,7 @@ class Utilisateur(Personne):
         self.statut = statut
         self.historique = historique if historique is not None else []
         self.emprunts_actifs = []
+        self.cle_recherche = cle_utilisateur(nom, prenom, numero_carte)
 
     def emprunter_livre(self, livre) -> bool:
         if self.statut != "ACTIF" or len(self.emprunts_actifs) >= 5:
@@ -47,37 +50,23 @@ class Utilisateur(Personne):
         # -------------  Persistance -------------
     def save(self):
         """Inserer or replacer l'utilisateur dans la table `utilisateurs`."""
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO utilisateurs
-            (numero_carte, nom, prenom, email, statut)
-            VALUES (?, ?, ?, ?, ?)
-        """, (self.numero_carte, self.nom, self.prenom, self.email, self.statut))
-        conn.commit()
-        conn.close()
+            (numero_carte, nom, prenom, email, statut, cle_recherche)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (self.numero_carte, self.nom, self.prenom, self.email, self.statut, self.cle_recherche))
+        valider(DB_PATH)
 
 
     @staticmethod
     def creer_table():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS utilisateurs (
-                numero_carte TEXT PRIMARY KEY,
-                nom TEXT,
-                prenom TEXT,
-                email TEXT,
-                telephone TEXT,
-                statut TEXT,
-                historique TEXT
-            )
-        """)
-        conn.commit()
-        conn.close()
+        """Le schéma est géré par classes.Migrations (PRAGMA user_version)."""
+        migrer(obtenir_connexion(DB_PATH))
 
     def sauvegarder_db(self):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO utilisateurs
@@ -92,19 +81,17 @@ class Utilisateur(Personne):
             self.statut,
             "|".join(self.historique)  # Historique stocké en chaîne séparée par |
         ))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
     def mettre_a_jour_db(self):
         self.sauvegarder_db()
 
     @staticmethod
     def charger_tous():
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM utilisateurs")
         rows = cursor.fetchall()
-        conn.close()
 
         utilisateurs = []
         for row in rows:
@@ -137,8 +124,7 @@ class Utilisateur(Personne):
 
     @staticmethod
     def supprimer_db(numero_carte: str):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM utilisateurs WHERE numero_carte = ?", (numero_carte,))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from classes.Bibliotheque import Bibliotheque, Livre, Utilisateur
+
+# Deux postes sur la même base : chaque Bibliotheque vit dans son thread
+# (une connexion SQLite par thread, voir classes.Connexion).
+#
+# Usage (depuis le dossier code/) :
+#     python -m unittest tests.test_synchronisation
+
+
+def dans_un_autre_poste(action):
+    """Exécute `action(biblio)` sur un second poste, dans son propre thread."""
+    erreurs = []
+
+    def poste():
+        biblio = Bibliotheque()
+        try:
+            action(biblio)
+        except Exception as erreur:
+            erreurs.append(erreur)
+        finally:
+            biblio.gestionnaire.fermer()
+            biblio.lecteur.fermer()
+    thread = threading.Thread(target=poste)
+    thread.start()
+    thread.join()
+    if erreurs:
+        raise erreurs[0]
+
+
+class TestSynchronisation(unittest.TestCase):
+    def setUp(self):
+        self.dossier_initial = os.getcwd()
+        self.dossier = tempfile.TemporaryDirectory()
+        os.chdir(self.dossier.name)
+        os.mkdir("data")
+        os.environ["BIBLIOTHEQUE_INSTANTANE"] = "0"
+        self.biblio = Bibliotheque()
+        for isbn in ("X", "Y"):
+            self.biblio.ajouter_livre(Livre(isbn, f"Titre {isbn}", "Auteur", categorie="Roman"))
+        for numero in ("C1", "C2"):
+            self.biblio.inscrire_utilisateur(Utilisateur(numero, "Nom", "Prénom", f"{numero}@exemple.bf"))
+
+    def tearDown(self):
+        self.biblio.gestionnaire.fermer()
+        self.biblio.lecteur.fermer()
+        os.chdir(self.dossier_initial)
+        self.dossier.cleanup()
+
+    def test_retour_puis_nouveau_pret_du_meme_livre(self):
+        # Emprunts 1 à 6 terminés : X est prêté sous le numéro 7, rendu, Y prêté (8) puis X
+        # reprêté (9) ; le set {7, 8, 9} des clés du journal se parcourt dans l'ordre 8, 9, 7
+        for _ in range(6):
+            self.biblio.retourner_livre(self.biblio.emprunter_livre("C1", "Y"))
+        numeros = []
+        dans_un_autre_poste(lambda biblio: numeros.append(biblio.emprunter_livre("C1", "X")))
+        self.biblio.synchroniser()
+        self.assertEqual(numeros, [7])
+        self.assertFalse(self.biblio.catalogue["X"].disponible)
+
+        def rendre_et_repreter(biblio):
+            self.assertTrue(biblio.retourner_livre(numeros[0]))
+            numeros.append(biblio.emprunter_livre("C1", "Y"))
+            numeros.append(biblio.emprunter_livre("C2", "X"))
+        dans_un_autre_poste(rendre_et_repreter)
+        self.assertEqual(numeros, [7, 8, 9])
+
+        self.biblio.synchroniser()
+        en_base = dict(self.biblio.conn.execute("SELECT isbn, disponible FROM vue_livres"))
+        self.assertEqual(en_base, {"X": 0, "Y": 0})
+        for isbn in ("X", "Y"):
+            self.assertFalse(self.biblio.catalogue[isbn].disponible)
+        self.assertEqual(self.biblio.catalogue.facettes.comptes()["disponible"], {False: 2})
+
+    def test_emprunt_clos_sans_modifier_le_livre(self):
+        # Emprunt clos par un autre outil sans toucher à la ligne du livre : seul l'emprunt est journalisé
+        numero = self.biblio.emprunter_livre("C1", "X")
+        self.biblio.synchroniser()
+        with sqlite3.connect("data/bibliotheque.db") as conn:
+            conn.execute("UPDATE emprunts SET statut = 0, date_retour_effective = date_emprunt WHERE id = ?",
+                         (numero,))
+        conn.close()
+
+        self.biblio.synchroniser()
+        self.assertTrue(self.biblio.catalogue["X"].disponible)
+        self.assertEqual(self.biblio.catalogue.facettes.comptes()["disponible"], {True: 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
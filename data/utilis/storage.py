@@ -1,8 +1,13 @@
-import sqlite3
+import sys
 from pathlib import Path
 from datetime import datetime
 from typing import List
 
+# Le gestionnaire de connexions partagé vit dans code/classes
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "code"))
+from classes.Connexion import obtenir_connexion, valider, vers_epoch
+from classes.Migrations import migrer
+
 DB_PATH = Path("data/bibliotheque.db")
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
@@ -10,67 +15,8 @@ DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 # Création / initialisation de la base
 # ========================
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Table livres
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS livres (
-            isbn TEXT PRIMARY KEY,
-            titre TEXT,
-            auteur TEXT,
-            editeur TEXT,
-            annee_publication INTEGER,
-            categorie TEXT,
-            nombre_pages INTEGER,
-            disponible BOOLEAN,
-            date_ajout TEXT
-        )
-    """)
-
-    # Table utilisateurs
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS utilisateurs (
-            numero_carte TEXT PRIMARY KEY,
-            nom TEXT,
-            prenom TEXT,
-            email TEXT,
-            telephone TEXT,
-            statut TEXT,
-            historique TEXT
-        )
-    """)
-
-    # Table bibliothécaires
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS bibliothecaires (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            matricule TEXT UNIQUE,
-            nom TEXT,
-            prenom TEXT,
-            email TEXT,
-            telephone TEXT,
-            niveau_acces TEXT
-        )
-    """)
-
-    # Table emprunts
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS emprunts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            id_utilisateur TEXT,
-            id_livre TEXT,
-            date_emprunt TEXT,
-            date_retour_prevue TEXT,
-            date_retour_effective TEXT,
-            statut BOOLEAN,
-            FOREIGN KEY (id_utilisateur) REFERENCES utilisateurs(numero_carte),
-            FOREIGN KEY (id_livre) REFERENCES livres(isbn)
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    """Amène la base au schéma canonique (voir classes.Migrations)."""
+    migrer(obtenir_connexion(DB_PATH))
 
 
 # ========================
@@ -98,7 +44,7 @@ class Livre:
         self.disponibilite = disponibilite
 
     def save(self):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO livres
@@ -107,8 +53,7 @@ class Livre:
         """, (self.isbn, self.titre, self.auteur, self.editeur,
               self.annee_publication, self.categorie, self.nombre_pages,
               self.disponibilite, datetime.now().isoformat()))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
 
 class Utilisateur(Personne):
@@ -120,7 +65,7 @@ class Utilisateur(Personne):
         self.historique = historique if historique else []
 
     def save(self):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO utilisateurs
@@ -128,8 +73,7 @@ class Utilisateur(Personne):
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (self.numero_carte, self.nom, self.prenom, self.email,
               self.telephone, self.statut, ",".join(self.historique)))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
 
 class Bibliothecaire(Personne):
@@ -140,7 +84,7 @@ class Bibliothecaire(Personne):
         self.niveau_acces = niveau_acces
 
     def save(self):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO bibliothecaires
@@ -148,8 +92,7 @@ class Bibliothecaire(Personne):
             VALUES (?, ?, ?, ?, ?, ?)
         """, (self.matricule, self.nom, self.prenom, self.email,
               self.telephone, self.niveau_acces))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
 
 class Emprunt:
@@ -167,18 +110,17 @@ class Emprunt:
         self.statut = statut
 
     def save(self):
-        conn = sqlite3.connect(DB_PATH)
+        conn = obtenir_connexion(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT INTO emprunts
             (id_utilisateur, id_livre, date_emprunt, date_retour_prevue, date_retour_effective, statut)
             VALUES (?, ?, ?, ?, ?, ?)
-        """, (self.id_utilisateur, self.id_livre, datetime.now().isoformat(),
-              self.date_retour_prevue.isoformat(),
-              self.date_retour_effective.isoformat() if self.date_retour_effective else None,
+        """, (self.id_utilisateur, self.id_livre, vers_epoch(datetime.now()),
+              vers_epoch(self.date_retour_prevue),
+              vers_epoch(self.date_retour_effective),
               self.statut))
-        conn.commit()
-        conn.close()
+        valider(DB_PATH)
 
 
 # ========================